@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'MFC.settings')
+# Под ASGI читающие страницы обслуживают асинхронные представления
+os.environ.setdefault('MFC_ROOT_URLCONF', 'MFC.asgi_urls')
 
 application = get_asgi_application()
@@ -0,0 +1,23 @@
+"""Корневые URL для ASGI (см. MFC/asgi.py): читающие страницы асинхронные."""
+import re
+
+from django.contrib import admin
+from django.urls import path, include, re_path
+from django.conf import settings
+from django.conf.urls.static import static
+from services import assets, views
+
+urlpatterns = [
+    path('admin/', admin.site.urls),
+    path('', include('services.async_urls')),
+]
+
+handler404 = views.custom_404
+
+if settings.DEBUG:
+    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+
+if settings.MFC_SETTINGS['SERVE_STATIC']:
+    urlpatterns += [
+        re_path(rf'^{re.escape(settings.STATIC_URL.lstrip("/"))}(?P<path>.*)$', assets.serve),
+    ]
@@ -1,4 +1,5 @@
 import os
+import tempfile
 from pathlib import Path
 from django.utils.translation import gettext_lazy as _
 
@@ -23,6 +24,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'services.middleware.QueryInstrumentationMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -32,7 +34,8 @@ MIDDLEWARE = [
     'django.middleware.locale.LocaleMiddleware',
 ]
 
-ROOT_URLCONF = 'MFC.urls'
+# MFC/asgi.py подставляет MFC.asgi_urls с асинхронными представлениями
+ROOT_URLCONF = os.environ.get('MFC_ROOT_URLCONF', 'MFC.urls')
 
 TEMPLATES = [
     {
@@ -57,6 +60,11 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # Сколько секунд пишущая транзакция ждёт освобождения базы
+        'OPTIONS': {'timeout': 20},
+        # Постоянные соединения: PRAGMA выполняются один раз на соединение
+        'CONN_MAX_AGE': int(os.environ.get('MFC_DB_CONN_MAX_AGE', 600)),
+        'CONN_HEALTH_CHECKS': True,
     }
 }
 
@@ -95,6 +103,12 @@ STATICFILES_DIRS = [
 ]
 STATIC_ROOT = BASE_DIR / 'staticfiles'
 
+# collectstatic добавляет хеш в имена файлов и пишет сжатые варианты (services/assets.py)
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'services.assets.CompressedManifestStaticFilesStorage'},
+}
+
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
@@ -105,15 +119,47 @@ LOGOUT_REDIRECT_URL = '/'
 LOGIN_URL = '/admin/login/'
 
 EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
+DEFAULT_FROM_EMAIL = 'noreply@mfc-online.ru'
 
+# Двухуровневый кэш (services/cache_backends.py): L1 в памяти процесса,
+# L2 — таблица SQLite в каталоге, общем для всех процессов сервера
+CACHE_DIR = os.environ.get('MFC_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'mfc-cache'))
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-        'LOCATION': 'unique-snowflake',
-    }
+        'BACKEND': 'services.cache_backends.TwoTierCache',
+        'LOCATION': CACHE_DIR,
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+            # Лишние записи L2 удаляются раз в CULL_EVERY записей процесса
+            'CULL_EVERY': 100,
+            'L1_MAX_ENTRIES': 1000,
+            'L1_TIMEOUT': 60,
+            # Версии данных всегда читаются из общего L2
+            'L1_BYPASS_PREFIXES': ('mfc:version:',),
+            'LOCK_TIMEOUT': 30,
+        },
+    },
+    # Сессии — в отдельной таблице со своим размером: вытеснение страниц и
+    # виджетов не удаляет живые сессии. L1 для них не нужен: выход из
+    # системы в одном процессе должен сразу быть виден остальным
+    'sessions': {
+        'BACKEND': 'services.cache_backends.SQLiteCache',
+        'LOCATION': os.path.join(CACHE_DIR, 'sessions'),
+        'OPTIONS': {
+            'MAX_ENTRIES': 100000,
+            'CULL_EVERY': 100,
+        },
+    },
 }
 
-SESSION_ENGINE = 'django.contrib.sessions.backends.db'
+# Сессии: cached_db (services/sessions.py) читает сессию из кэша и не пишет
+# неизменённую; signed_cookies хранит её в подписанной cookie без таблицы
+SESSION_ENGINES = {
+    'cached_db': 'services.sessions',
+    'signed_cookies': 'django.contrib.sessions.backends.signed_cookies',
+}
+SESSION_ENGINE = SESSION_ENGINES[os.environ.get('MFC_SESSION_MODE', 'cached_db')]
+SESSION_CACHE_ALIAS = 'sessions'
 SESSION_COOKIE_AGE = 1209600 
 
 if DEBUG:
@@ -176,4 +222,53 @@ MFC_SETTINGS = {
     'PAGINATION_PER_PAGE': 20,
     'SEARCH_RESULTS_LIMIT': 50,
     'DEFAULT_CURRENCY': 'RUB',
+    # Очередь фоновых задач (services/tasks.py, команда process_tasks)
+    'TASKS': {
+        'BATCH_SIZE': 50,
+        'MAX_ATTEMPTS': 5,
+        'RETRY_BASE_SECONDS': 60,
+        'LOCK_TIMEOUT': 600,
+        'IDLE_SLEEP_SECONDS': 5,
+    },
+    # Время жизни кэша числа строк в списках админки (services/pagination.py)
+    'ADMIN_COUNT_CACHE_SECONDS': 300,
+    # Сессий в одной транзакции команды cleanup_sessions
+    'SESSION_CLEANUP_BATCH_SIZE': 1000,
+    # Строк на одну выборку из базы при выгрузке (services/exports.py)
+    'EXPORT_CHUNK_SIZE': 2000,
+    # Учет SQL-запросов по HTTP-запросам (services/middleware.py)
+    'SQL_INSTRUMENTATION': {
+        'ENABLED': True,
+        'SAMPLE_RATE': 1.0 if DEBUG else 0.05,
+        'N_PLUS_ONE_THRESHOLD': 5,
+        'SLOW_REQUEST_MS': 500,
+        'SERVER_TIMING': DEBUG,
+    },
+    # Отдача статических файлов приложением (services/assets.py); выключите,
+    # если /static/ отдаёт веб-сервер
+    'SERVE_STATIC': True,
+    'STATIC_CACHE': {
+        'HASHED_MAX_AGE': 365 * 24 * 3600,
+        'MAX_AGE': 3600,
+    },
+    # Профиль SQLite (services/db.py); пустой PRAGMAS оставляет настройки по умолчанию
+    'SQLITE': {
+        'PRAGMAS': {
+            'journal_mode': 'wal',
+            'synchronous': 'normal',
+            # Отрицательное значение — размер в КиБ
+            'cache_size': -20000,
+            'mmap_size': 128 * 1024 * 1024,
+            'temp_store': 'memory',
+        },
+        'BUSY_RETRIES': 5,
+        'BUSY_RETRY_DELAY': 0.05,
+    },
+    # Поиск ближайших офисов (services/geo.py): размер ячейки сетки в градусах
+    # (0.1° — около 11 км по широте) и число офисов в ответе API
+    'GEO': {
+        'CELL_DEGREES': 0.1,
+        'NEAREST_LIMIT': 5,
+        'NEAREST_MAX_LIMIT': 50,
+    },
 }
\ No newline at end of file
@@ -1,9 +1,11 @@
+import re
+
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, include, re_path
 from django.conf import settings
 from django.conf.urls.static import static
 from django.conf.urls import handler404
-from services import views
+from services import assets, views
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -14,4 +16,8 @@ handler404 = views.custom_404
 
 if settings.DEBUG:
     urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
-    urlpatterns += static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)
\ No newline at end of file
+
+if settings.MFC_SETTINGS['SERVE_STATIC']:
+    urlpatterns += [
+        re_path(rf'^{re.escape(settings.STATIC_URL.lstrip("/"))}(?P<path>.*)$', assets.serve),
+    ]
\ No newline at end of file
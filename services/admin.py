@@ -1,6 +1,46 @@
+from datetime import date, datetime, timedelta
+
 from django.contrib import admin
+from django.contrib.admin.options import IncorrectLookupParameters
 from django.utils.html import format_html
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import ExtractDay, ExtractMonth, ExtractYear, Lower
+from django.utils import timezone
 from .models import *
+from .pagination import CachedCountPaginator
+from .utils import send_application_status_notification
+from . import application_data, exports, reference, stats
+
+
+class CountColumnsMixin:
+    """Колонки-счетчики через аннотации вместо .count() на каждую строку.
+
+    count_columns = {'имя_колонки': ('связь', 'Заголовок')} — для каждой
+    колонки создается метод отображения, а get_queryset добавляет
+    аннотацию Count('связь'), так что колонку можно сортировать.
+    """
+    count_columns = {}
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        for column, (relation, description) in cls.count_columns.items():
+            setattr(cls, column, cls._make_count_column(column, description))
+
+    @staticmethod
+    def _make_count_column(column, description):
+        @admin.display(description=description, ordering=column)
+        def display(self, obj):
+            return getattr(obj, column)
+        return display
+
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request)
+        distinct = len(self.count_columns) > 1
+        return queryset.annotate(**{
+            column: Count(relation, distinct=distinct)
+            for column, (relation, description) in self.count_columns.items()
+        })
 
 class OfficeServiceInline(admin.TabularInline):
     model = OfficeService
@@ -13,100 +53,264 @@ class EmployeeInline(admin.TabularInline):
     raw_id_fields = ['office']
 
 @admin.register(ServiceCategory)
-class ServiceCategoryAdmin(admin.ModelAdmin):
+class ServiceCategoryAdmin(CountColumnsMixin, admin.ModelAdmin):
     list_display = ['name', 'service_count']
     list_display_links = ['name']
     search_fields = ['name', 'description']
-    
-    @admin.display(description='Количество услуг')
-    def service_count(self, obj):
-        return obj.service_set.count()
+    count_columns = {'service_count': ('service', 'Количество услуг')}
 
 @admin.register(Service)
-class ServiceAdmin(admin.ModelAdmin):
+class ServiceAdmin(CountColumnsMixin, admin.ModelAdmin):
     list_display = ['name', 'category', 'execution_term', 'cost', 'office_count']
     list_filter = ['category', 'cost']
     list_display_links = ['name']
+    list_select_related = ['category']
     search_fields = ['name', 'description']
     raw_id_fields = ['category']
-    
-    @admin.display(description='Доступно в офисах')
-    def office_count(self, obj):
-        return obj.officeservice_set.count()
+    count_columns = {'office_count': ('officeservice', 'Доступно в офисах')}
 
 @admin.register(MFCOffice)
-class MFCOfficeAdmin(admin.ModelAdmin):
-    list_display = ['name', 'address', 'phone', 'employee_count']
+class MFCOfficeAdmin(CountColumnsMixin, admin.ModelAdmin):
+    list_display = ['name', 'address', 'phone', 'latitude', 'longitude', 'employee_count']
     list_filter = ['name']
     search_fields = ['name', 'address', 'phone']
     inlines = [EmployeeInline, OfficeServiceInline]
-    
-    @admin.display(description='Сотрудников')
-    def employee_count(self, obj):
-        return obj.employee_set.count()
+    count_columns = {'employee_count': ('employee', 'Сотрудников')}
 
 @admin.register(Employee)
-class EmployeeAdmin(admin.ModelAdmin):
+class EmployeeAdmin(CountColumnsMixin, admin.ModelAdmin):
     list_display = ['full_name', 'office', 'position', 'news_count']
     list_filter = ['position', 'office']
     list_display_links = ['full_name']
+    list_select_related = ['office']
     search_fields = ['full_name']
     raw_id_fields = ['office']
-    
-    @admin.display(description='Новостей')
-    def news_count(self, obj):
-        return obj.news_set.count()
+    count_columns = {'news_count': ('news', 'Новостей')}
 
 @admin.register(ApplicationStatus)
-class ApplicationStatusAdmin(admin.ModelAdmin):
+class ApplicationStatusAdmin(CountColumnsMixin, admin.ModelAdmin):
     list_display = ['name', 'application_count']
     list_display_links = ['name']
-    
-    @admin.display(description='Заявлений')
-    def application_count(self, obj):
-        return obj.application_set.count()
+    count_columns = {'application_count': ('application', 'Заявлений')}
+
+class ExportActionsMixin:
+    """Действия потоковой выгрузки выбранных строк (см. services/exports.py)"""
+    export_kind = None
+
+    @admin.action(description='Выгрузить в CSV')
+    def export_csv(self, request, queryset):
+        return exports.streaming_response(self.export_kind, queryset, 'csv')
+
+    @admin.action(description='Выгрузить в NDJSON')
+    def export_ndjson(self, request, queryset):
+        return exports.streaming_response(self.export_kind, queryset, 'ndjson')
+
+
+MONTH_NAMES = ['Январь', 'Февраль', 'Март', 'Апрель', 'Май', 'Июнь', 'Июль',
+               'Август', 'Сентябрь', 'Октябрь', 'Ноябрь', 'Декабрь']
+
+
+class CreatedDateFilter(admin.SimpleListFilter):
+    """Разбивка заявлений по году, месяцу и дню.
+
+    Замена date_hierarchy: варианты и числа заявлений берутся из
+    ApplicationDailyStat, а не из DISTINCT по таблице заявлений.
+    Значение параметра — 'ГГГГ', 'ГГГГ-ММ' или 'ГГГГ-ММ-ДД'.
+    """
+    title = 'Дата создания'
+    parameter_name = 'created'
+
+    def parse(self):
+        value = self.value()
+        if not value:
+            return None
+        try:
+            parts = [int(part) for part in value.split('-')]
+            if not 1 <= len(parts) <= 3:
+                raise ValueError(value)
+            date(parts[0], parts[1] if len(parts) > 1 else 1, parts[2] if len(parts) > 2 else 1)
+        except ValueError:
+            raise IncorrectLookupParameters(f'Некорректная дата: {value}')
+        return parts
+
+    def lookups(self, request, model_admin):
+        parts = self.parse() or []
+        days = ApplicationDailyStat.objects.order_by().filter(count__gt=0)
+        choices = []
+        if len(parts) >= 1:
+            choices.append((f'{parts[0]}', f'{parts[0]} год'))
+        if len(parts) >= 2:
+            choices.append((f'{parts[0]}-{parts[1]:02d}', f'{MONTH_NAMES[parts[1] - 1]} {parts[0]}'))
+
+        if not parts:
+            rows = days.annotate(key=ExtractYear('day')).values('key').annotate(total=Sum('count'))
+            children = [(f'{row["key"]}', f'{row["key"]} год ({row["total"]})') for row in rows]
+        elif len(parts) == 1:
+            rows = (days.filter(day__year=parts[0]).annotate(key=ExtractMonth('day'))
+                    .values('key').annotate(total=Sum('count')))
+            children = [
+                (f'{parts[0]}-{row["key"]:02d}', f'{MONTH_NAMES[row["key"] - 1]} ({row["total"]})')
+                for row in rows
+            ]
+        else:
+            rows = (days.filter(day__year=parts[0], day__month=parts[1]).annotate(key=ExtractDay('day'))
+                    .values('key', 'count'))
+            children = [
+                (f'{parts[0]}-{parts[1]:02d}-{row["key"]:02d}', f'{row["key"]} ({row["count"]})')
+                for row in rows
+            ]
+        return choices + sorted(children, reverse=not parts)
+
+    def queryset(self, request, queryset):
+        parts = self.parse()
+        if not parts:
+            return queryset
+        start = date(parts[0], parts[1] if len(parts) > 1 else 1, parts[2] if len(parts) > 2 else 1)
+        if len(parts) == 1:
+            end = date(parts[0] + 1, 1, 1)
+        elif len(parts) == 2:
+            end = (start + timedelta(days=31)).replace(day=1)
+        else:
+            end = start + timedelta(days=1)
+        # Диапазон по created_at, чтобы работал индекс
+        return queryset.filter(
+            created_at__gte=timezone.make_aware(datetime.combine(start, datetime.min.time())),
+            created_at__lt=timezone.make_aware(datetime.combine(end, datetime.min.time())),
+        )
+
+
+class ServiceCategoryFilter(admin.SimpleListFilter):
+    title = 'Категория услуги'
+    parameter_name = 'category'
+
+    def lookups(self, request, model_admin):
+        return [(category.id, category.name) for category in reference.categories()]
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(service__category_id=self.value())
+        return queryset
+
+    def choices(self, changelist):
+        # При смене категории выбранная услуга сбрасывается
+        yield {
+            'selected': self.value() is None,
+            'query_string': changelist.get_query_string(remove=[self.parameter_name, ServiceFilter.parameter_name]),
+            'display': 'Все',
+        }
+        for lookup, title in self.lookup_choices:
+            yield {
+                'selected': self.value() == str(lookup),
+                'query_string': changelist.get_query_string(
+                    {self.parameter_name: lookup}, [ServiceFilter.parameter_name]
+                ),
+                'display': title,
+            }
+
+
+class ServiceFilter(admin.SimpleListFilter):
+    """Услуги показываются только после выбора категории"""
+    title = 'Услуга'
+    parameter_name = 'service'
+
+    def lookups(self, request, model_admin):
+        category = request.GET.get(ServiceCategoryFilter.parameter_name)
+        if not category or not category.isdigit():
+            return []
+        return Service.objects.filter(category_id=category).values_list('id', 'name')
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(service_id=self.value())
+        return queryset
+
 
 @admin.register(Application)
-class ApplicationAdmin(admin.ModelAdmin):
+class ApplicationAdmin(ExportActionsMixin, admin.ModelAdmin):
     list_display = ['id', 'user_info', 'service', 'status', 'created_at', 'updated_at']
-    list_filter = ['status', 'created_at', 'service']
+    list_filter = ['status', CreatedDateFilter, ServiceCategoryFilter, ServiceFilter]
     list_display_links = ['id']
+    list_select_related = ['user', 'service', 'status']
     search_fields = ['user__username', 'service__name']
+    search_help_text = 'Номер заявления, начало логина заявителя, часть названия услуги, серия или номер паспорта, СНИЛС, ИНН'
     raw_id_fields = ['user', 'service', 'status']
     readonly_fields = ['created_at', 'updated_at']
-    date_hierarchy = 'created_at'
+    # Полное число строк не считается отдельным COUNT(*)
+    show_full_result_count = False
+    
+    def get_paginator(self, request, queryset, per_page, orphans=0, allow_empty_first_page=True):
+        return CachedCountPaginator(
+            queryset, per_page, orphans, allow_empty_first_page,
+            total=lambda: stats.get_counter(stats.APPLICATIONS),
+        )
+    
+    def get_search_results(self, request, queryset, search_term):
+        """Поиск по индексам вместо LIKE '%...%' через join.
+
+        Логин ищется по префиксу диапазоном по индексу lower(username)
+        (в SQLite lower() меняет регистр только латиницы), услуги —
+        в небольшой таблице услуг, заявления — по номеру и по
+        индексированным полям данных заявления.
+        """
+        term = search_term.strip()
+        if not term:
+            return queryset, False
+        prefix = term.lower()
+        users = (
+            User.objects.alias(username_lower=Lower('username'))
+            .filter(username_lower__gte=prefix, username_lower__lt=prefix + '\uffff')
+            .values('pk')
+        )
+        condition = Q(user__in=users) | Q(service__in=Service.objects.filter(name__icontains=term).values('pk'))
+        if term.isdigit():
+            # Номер заявления или значение индексированного поля данных (паспорт, СНИЛС, ИНН)
+            condition |= Q(pk=int(term)) | application_data.data_search_condition(term)
+            queryset = application_data.with_data_aliases(queryset)
+        return queryset.filter(condition), False
     
-    @admin.display(description='Пользователь')
+    @admin.display(description='Пользователь', ordering='user__username')
     def user_info(self, obj):
         return f"{obj.user.get_full_name()} ({obj.user.username})"
         
-    actions = ['mark_as_completed', 'mark_as_rejected']
+    export_kind = 'applications'
+    actions = ['mark_as_completed', 'mark_as_rejected', 'export_csv', 'export_ndjson']
     
     @admin.action(description='Пометить как выполненные')
     def mark_as_completed(self, request, queryset):
-        completed_status = ApplicationStatus.objects.get(name='Выполнено')
-        updated = queryset.update(status=completed_status)
+        completed_status = reference.status(ApplicationStatus.COMPLETED)
+        updated = self._change_status(queryset, completed_status)
         self.message_user(request, f'{updated} заявлений помечено как выполненные.')
     
     @admin.action(description='Пометить как отклоненные')
     def mark_as_rejected(self, request, queryset):
-        rejected_status = ApplicationStatus.objects.get(name='Отклонено')
-        updated = queryset.update(status=rejected_status)
+        rejected_status = reference.status(ApplicationStatus.REJECTED)
+        updated = self._change_status(queryset, rejected_status)
         self.message_user(request, f'{updated} заявлений помечено как отклоненные.')
+    
+    def _change_status(self, queryset, status):
+        """Меняет статус и ставит в очередь уведомления заявителям"""
+        with transaction.atomic():
+            ids = list(queryset.exclude(status=status).values_list('id', flat=True))
+            updated = Application.objects.filter(id__in=ids).update(status=status)
+            for application in Application.objects.filter(id__in=ids).select_related('user', 'service', 'status'):
+                send_application_status_notification(application)
+        return updated
 
 @admin.register(Appointment)
-class AppointmentAdmin(admin.ModelAdmin):
+class AppointmentAdmin(ExportActionsMixin, admin.ModelAdmin):
     list_display = ['id', 'user_info', 'office', 'service', 'appointment_datetime', 'status']
     list_filter = ['status', 'office', 'appointment_datetime']
     list_display_links = ['id']
+    list_select_related = ['user', 'office', 'service']
     search_fields = ['user__username', 'office__name']
     raw_id_fields = ['user', 'office', 'service']
     
-    @admin.display(description='Пользователь')
+    @admin.display(description='Пользователь', ordering='user__username')
     def user_info(self, obj):
         return obj.user.get_full_name() or obj.user.username
     
-    actions = ['mark_as_completed', 'cancel_appointments']
+    export_kind = 'appointments'
+    actions = ['mark_as_completed', 'cancel_appointments', 'export_csv', 'export_ndjson']
     
     @admin.action(description='Пометить как выполненные')
     def mark_as_completed(self, request, queryset):
@@ -122,6 +326,7 @@ class AppointmentAdmin(admin.ModelAdmin):
 class OfficeServiceAdmin(admin.ModelAdmin):
     list_display = ['office', 'service']
     list_filter = ['office']
+    list_select_related = ['office', 'service']
     raw_id_fields = ['office', 'service']
 
 @admin.register(News)
@@ -129,6 +334,7 @@ class NewsAdmin(admin.ModelAdmin):
     list_display = ['title', 'author', 'published_at', 'short_content']
     list_filter = ['published_at', 'author']
     list_display_links = ['title']
+    list_select_related = ['author']
     search_fields = ['title', 'content']
     raw_id_fields = ['author']
     date_hierarchy = 'published_at'
@@ -137,6 +343,21 @@ class NewsAdmin(admin.ModelAdmin):
     def short_content(self, obj):
         return obj.content[:100] + '...' if len(obj.content) > 100 else obj.content
 
+@admin.register(BackgroundTask)
+class BackgroundTaskAdmin(admin.ModelAdmin):
+    list_display = ['id', 'task_type', 'status', 'attempts', 'run_after', 'created_at']
+    list_filter = ['status', 'task_type']
+    readonly_fields = ['attempts', 'locked_by', 'locked_at', 'last_error', 'created_at', 'updated_at']
+    
+    actions = ['retry_tasks']
+    
+    @admin.action(description='Повторить выполнение')
+    def retry_tasks(self, request, queryset):
+        updated = queryset.exclude(status=BackgroundTask.STATUS_RUNNING).update(
+            status=BackgroundTask.STATUS_PENDING, attempts=0, run_after=timezone.now()
+        )
+        self.message_user(request, f'{updated} задач поставлено в очередь повторно.')
+
 # Регистрируем UserProfile отдельно
 from django.contrib.auth.admin import UserAdmin
 from django.contrib.auth.models import User
@@ -149,8 +370,9 @@ class UserProfileInline(admin.StackedInline):
 class CustomUserAdmin(UserAdmin):
     inlines = [UserProfileInline]
     list_display = ['username', 'email', 'first_name', 'last_name', 'get_snils', 'is_staff']
+    list_select_related = ['userprofile']
     
-    @admin.display(description='СНИЛС')
+    @admin.display(description='СНИЛС', ordering='userprofile__snils')
     def get_snils(self, obj):
         try:
             return obj.userprofile.snils
@@ -0,0 +1,188 @@
+"""Структурированные данные заявления.
+
+Application.application_data — JSON-объект. Свободный текст заявителя
+хранится под ключом ``comment``, остальные ключи задаёт схема услуги
+(Service.data_schema) — список описаний полей:
+
+    [{"name": "passport_series", "label": "Серия паспорта", "type": "string",
+      "required": true, "pattern": "^\\d{4}$"}, ...]
+
+Ключи из INDEXED_KEYS проиндексированы выражением json_extract (см.
+индексы модели Application), поэтому отбор по ним через filter_by_data
+идёт по индексу, а не разбором JSON в каждой строке.
+"""
+from datetime import date
+import ast
+import json
+import re
+
+from django import forms
+from django.core.exceptions import ValidationError
+from django.core.validators import RegexValidator
+from django.db.models import Func, Q, TextField
+
+COMMENT_KEY = 'comment'
+# Поля формы по схеме называются с префиксом, чтобы не совпасть с полями модели
+FORM_FIELD_PREFIX = 'data_'
+
+# Ключи данных заявления, по которым построены индексы
+INDEXED_KEYS = ('passport_series', 'passport_number', 'snils', 'inn')
+
+KEY_RE = re.compile(r'[A-Za-z_][A-Za-z0-9_]*')
+
+
+def parse_legacy_text(text):
+    """Словарь из текстового поля данных прежнего формата или None.
+
+    Кроме JSON понимает repr словаря Python ({'key': 'value'}) — так
+    данные записывал прежний генератор тестовых данных.
+    """
+    text = (text or '').strip()
+    if not text.startswith('{'):
+        return None
+    try:
+        value = json.loads(text)
+    except ValueError:
+        try:
+            value = ast.literal_eval(text)
+        except (ValueError, SyntaxError, MemoryError, RecursionError):
+            return None
+    if not isinstance(value, dict):
+        return None
+    # Значения, которых нет в JSON (множества, байты), сохраняются строкой
+    return json.loads(json.dumps(value, ensure_ascii=False, default=str))
+
+
+class JSONExtract(Func):
+    """Значение ключа JSON-поля: json_extract(поле, '$.ключ').
+
+    В отличие от встроенных KeyTransform путь подставляется в SQL
+    литералом, а не параметром: только так SQLite сопоставляет условие
+    запроса с индексом по тому же выражению.
+    """
+    function = 'JSON_EXTRACT'
+    output_field = TextField()
+
+    def __init__(self, expression, key, **extra):
+        if not KEY_RE.fullmatch(key):
+            raise ValueError(f'Invalid JSON key: {key!r}')
+        self.key = key
+        super().__init__(expression, **extra)
+
+    def as_sql(self, compiler, connection, **extra_context):
+        extra_context.setdefault('template', f"%(function)s(%(expressions)s, '$.{self.key}')")
+        return super().as_sql(compiler, connection, **extra_context)
+
+    def as_postgresql(self, compiler, connection, **extra_context):
+        return super().as_sql(
+            compiler, connection, template=f"(%(expressions)s ->> '{self.key}')", **extra_context
+        )
+
+
+def filter_by_data(queryset, **values):
+    """Отбор заявлений по значениям ключей данных: filter_by_data(qs, passport_series='4510')"""
+    for key, value in values.items():
+        if key in INDEXED_KEYS:
+            alias = f'data_{key}'
+            queryset = queryset.alias(**{alias: JSONExtract('application_data', key)}).filter(**{alias: value})
+        else:
+            queryset = queryset.filter(**{f'application_data__{key}': value})
+    return queryset
+
+
+def data_search_condition(term):
+    """Условие «значение одного из индексированных ключей равно term»"""
+    condition = Q()
+    for key in INDEXED_KEYS:
+        condition |= Q(**{f'data_{key}': term})
+    return condition
+
+
+def with_data_aliases(queryset):
+    return queryset.alias(**{f'data_{key}': JSONExtract('application_data', key) for key in INDEXED_KEYS})
+
+
+# Тип поля схемы -> (поле формы, преобразование значения для JSON)
+FIELD_TYPES = {
+    'string': (lambda **kwargs: forms.CharField(max_length=200, **kwargs), str),
+    'text': (lambda **kwargs: forms.CharField(widget=forms.Textarea(attrs={'rows': 3}), **kwargs), str),
+    'integer': (lambda **kwargs: forms.IntegerField(**kwargs), int),
+    'date': (lambda **kwargs: forms.DateField(widget=forms.DateInput(attrs={'type': 'date'}), **kwargs),
+             lambda value: value.isoformat()),
+}
+
+
+def validate_schema(schema):
+    """Проверяет описание полей услуги; ValidationError при ошибке"""
+    if not isinstance(schema, list):
+        raise ValidationError('Схема данных должна быть списком полей.')
+    names = set()
+    for field in schema:
+        if not isinstance(field, dict) or not KEY_RE.fullmatch(str(field.get('name', ''))):
+            raise ValidationError(f'У поля схемы должно быть имя из латинских букв, цифр и «_»: {field!r}')
+        name = field['name']
+        if name == COMMENT_KEY or name in names:
+            raise ValidationError(f'Недопустимое или повторяющееся имя поля: {name}')
+        names.add(name)
+        if field.get('type', 'string') not in FIELD_TYPES:
+            raise ValidationError(f'Неизвестный тип поля {name}: {field.get("type")}')
+        if field.get('pattern'):
+            try:
+                re.compile(field['pattern'])
+            except re.error as e:
+                raise ValidationError(f'Некорректный шаблон поля {name}: {e}')
+
+
+def form_fields(schema):
+    """Поля формы по схеме услуги: {имя поля формы: поле формы}"""
+    fields = {}
+    for field in schema or []:
+        make_field, convert = FIELD_TYPES[field.get('type', 'string')]
+        kwargs = {'label': field.get('label', field['name']), 'required': field.get('required', False)}
+        form_field = make_field(**kwargs)
+        if field.get('pattern'):
+            form_field.validators.append(
+                RegexValidator(field['pattern'], message=field.get('pattern_error', 'Неверный формат значения.'))
+            )
+        if field.get('help_text'):
+            form_field.help_text = field['help_text']
+        fields[FORM_FIELD_PREFIX + field['name']] = form_field
+    return fields
+
+
+def to_json(schema, cleaned_data):
+    """Значения полей схемы из cleaned_data в виде, пригодном для JSON"""
+    data = {}
+    for field in schema or []:
+        value = cleaned_data.get(FORM_FIELD_PREFIX + field['name'])
+        if value in (None, ''):
+            continue
+        data[field['name']] = FIELD_TYPES[field.get('type', 'string')][1](value)
+    return data
+
+
+def from_json(schema, data):
+    """Начальные значения полей формы по схеме из сохранённых данных"""
+    initial = {}
+    for field in schema or []:
+        value = (data or {}).get(field['name'])
+        if value is not None and field.get('type') == 'date':
+            try:
+                value = date.fromisoformat(value)
+            except (TypeError, ValueError):
+                pass
+        initial[FORM_FIELD_PREFIX + field['name']] = value
+    return initial
+
+
+def display_items(schema, data):
+    """Пары (подпись, значение) для показа данных заявления"""
+    data = data or {}
+    labels = {field['name']: field.get('label', field['name']) for field in schema or []}
+    items = [(labels[key], data[key]) for key in labels if data.get(key) not in (None, '')]
+    # Ключи, которых уже нет в схеме услуги, тоже показываем
+    items += [
+        (key, value) for key, value in data.items()
+        if key not in labels and key != COMMENT_KEY and value not in (None, '')
+    ]
+    return items
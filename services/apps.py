@@ -4,3 +4,14 @@ from django.apps import AppConfig
 class ServicesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'services'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        from django.core.signals import request_started
+        from django.db.backends.signals import connection_created
+        from . import db, middleware, reference
+        connection_created.connect(db.configure_connection, dispatch_uid='sqlite_pragmas')
+        connection_created.connect(middleware.install_query_hook, dispatch_uid='sql_instrumentation')
+        # Обращаться к базе в ready() нельзя, поэтому справочники
+        # загружаются при первом запросе процесса
+        request_started.connect(reference.warm_up, dispatch_uid='reference_warm_up')
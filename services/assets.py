@@ -0,0 +1,141 @@
+"""Статические файлы: имена с хешем содержимого, предварительное сжатие
+и отдача с долгим кэшированием.
+
+CompressedManifestStaticFilesStorage при ``collectstatic`` записывает
+рядом с каждым текстовым файлом варианты .gz и .br (brotli — если
+установлен пакет brotli). Файлы с хешем в имени не меняются, поэтому
+serve отдаёт их с Cache-Control на год и immutable, а остальные — на
+MFC_SETTINGS['STATIC_CACHE']['MAX_AGE'] секунд. Сжатый вариант
+выбирается по весам (q) в Accept-Encoding.
+"""
+import gzip
+import mimetypes
+import os
+import re
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.base import ContentFile
+from django.http import FileResponse, Http404, HttpResponseNotModified
+from django.utils._os import safe_join
+from django.utils.http import http_date
+from django.views.static import was_modified_since
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_EXTENSIONS = ('.css', '.js', '.svg', '.json', '.txt', '.xml', '.html', '.map', '.ico')
+# Мелкие файлы не сжимаем: выигрыш меньше накладных расходов
+MIN_COMPRESS_SIZE = 256
+
+# Расширение варианта -> значение Content-Encoding, в порядке предпочтения
+ENCODINGS = [('.br', 'br'), ('.gz', 'gzip')]
+
+HASHED_NAME_RE = re.compile(r'\.[0-9a-f]{12}\.[^./]+$')
+
+
+def compress_variants(data):
+    """Сжатые варианты содержимого: {расширение: байты}, только если они меньше"""
+    variants = {'.gz': gzip.compress(data, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        variants['.br'] = brotli.compress(data, quality=11)
+    return {suffix: compressed for suffix, compressed in variants.items() if len(compressed) < len(data)}
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    def post_process(self, paths, dry_run=False, **options):
+        names = set()
+        for name, hashed_name, processed in super().post_process(paths, dry_run, **options):
+            if not isinstance(processed, Exception):
+                names.update(filter(None, (name, hashed_name)))
+            yield name, hashed_name, processed
+        if dry_run:
+            return
+        for name in sorted(names):
+            if name.endswith(COMPRESSIBLE_EXTENSIONS):
+                self.compress(name)
+
+    def compress(self, name):
+        with self.open(name) as f:
+            data = f.read()
+        if len(data) < MIN_COMPRESS_SIZE:
+            return
+        for suffix, compressed in compress_variants(data).items():
+            if self.exists(name + suffix):
+                self.delete(name + suffix)
+            self._save(name + suffix, ContentFile(compressed))
+
+
+def max_age(path):
+    cache_settings = settings.MFC_SETTINGS['STATIC_CACHE']
+    if HASHED_NAME_RE.search(path):
+        return cache_settings['HASHED_MAX_AGE']
+    return cache_settings['MAX_AGE']
+
+
+def accepted_encodings(header):
+    """Веса кодировок из Accept-Encoding: {'gzip': 1.0, 'br': 0.0, ...}"""
+    weights = {}
+    for item in (header or '').split(','):
+        token, *params = item.split(';')
+        token = token.strip().lower()
+        if not token:
+            continue
+        weight = 1.0
+        for param in params:
+            name, _, value = param.partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    weight = float(value)
+                except ValueError:
+                    weight = 0.0
+        weights[token] = weight
+    return weights
+
+
+def choose_encoding(header, available):
+    """Кодировка из available (в порядке предпочтения) или None — без сжатия"""
+    weights = accepted_encodings(header)
+    default = weights.get('*', 0.0)
+    best, best_weight = None, 0.0
+    for name in available:
+        weight = weights.get(name, default)
+        if weight > best_weight:
+            best, best_weight = name, weight
+    # Несжатый ответ предпочтительнее, только если клиент дал ему больший вес
+    if best is not None and weights.get('identity', 0.0) > best_weight:
+        return None
+    return best
+
+
+def serve(request, path):
+    """Отдача файла из STATIC_ROOT со сжатым вариантом и заголовками кэширования"""
+    # Путь за пределами STATIC_ROOT — SuspiciousFileOperation (ответ 400)
+    full_path = safe_join(settings.STATIC_ROOT, path)
+    if not os.path.isfile(full_path):
+        raise Http404(path)
+
+    stat = os.stat(full_path)
+    if not was_modified_since(request.META.get('HTTP_IF_MODIFIED_SINCE'), stat.st_mtime):
+        response = HttpResponseNotModified()
+    else:
+        content_type, _ = mimetypes.guess_type(full_path)
+        variants = {name: full_path + suffix for suffix, name in ENCODINGS if os.path.isfile(full_path + suffix)}
+        encoding = choose_encoding(request.META.get('HTTP_ACCEPT_ENCODING'), list(variants))
+        response = FileResponse(
+            open(variants.get(encoding, full_path), 'rb'),
+            content_type=content_type or 'application/octet-stream',
+        )
+        # FileResponse подставляет имя открытого файла; для CSS и JS оно не нужно
+        response.headers.pop('Content-Disposition', None)
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+    response.headers['Last-Modified'] = http_date(stat.st_mtime)
+    response.headers['Vary'] = 'Accept-Encoding'
+    cache_control = f'public, max-age={max_age(path)}'
+    if HASHED_NAME_RE.search(path):
+        cache_control += ', immutable'
+    response.headers['Cache-Control'] = cache_control
+    return response
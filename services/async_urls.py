@@ -0,0 +1,27 @@
+"""Маршруты приложения для ASGI.
+
+Те же пути и имена, что в services/urls.py, но читающие страницы
+обслуживаются асинхронными представлениями из services/async_views.py.
+"""
+from django.urls import path
+
+from . import async_views, urls
+
+app_name = urls.app_name
+
+# Имя маршрута -> асинхронное представление
+ASYNC_VIEWS = {
+    'home': async_views.home,
+    'service_list': async_views.service_list,
+    'service_detail': async_views.service_detail,
+    'service_catalog': async_views.service_catalog,
+    'news_list': async_views.news_list,
+    'news_detail': async_views.news_detail,
+    'search': async_views.search,
+    'search_suggestions': async_views.search_suggestions,
+}
+
+urlpatterns = [
+    path(str(pattern.pattern), ASYNC_VIEWS.get(pattern.name, pattern.callback), name=pattern.name)
+    for pattern in urls.urlpatterns
+]
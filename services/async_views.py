@@ -0,0 +1,197 @@
+"""Асинхронные варианты читающих страниц для запуска под ASGI.
+
+Подключаются через services/async_urls.py (корневой MFC/asgi_urls.py,
+который выбирает MFC/asgi.py), остальные маршруты остаются синхронными.
+Независимые запросы (виджеты главной страницы, группы результатов
+поиска) запускаются одновременно через asyncio.gather.
+
+В Django 4.2 асинхронный ORM выполняет запросы через sync_to_async в
+общем потоке, поэтому сами SQL-запросы одного обращения идут по очереди;
+выигрыш в том, что ожидающий базу запрос не занимает поток сервера.
+Шаблоны рендерятся через sync_to_async: ленивые обращения к связанным
+объектам в шаблоне недопустимы в асинхронном контексте.
+"""
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db.models import Q
+from django.http import Http404, HttpResponse, JsonResponse
+from django.shortcuts import render
+
+from . import availability, catalog, suggestions, widgets
+from . import search as search_index
+from .conditional import conditional_page
+from .models import MFCOffice, News, Service
+from .pagination import paginate
+from .views import SEARCH_RESULT_GROUPS, logger
+from .widgets import alist
+
+arender = sync_to_async(render)
+
+
+async def aget_object_or_404(queryset, **kwargs):
+    try:
+        return await queryset.aget(**kwargs)
+    except queryset.model.DoesNotExist:
+        raise Http404(f'No {queryset.model._meta.object_name} matches the given query.')
+
+
+async def home(request):
+    """Главная страница с виджетами"""
+    try:
+        latest_news, popular_services, offices, stats = await asyncio.gather(
+            widgets.alatest_news(),
+            widgets.apopular_services(),
+            widgets.arandom_offices(),
+            widgets.asite_stats(),
+        )
+        context = {
+            'latest_news': latest_news,
+            'popular_services': popular_services,
+            'offices': offices,
+            'stats': stats,
+        }
+        return await arender(request, 'services/home.html', context)
+    except Exception as e:
+        return HttpResponse(f"Ошибка при загрузке главной страницы: {e}")
+
+
+@conditional_page('services')
+async def service_list(request):
+    """Список услуг с фильтрами по категории и стоимости"""
+    try:
+        try:
+            query, category_id, cost = catalog.parse_filters(request.GET)
+        except catalog.InvalidFilter:
+            query, category_id, cost = request.GET.get('q', '').strip(), None, None
+        services, facets = await sync_to_async(catalog.catalog_page)(request, query, category_id, cost)
+
+        context = {
+            'services': services,
+            'page': services,
+            'facets': facets,
+            'query': query,
+            'selected_category': category_id,
+            'selected_cost': cost,
+        }
+        return await arender(request, 'services/service_list.html', context)
+    except Exception as e:
+        logger.exception("Error in service_list: %s", e)
+        return HttpResponse(f"Ошибка при загрузке услуг: {e}")
+
+
+@conditional_page('services')
+async def service_catalog(request):
+    """API каталога услуг: ?q=&category=&cost=&after= — страница, общее число и счётчики фасетов"""
+    try:
+        query, category_id, cost = catalog.parse_filters(request.GET)
+    except catalog.InvalidFilter:
+        return JsonResponse({'error': 'Некорректные параметры запроса'}, status=400)
+    data = await sync_to_async(lambda: catalog.as_json(*catalog.catalog_page(request, query, category_id, cost)))()
+    return JsonResponse(data)
+
+
+@conditional_page('services', 'offices')
+async def service_detail(request, service_id):
+    """Детальная страница услуги"""
+    try:
+        service = await aget_object_or_404(Service.objects.select_related('category'), id=service_id)
+        offices_with_service = await sync_to_async(availability.offices_for)(service)
+        context = {
+            'service': service,
+            'offices_with_service': offices_with_service,
+        }
+        return await arender(request, 'services/service_detail.html', context)
+    except Http404:
+        raise
+    except Exception as e:
+        return HttpResponse(f"Ошибка при загрузке услуги: {e}")
+
+
+@conditional_page('news', 'offices')
+async def news_list(request):
+    """Список новостей"""
+    try:
+        news_list = await sync_to_async(paginate)(
+            request,
+            News.objects.select_related('author', 'author__office'),
+            ordering=('-published_at', 'id'),
+        )
+        context = {
+            'news_list': news_list,
+            'page': news_list,
+        }
+        return await arender(request, 'services/news_list.html', context)
+    except Exception as e:
+        return HttpResponse(f"Ошибка при загрузке новостей: {e}")
+
+
+@conditional_page('news', 'offices')
+async def news_detail(request, news_id):
+    """Детальная страница новости"""
+    try:
+        news, related_news_list = await asyncio.gather(
+            aget_object_or_404(News.objects.select_related('author', 'author__office'), id=news_id),
+            alist(News.objects.exclude(id=news_id).select_related('author')[:3]),
+        )
+        context = {
+            'news': news,
+            'related_news_list': related_news_list,
+        }
+        return await arender(request, 'services/news_detail.html', context)
+    except Http404:
+        raise
+    except Exception as e:
+        return HttpResponse(f"Ошибка при загрузке новости: {e}")
+
+
+async def search(request):
+    """Полнотекстовый поиск"""
+    try:
+        query = request.GET.get('q', '')
+        results = {}
+
+        if query:
+            if search_index.is_available():
+                hits = await search_index.asearch(
+                    query, limit=settings.MFC_SETTINGS['SEARCH_RESULTS_LIMIT']
+                )
+                results = {'services': [], 'offices': [], 'news': []}
+                for doc_type, obj in hits:
+                    results[SEARCH_RESULT_GROUPS[doc_type]].append(obj)
+                results['ranked'] = hits
+            else:
+                services, offices, news = await asyncio.gather(
+                    alist(Service.objects.filter(
+                        Q(name__icontains=query) |
+                        Q(description__icontains=query)
+                    ).select_related('category')[:10]),
+                    alist(MFCOffice.objects.filter(
+                        Q(name__icontains=query) |
+                        Q(address__icontains=query)
+                    )[:10]),
+                    alist(News.objects.filter(
+                        Q(title__icontains=query) |
+                        Q(content__icontains=query)
+                    ).select_related('author')[:10]),
+                )
+                results = {'services': services, 'offices': offices, 'news': news}
+
+        context = {
+            'query': query,
+            'results': results,
+        }
+        return await arender(request, 'services/search.html', context)
+    except Exception as e:
+        return HttpResponse(f"Ошибка при поиске: {e}")
+
+
+async def search_suggestions(request):
+    """API для подсказок поиска"""
+    try:
+        query = request.GET.get('q', '')
+        return JsonResponse({'suggestions': await sync_to_async(suggestions.suggest)(query)})
+    except Exception as e:
+        logger.exception("Error in search_suggestions: %s", e)
+        return JsonResponse({'suggestions': []})
@@ -0,0 +1,101 @@
+"""Матрица доступности услуг в офисах в памяти процесса.
+
+Связи OfficeService хранятся битовыми множествами: офисы и услуги,
+встречающиеся в связях, получают плотные порядковые номера, и для каждого
+офиса хранится целое число с битами номеров оказываемых услуг, а для
+каждой услуги — биты номеров офисов. Размер масок зависит от числа
+офисов и услуг, а не от наибольшего id. Проверка «услуга оказывается в
+офисе» — это проверка одного бита без запроса к базе.
+
+Матрица перестраивается одним запросом, когда меняется версия
+пространства имён 'offices' (её поднимает сохранение и удаление
+OfficeService, см. services/signals.py), так же как снимки в
+services/reference.py.
+"""
+import threading
+
+from . import reference
+from .caching import get_version
+from .models import OfficeService
+
+
+def bit_ids(mask):
+    """Номера установленных битов по возрастанию"""
+    ids = []
+    while mask:
+        low = mask & -mask
+        ids.append(low.bit_length() - 1)
+        mask ^= low
+    return ids
+
+
+class AvailabilityMatrix:
+    def __init__(self, version, pairs):
+        self.version = version
+        pairs = list(pairs)
+        # Порядковый номер -> id и обратно
+        self.office_list = sorted({office_id for office_id, service_id in pairs})
+        self.service_list = sorted({service_id for office_id, service_id in pairs})
+        self.office_ordinals = {pk: ordinal for ordinal, pk in enumerate(self.office_list)}
+        self.service_ordinals = {pk: ordinal for ordinal, pk in enumerate(self.service_list)}
+        self.services_by_office = {}
+        self.offices_by_service = {}
+        for office_id, service_id in pairs:
+            self.services_by_office[office_id] = (
+                self.services_by_office.get(office_id, 0) | 1 << self.service_ordinals[service_id]
+            )
+            self.offices_by_service[service_id] = (
+                self.offices_by_service.get(service_id, 0) | 1 << self.office_ordinals[office_id]
+            )
+
+    def is_offered(self, office_id, service_id):
+        ordinal = self.service_ordinals.get(service_id)
+        return ordinal is not None and bool(self.services_by_office.get(office_id, 0) >> ordinal & 1)
+
+    def service_ids(self, office_id):
+        return [self.service_list[ordinal] for ordinal in bit_ids(self.services_by_office.get(office_id, 0))]
+
+    def office_ids(self, service_id):
+        return [self.office_list[ordinal] for ordinal in bit_ids(self.offices_by_service.get(service_id, 0))]
+
+
+_matrix = None
+_lock = threading.Lock()
+
+
+def get_matrix():
+    global _matrix
+    version = get_version('offices')
+    matrix = _matrix
+    if matrix is None or matrix.version != version:
+        with _lock:
+            matrix = _matrix
+            if matrix is None or matrix.version != version:
+                matrix = AvailabilityMatrix(version, OfficeService.objects.values_list('office_id', 'service_id'))
+                _matrix = matrix
+    return matrix
+
+
+def _pk(value):
+    return getattr(value, 'pk', value)
+
+
+def is_offered(office, service):
+    """Оказывается ли услуга в офисе; принимает объекты или id"""
+    return get_matrix().is_offered(_pk(office), _pk(service))
+
+
+def _in_model_order(source, ids):
+    snapshot = reference.get_snapshot(source)
+    found = [snapshot.by_id[pk] for pk in ids if pk in snapshot.by_id]
+    return sorted(found, key=lambda obj: snapshot.positions[obj.pk])
+
+
+def offices_for(service):
+    """Офисы, где оказывается услуга, из снимка справочника в порядке модели"""
+    return _in_model_order('offices', get_matrix().office_ids(_pk(service)))
+
+
+def services_at(office):
+    """Услуги офиса из снимка справочника в порядке модели"""
+    return _in_model_order('services', get_matrix().service_ids(_pk(office)))
@@ -0,0 +1,469 @@
+"""Двухуровневый кэш: LRU в памяти процесса перед общим кэшем в SQLite.
+
+L1 — небольшой словарь LRU в памяти процесса, L2 — SQLiteCache: таблица
+в файле cache.sqlite3 каталога LOCATION, общего для всех процессов
+сервера. Чтение идёт сначала из L1, при промахе — из L2 с сохранением в
+L1.
+
+Запись в L2 — одна вставка по первичному ключу. Лишние записи сверх
+MAX_ENTRIES удаляются не при каждой записи, а раз в CULL_EVERY записей
+процесса: сначала просроченные, затем ближайшие к истечению (стандартный
+FileBasedCache при каждой записи перебирал все файлы каталога).
+
+Изменение в одном процессе не удаляет записи из L1 других процессов,
+поэтому:
+
+* ключи версий (L1_BYPASS_PREFIXES, по умолчанию 'mfc:version:', см.
+  services/caching.py) в L1 не попадают и всегда читаются из L2 —
+  подъём версии сразу виден всем процессам;
+* значения под ключами с версией не меняются, а прочие записи живут в L1
+  не дольше L1_TIMEOUT секунд.
+
+get_or_set вычисляет отсутствующее значение один раз (single-flight):
+потоки процесса ждут на блокировке ключа, другие процессы — на строке
+блокировки в таблице L2, пока вычисляющий не сохранит результат.
+
+Счётчики попаданий и промахов процесса возвращает stats(); раз в
+STATS_FLUSH_SECONDS они записываются в каталог кэша, сводку по всем
+процессам показывает команда ``cache_stats``.
+"""
+from collections import Counter, OrderedDict
+import json
+import os
+import pickle
+import socket
+import sqlite3
+import tempfile
+import threading
+import time
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+_MISSING = object()
+
+LOCK_STRIPES = 64
+
+
+class SQLiteCache(BaseCache):
+    """Кэш в таблице SQLite, общий для процессов одной машины.
+
+    Соединение у каждого потока своё, файл в режиме WAL: чтения не ждут
+    записей. Значения хранятся в pickle, expires — время истечения по
+    time.time() или NULL для бессрочных записей.
+    """
+    pickle_protocol = pickle.HIGHEST_PROTOCOL
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._dir = os.path.abspath(location)
+        self._path = os.path.join(self._dir, 'cache.sqlite3')
+        self._db_timeout = options.get('DB_TIMEOUT', 5)
+        self._cull_every = options.get('CULL_EVERY', 100)
+        self._local = threading.local()
+        self._sets = 0
+        self._sets_lock = threading.Lock()
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        # После fork соединение родителя использовать нельзя
+        if conn is None or self._local.pid != os.getpid():
+            os.makedirs(self._dir, exist_ok=True)
+            conn = sqlite3.connect(self._path, timeout=self._db_timeout, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=wal')
+            conn.execute('PRAGMA synchronous=normal')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL)'
+            )
+            conn.execute('CREATE INDEX IF NOT EXISTS cache_expires ON cache (expires)')
+            conn.execute('CREATE TABLE IF NOT EXISTS locks (key TEXT PRIMARY KEY, expires REAL NOT NULL)')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _key(self, key, version):
+        key = self.make_key(key, version)
+        self.validate_key(key)
+        return key
+
+    def _dumps(self, value):
+        return pickle.dumps(value, self.pickle_protocol)
+
+    def get(self, key, default=None, version=None):
+        row = self._connection().execute(
+            'SELECT value FROM cache WHERE key = ? AND (expires IS NULL OR expires > ?)',
+            (self._key(key, version), time.time()),
+        ).fetchone()
+        return default if row is None else pickle.loads(row[0])
+
+    def get_many(self, keys, version=None):
+        cache_keys = {self._key(key, version): key for key in keys}
+        if not cache_keys:
+            return {}
+        placeholders = ','.join('?' * len(cache_keys))
+        rows = self._connection().execute(
+            f'SELECT key, value FROM cache WHERE key IN ({placeholders}) AND (expires IS NULL OR expires > ?)',
+            (*cache_keys, time.time()),
+        )
+        return {cache_keys[cache_key]: pickle.loads(value) for cache_key, value in rows}
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        cache_key = self._key(key, version)
+        expires = self.get_backend_timeout(timeout)
+        conn = self._connection()
+        if expires is not None and expires <= time.time():
+            conn.execute('DELETE FROM cache WHERE key = ?', (cache_key,))
+            return
+        conn.execute(
+            'INSERT OR REPLACE INTO cache (key, value, expires) VALUES (?, ?, ?)',
+            (cache_key, self._dumps(value), expires),
+        )
+        self._maybe_cull()
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        cache_key = self._key(key, version)
+        expires = self.get_backend_timeout(timeout)
+        now = time.time()
+        conn = self._connection()
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            conn.execute('DELETE FROM cache WHERE key = ? AND expires <= ?', (cache_key, now))
+            if expires is not None and expires <= now:
+                return False
+            added = conn.execute(
+                'INSERT OR IGNORE INTO cache (key, value, expires) VALUES (?, ?, ?)',
+                (cache_key, self._dumps(value), expires),
+            ).rowcount == 1
+        if added:
+            self._maybe_cull()
+        return added
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        return self._connection().execute(
+            'UPDATE cache SET expires = ? WHERE key = ? AND (expires IS NULL OR expires > ?)',
+            (self.get_backend_timeout(timeout), self._key(key, version), time.time()),
+        ).rowcount == 1
+
+    def delete(self, key, version=None):
+        return self._connection().execute(
+            'DELETE FROM cache WHERE key = ?', (self._key(key, version),)
+        ).rowcount == 1
+
+    def has_key(self, key, version=None):
+        return self.get(key, _MISSING, version) is not _MISSING
+
+    def incr(self, key, delta=1, version=None):
+        cache_key = self._key(key, version)
+        conn = self._connection()
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            row = conn.execute(
+                'SELECT value FROM cache WHERE key = ? AND (expires IS NULL OR expires > ?)',
+                (cache_key, time.time()),
+            ).fetchone()
+            if row is None:
+                raise ValueError(f"Key '{key}' not found")
+            value = pickle.loads(row[0]) + delta
+            conn.execute('UPDATE cache SET value = ? WHERE key = ?', (self._dumps(value), cache_key))
+        return value
+
+    def clear(self):
+        conn = self._connection()
+        conn.execute('DELETE FROM cache')
+        conn.execute('DELETE FROM locks')
+
+    def _maybe_cull(self):
+        with self._sets_lock:
+            self._sets += 1
+            due = self._sets % self._cull_every == 0
+        if due:
+            self.cull()
+
+    def cull(self):
+        """Удаляет просроченные записи и, если записей больше MAX_ENTRIES,
+        ближайшие к истечению с запасом 1/CULL_FREQUENCY"""
+        conn = self._connection()
+        conn.execute('DELETE FROM cache WHERE expires <= ?', (time.time(),))
+        count = conn.execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+        if count <= self._max_entries:
+            return
+        excess = count - self._max_entries
+        if self._cull_frequency:
+            excess += self._max_entries // self._cull_frequency
+        conn.execute(
+            'DELETE FROM cache WHERE key IN ('
+            'SELECT key FROM cache ORDER BY expires IS NULL, expires LIMIT ?)',
+            (excess,),
+        )
+
+    def count(self):
+        return self._connection().execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+
+    # Межпроцессная блокировка для single-flight TwoTierCache.get_or_set
+
+    def acquire_lock(self, key, version, timeout):
+        """Захватывает блокировку ключа; блокировку аварийно завершившегося
+        процесса снимает по истечении timeout секунд"""
+        cache_key = self._key(key, version)
+        now = time.time()
+        conn = self._connection()
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            conn.execute('DELETE FROM locks WHERE key = ? AND expires <= ?', (cache_key, now))
+            return conn.execute(
+                'INSERT OR IGNORE INTO locks (key, expires) VALUES (?, ?)', (cache_key, now + timeout)
+            ).rowcount == 1
+
+    def release_lock(self, key, version):
+        self._connection().execute('DELETE FROM locks WHERE key = ?', (self._key(key, version),))
+
+    def is_locked(self, key, version):
+        return self._connection().execute(
+            'SELECT 1 FROM locks WHERE key = ? AND expires > ?', (self._key(key, version), time.time())
+        ).fetchone() is not None
+
+
+class TwoTierCache(BaseCache):
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._l2 = SQLiteCache(location, params)
+        self._dir = self._l2._dir
+        self._l1 = OrderedDict()
+        self._l1_lock = threading.Lock()
+        self._l1_max_entries = options.get('L1_MAX_ENTRIES', 1000)
+        self._l1_timeout = options.get('L1_TIMEOUT', 60)
+        self._bypass_prefixes = tuple(options.get('L1_BYPASS_PREFIXES', ('mfc:version:',)))
+        self._lock_timeout = options.get('LOCK_TIMEOUT', 30)
+        self._lock_poll = options.get('LOCK_POLL_SECONDS', 0.02)
+        self._flight_locks = [threading.Lock() for _ in range(LOCK_STRIPES)]
+        self._stats = Counter()
+        self._stats_lock = threading.Lock()
+        self._stats_flush = options.get('STATS_FLUSH_SECONDS', 30)
+        self._stats_flushed_at = time.monotonic()
+
+    # L1
+
+    def _in_l1(self, key):
+        return not key.startswith(self._bypass_prefixes)
+
+    def _l1_get(self, key, version):
+        cache_key = self.make_key(key, version)
+        with self._l1_lock:
+            entry = self._l1.get(cache_key)
+            if entry is None:
+                return _MISSING
+            expires, data = entry
+            if expires <= time.monotonic():
+                del self._l1[cache_key]
+                return _MISSING
+            self._l1.move_to_end(cache_key)
+        return pickle.loads(data)
+
+    def _l1_set(self, key, value, timeout, version):
+        if not self._in_l1(key):
+            return
+        timeout = self._l2_timeout(timeout)
+        ttl = self._l1_timeout if timeout is None else min(timeout, self._l1_timeout)
+        if ttl <= 0:
+            self._l1_delete(key, version)
+            return
+        data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        cache_key = self.make_key(key, version)
+        with self._l1_lock:
+            self._l1[cache_key] = (time.monotonic() + ttl, data)
+            self._l1.move_to_end(cache_key)
+            while len(self._l1) > self._l1_max_entries:
+                self._l1.popitem(last=False)
+
+    def _l1_delete(self, key, version):
+        with self._l1_lock:
+            self._l1.pop(self.make_key(key, version), None)
+
+    # Интерфейс BaseCache
+
+    def get(self, key, default=None, version=None):
+        value, counter = self._lookup(key, version)
+        self._count(counter)
+        return default if value is _MISSING else value
+
+    def _lookup(self, key, version):
+        """Значение из L1 или L2 и имя счётчика для метрик"""
+        if self._in_l1(key):
+            value = self._l1_get(key, version)
+            if value is not _MISSING:
+                return value, 'l1_hits'
+        value = self._l2.get(key, _MISSING, version)
+        if value is _MISSING:
+            return value, 'misses'
+        self._l1_set(key, value, self._l1_timeout, version)
+        return value, 'l2_hits'
+
+    def get_many(self, keys, version=None):
+        found = {}
+        rest = []
+        for key in keys:
+            value = self._l1_get(key, version) if self._in_l1(key) else _MISSING
+            if value is _MISSING:
+                rest.append(key)
+            else:
+                found[key] = value
+        self._count('l1_hits', len(found))
+        for key in rest:
+            value = self._l2.get(key, _MISSING, version)
+            if value is _MISSING:
+                self._count('misses')
+            else:
+                self._count('l2_hits')
+                self._l1_set(key, value, self._l1_timeout, version)
+                found[key] = value
+        return found
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self._count('sets')
+        self._l2.set(key, value, self._l2_timeout(timeout), version)
+        self._l1_set(key, value, timeout, version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        for key, value in data.items():
+            self.set(key, value, timeout, version)
+        return []
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        if not self._l2.add(key, value, self._l2_timeout(timeout), version):
+            return False
+        self._count('sets')
+        self._l1_set(key, value, timeout, version)
+        return True
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        self._l1_delete(key, version)
+        return self._l2.touch(key, self._l2_timeout(timeout), version)
+
+    def delete(self, key, version=None):
+        self._l1_delete(key, version)
+        return self._l2.delete(key, version)
+
+    def delete_many(self, keys, version=None):
+        for key in keys:
+            self.delete(key, version)
+
+    def has_key(self, key, version=None):
+        if self._in_l1(key) and self._l1_get(key, version) is not _MISSING:
+            return True
+        return self._l2.has_key(key, version)
+
+    def incr(self, key, delta=1, version=None):
+        self._l1_delete(key, version)
+        return self._l2.incr(key, delta, version)
+
+    def clear(self):
+        with self._l1_lock:
+            self._l1.clear()
+        self._l2.clear()
+
+    def _l2_timeout(self, timeout):
+        return self.default_timeout if timeout == DEFAULT_TIMEOUT else timeout
+
+    # Single-flight
+
+    def get_or_set(self, key, default, timeout=DEFAULT_TIMEOUT, version=None):
+        value = self.get(key, _MISSING, version)
+        if value is not _MISSING:
+            return value
+        if not callable(default):
+            self.add(key, default, timeout, version)
+            return self.get(key, default, version)
+
+        with self._flight_locks[hash(self.make_key(key, version)) % LOCK_STRIPES]:
+            # Пока поток ждал блокировку, значение мог вычислить другой поток
+            value, counter = self._lookup(key, version)
+            if value is not _MISSING:
+                self._count('flight_waits')
+                return value
+            acquired = self._l2.acquire_lock(key, version, self._lock_timeout)
+            if not acquired:
+                value = self._wait_for_value(key, version)
+                if value is not _MISSING:
+                    self._count('flight_waits')
+                    return value
+            try:
+                self._count('computes')
+                value = default()
+                self.set(key, value, timeout, version)
+            finally:
+                if acquired:
+                    self._l2.release_lock(key, version)
+        return value
+
+    def _wait_for_value(self, key, version):
+        deadline = time.monotonic() + self._lock_timeout
+        while time.monotonic() < deadline:
+            time.sleep(self._lock_poll)
+            value = self._l2.get(key, _MISSING, version)
+            if value is not _MISSING:
+                self._l1_set(key, value, self._l1_timeout, version)
+                return value
+            if not self._l2.is_locked(key, version):
+                break
+        return _MISSING
+
+    # Метрики
+
+    def _count(self, name, amount=1):
+        if not amount:
+            return
+        with self._stats_lock:
+            self._stats[name] += amount
+            due = time.monotonic() - self._stats_flushed_at >= self._stats_flush
+            if due:
+                self._stats_flushed_at = time.monotonic()
+                snapshot = dict(self._stats)
+        if due:
+            self._write_stats(snapshot)
+
+    def stats(self):
+        """Счётчики текущего процесса и размеры L1 и L2"""
+        with self._stats_lock:
+            result = dict(self._stats)
+        with self._l1_lock:
+            result['l1_entries'] = len(self._l1)
+        result['l2_entries'] = self._l2.count()
+        return result
+
+    def _stats_dir(self):
+        return os.path.join(self._dir, 'stats')
+
+    def _write_stats(self, snapshot):
+        directory = self._stats_dir()
+        os.makedirs(directory, exist_ok=True)
+        name = f'{socket.gethostname()}-{os.getpid()}.json'
+        fd, tmp_path = tempfile.mkstemp(dir=directory)
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump({'updated_at': time.time(), 'stats': snapshot}, f)
+            os.replace(tmp_path, os.path.join(directory, name))
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def worker_stats(self, max_age=24 * 3600):
+        """Последние записанные счётчики всех процессов: {процесс: счётчики}"""
+        workers = {}
+        directory = self._stats_dir()
+        if not os.path.isdir(directory):
+            return workers
+        for name in sorted(os.listdir(directory)):
+            if not name.endswith('.json'):
+                continue
+            path = os.path.join(directory, name)
+            try:
+                with open(path) as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                continue
+            if time.time() - data['updated_at'] > max_age:
+                os.remove(path)
+                continue
+            workers[name[:-len('.json')]] = data['stats']
+        return workers
@@ -0,0 +1,80 @@
+"""Кэширование данных с ключами версий.
+
+Каждая группа данных (пространство имён: 'news', 'services', 'offices',
+'applications', 'statuses') имеет версию в кэше. Версия входит в ключ кэшированного
+значения, поэтому при изменении данных достаточно поднять версию
+(см. services/signals.py) — старые значения просто перестают читаться
+и вытесняются по таймауту.
+
+Версия — это время последнего изменения в микросекундах, поэтому после
+вытеснения ключа версии из кэша новая версия всегда больше прежней.
+"""
+import time
+
+from asgiref.sync import async_to_sync, sync_to_async
+from django.core.cache import cache
+
+VERSION_KEY = 'mfc:version:{}'
+VALUE_KEY = 'mfc:{}:{}'
+DEFAULT_TIMEOUT = 60 * 15
+
+_MISSING = object()
+
+
+def _now():
+    return time.time_ns() // 1000
+
+
+def get_versions(*namespaces):
+    """Возвращает словарь {пространство имён: версия}, создавая недостающие версии"""
+    keys = {VERSION_KEY.format(namespace): namespace for namespace in namespaces}
+    found = cache.get_many(keys)
+    versions = {keys[key]: value for key, value in found.items()}
+    for key, namespace in keys.items():
+        if namespace not in versions:
+            cache.add(key, _now(), None)
+            versions[namespace] = cache.get(key)
+    return versions
+
+
+def get_version(namespace):
+    return get_versions(namespace)[namespace]
+
+
+def bump_version(*namespaces):
+    """Отмечает изменение данных в пространствах имён"""
+    current = cache.get_many([VERSION_KEY.format(namespace) for namespace in namespaces])
+    now = _now()
+    cache.set_many({
+        VERSION_KEY.format(namespace): max(now, current.get(VERSION_KEY.format(namespace), 0) + 1)
+        for namespace in namespaces
+    }, None)
+
+
+def get_or_compute(name, namespaces, compute, timeout=DEFAULT_TIMEOUT):
+    """Возвращает значение из кэша или вычисляет и сохраняет его.
+
+    name       -- имя значения (часть ключа кэша)
+    namespaces -- пространства имён, от версий которых зависит значение
+    compute    -- функция без аргументов, вычисляющая значение
+    """
+    key = _value_key(name, namespaces, get_versions(*namespaces))
+    # Бэкенд services.cache_backends.TwoTierCache вычисляет отсутствующее
+    # значение один раз на все потоки и процессы
+    return cache.get_or_set(key, compute, timeout)
+
+
+async def aget_or_compute(name, namespaces, compute, timeout=DEFAULT_TIMEOUT):
+    """Асинхронный вариант get_or_compute; compute — корутинная функция"""
+    key = _value_key(name, namespaces, await sync_to_async(get_versions)(*namespaces))
+    value = await cache.aget(key, _MISSING)
+    if value is _MISSING:
+        async def run():
+            return await compute()
+
+        value = await sync_to_async(cache.get_or_set)(key, async_to_sync(run), timeout)
+    return value
+
+
+def _value_key(name, namespaces, versions):
+    return VALUE_KEY.format(name, '.'.join(str(versions[namespace]) for namespace in namespaces))
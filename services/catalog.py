@@ -0,0 +1,143 @@
+"""Каталог услуг с фасетами: число услуг по категориям и диапазонам стоимости.
+
+Все счётчики получаются одним сгруппированным запросом: для каждой
+категории считается число услуг в каждом диапазоне стоимости
+(Count с filter). Из этой матрицы складываются:
+
+* число по категориям — с учётом выбранной стоимости, но без фильтра по
+  категории (чтобы было видно, сколько услуг даст другая категория);
+* число по диапазонам стоимости — с учётом категории, но без фильтра по
+  стоимости;
+* общее число найденных услуг.
+
+Матрица для каталога без поискового запроса кэшируется до изменения
+услуг (пространство имён 'services').
+"""
+from decimal import Decimal
+
+from django.db.models import Count, Q
+from django.urls import reverse
+
+from . import reference
+from .caching import get_or_compute
+from .models import Service
+from .pagination import paginate
+
+# Ключ -> (подпись, условие по стоимости)
+COST_BUCKETS = {
+    'free': ('Бесплатно', Q(cost=0)),
+    'upto500': ('До 500 ₽', Q(cost__gt=0, cost__lte=Decimal(500))),
+    '500to2000': ('500–2000 ₽', Q(cost__gt=Decimal(500), cost__lte=Decimal(2000))),
+    'over2000': ('Свыше 2000 ₽', Q(cost__gt=Decimal(2000))),
+}
+
+
+class InvalidFilter(Exception):
+    pass
+
+
+def parse_filters(params):
+    """Фильтры каталога из параметров запроса: (query, category_id, cost)"""
+    query = params.get('q', '').strip()
+    category = params.get('category') or None
+    if category is not None:
+        try:
+            category = int(category)
+        except ValueError:
+            raise InvalidFilter('category')
+    cost = params.get('cost') or None
+    if cost is not None and cost not in COST_BUCKETS:
+        raise InvalidFilter('cost')
+    return query, category, cost
+
+
+def search_queryset(query):
+    services = Service.objects.all()
+    if query:
+        services = services.filter(Q(name__icontains=query) | Q(description__icontains=query))
+    return services
+
+
+def filter_services(query='', category=None, cost=None):
+    services = search_queryset(query).select_related('category')
+    if category is not None:
+        services = services.filter(category_id=category)
+    if cost is not None:
+        services = services.filter(COST_BUCKETS[cost][1])
+    return services
+
+
+def _matrix(query):
+    """{category_id: {ключ диапазона: число}} одним запросом GROUP BY category_id"""
+    rows = (
+        search_queryset(query)
+        .order_by()
+        .values('category_id')
+        .annotate(**{f'cost_{key}': Count('id', filter=condition) for key, (label, condition) in COST_BUCKETS.items()})
+    )
+    return {
+        row['category_id']: {key: row[f'cost_{key}'] for key in COST_BUCKETS}
+        for row in rows
+    }
+
+
+def facet_matrix(query=''):
+    if query:
+        return _matrix(query)
+    return get_or_compute('catalog:facets', ['services'], lambda: _matrix(''))
+
+
+def facets(query='', category=None, cost=None):
+    """Счётчики фасетов и общее число услуг для выбранных фильтров"""
+    matrix = facet_matrix(query)
+    buckets = [cost] if cost else list(COST_BUCKETS)
+
+    categories = []
+    for item in reference.categories():
+        counts = matrix.get(item.id, {})
+        categories.append({
+            'id': item.id,
+            'name': item.name,
+            'count': sum(counts.get(key, 0) for key in buckets),
+            'selected': item.id == category,
+        })
+
+    rows = [matrix.get(category, {})] if category is not None else list(matrix.values())
+    costs = [
+        {
+            'key': key,
+            'label': label,
+            'count': sum(row.get(key, 0) for row in rows),
+            'selected': key == cost,
+        }
+        for key, (label, condition) in COST_BUCKETS.items()
+    ]
+    total = sum(row.get(key, 0) for row in rows for key in buckets)
+    return {'total': total, 'categories': categories, 'costs': costs}
+
+
+def catalog_page(request, query='', category=None, cost=None):
+    """Страница услуг по фильтрам (курсор из ?after=/?before=) и фасеты"""
+    page = paginate(request, filter_services(query, category, cost), ordering=('name', 'id'))
+    return page, facets(query, category, cost)
+
+
+def as_json(page, facet_data):
+    return {
+        'total': facet_data['total'],
+        'categories': facet_data['categories'],
+        'costs': facet_data['costs'],
+        'services': [
+            {
+                'id': service.id,
+                'name': service.name,
+                'category': service.category.name,
+                'cost': str(service.cost),
+                'execution_term': service.execution_term,
+                'url': reverse('services:service_detail', args=[service.id]),
+            }
+            for service in page
+        ],
+        'next': page.next_querystring or None,
+        'previous': page.previous_querystring or None,
+    }
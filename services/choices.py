@@ -0,0 +1,63 @@
+"""Варианты выбора офиса и услуги для форм с подгрузкой списков.
+
+Списки строятся из снимков справочников (services/reference.py) и
+матрицы доступности (services/availability.py) без запросов к базе:
+услуги можно ограничить офисом, офисы — услугой, и отфильтровать по
+подстроке. Форма выводит только выбранное значение, остальные варианты
+запрашивает static/js/lazy_select.js постранично.
+"""
+from django.conf import settings
+
+from . import availability, reference
+
+
+class InvalidParameter(Exception):
+    pass
+
+
+def _int_param(params, name):
+    value = params.get(name)
+    if not value:
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        raise InvalidParameter(name)
+
+
+def _matching(objects, query, fields):
+    query = query.strip().casefold()
+    if not query:
+        return list(objects)
+    return [obj for obj in objects if any(query in value.casefold() for value in fields(obj))]
+
+
+def service_choices(office=None, query=''):
+    services = reference.services() if office is None else availability.services_at(office)
+    return _matching(services, query, lambda service: (service.name, service.category.name))
+
+
+def office_choices(service=None, query=''):
+    offices = reference.offices() if service is None else availability.offices_for(service)
+    return _matching(offices, query, lambda office: (office.name, office.address))
+
+
+def page(objects, params):
+    """Страница вариантов для ?offset=: {'results': [{'id', 'text'}], 'next': offset или None}"""
+    offset = max(_int_param(params, 'offset') or 0, 0)
+    limit = settings.MFC_SETTINGS['PAGINATION_PER_PAGE']
+    end = offset + limit
+    return {
+        'results': [{'id': obj.pk, 'text': str(obj)} for obj in objects[offset:end]],
+        'next': end if end < len(objects) else None,
+    }
+
+
+def service_page(params):
+    """Услуги для ?office=&q=&offset="""
+    return page(service_choices(_int_param(params, 'office'), params.get('q', '')), params)
+
+
+def office_page(params):
+    """Офисы для ?service=&q=&offset="""
+    return page(office_choices(_int_param(params, 'service'), params.get('q', '')), params)
@@ -0,0 +1,80 @@
+"""Условные GET-запросы (ETag / Last-Modified) для страниц каталога и новостей.
+
+Валидаторы строятся по версиям кэша (см. services/caching.py), от которых
+зависит страница, без обращения к базе: версия поднимается при любом
+сохранении и удалении данных пространства имён. Если страница не
+менялась, ответ 304 отдаётся без выполнения представления и рендеринга
+шаблона.
+
+Страница показывает имя пользователя, поэтому в ETag входит
+пользователь, а Last-Modified отдаётся только анонимным посетителям.
+При непоказанных сообщениях (django.contrib.messages) валидаторов нет,
+и страница рендерится заново.
+"""
+from functools import wraps
+import hashlib
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.contrib.messages import get_messages
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+
+from .caching import get_versions
+
+
+def validators(request, namespaces, kwargs):
+    """(etag, last_modified) страницы или (None, None), если проверять нельзя"""
+    if request.method not in ('GET', 'HEAD') or len(get_messages(request)):
+        return None, None
+    versions = get_versions(*namespaces)
+    user = request.user
+    user_key = f'{user.pk}:{user.get_username()}' if user.is_authenticated else ''
+    # Фильтры и курсор страницы (?q=, ?after=) дают разные варианты одного URL
+    raw = repr((sorted(versions.items()), user_key, sorted(kwargs.items()), sorted(request.GET.lists())))
+    etag = quote_etag(hashlib.md5(raw.encode()).hexdigest())
+    # Версия — время изменения в микросекундах
+    last_modified = None if user.is_authenticated else max(versions.values()) // 1_000_000
+    return etag, last_modified
+
+
+def add_validators(response, etag, last_modified):
+    if response.status_code != 200:
+        return response
+    if etag and not response.has_header('ETag'):
+        response.headers['ETag'] = etag
+    if last_modified and not response.has_header('Last-Modified'):
+        response.headers['Last-Modified'] = http_date(last_modified)
+    # Браузер хранит страницу, но перед показом проверяет её через If-None-Match
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def conditional_page(*namespaces):
+    """Декоратор представления (синхронного или асинхронного), страница
+    которого зависит только от данных пространств имён namespaces"""
+    def decorator(view):
+        if iscoroutinefunction(view):
+            @wraps(view)
+            async def async_wrapper(request, *args, **kwargs):
+                etag, last_modified = await sync_to_async(validators)(request, namespaces, kwargs)
+                if etag is None:
+                    return await view(request, *args, **kwargs)
+                response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+                if response is None:
+                    response = add_validators(await view(request, *args, **kwargs), etag, last_modified)
+                return response
+
+            return async_wrapper
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            etag, last_modified = validators(request, namespaces, kwargs)
+            if etag is None:
+                return view(request, *args, **kwargs)
+            response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+            if response is None:
+                response = add_validators(view(request, *args, **kwargs), etag, last_modified)
+            return response
+
+        return wrapper
+    return decorator
@@ -0,0 +1,100 @@
+"""Настройка SQLite для работы под нагрузкой.
+
+При открытии каждого соединения выполняются PRAGMA из
+MFC_SETTINGS['SQLITE']['PRAGMAS']. В режиме WAL читатели не ждут
+пишущую транзакцию, а пишущие транзакции ждут друг друга не дольше
+DATABASES['default']['OPTIONS']['timeout'] секунд.
+
+Если база всё же занята («database is locked»), короткую пишущую
+транзакцию можно повторить: retry_on_busy и save_atomic делают это с
+растущей задержкой. Проверка под нагрузкой — команда ``stress_sqlite``.
+"""
+from functools import wraps
+import logging
+import random
+import time
+
+from django.conf import settings
+from django.db import OperationalError, connection, transaction
+
+logger = logging.getLogger(__name__)
+
+BUSY_MESSAGES = ('database is locked', 'database table is locked', 'database is busy')
+
+
+def sqlite_setting(name):
+    return settings.MFC_SETTINGS['SQLITE'][name]
+
+
+def configure_connection(sender, connection, **kwargs):
+    """Обработчик connection_created: PRAGMA для нового соединения SQLite"""
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for name, value in sqlite_setting('PRAGMAS').items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+
+
+def pragmas(using_connection=None):
+    """Текущие значения настроенных PRAGMA: {имя: значение}"""
+    using_connection = using_connection or connection
+    values = {}
+    with using_connection.cursor() as cursor:
+        for name in sqlite_setting('PRAGMAS'):
+            cursor.execute(f'PRAGMA {name}')
+            row = cursor.fetchone()
+            values[name] = row[0] if row else None
+    return values
+
+
+def is_busy_error(error):
+    return isinstance(error, OperationalError) and any(
+        message in str(error).lower() for message in BUSY_MESSAGES
+    )
+
+
+def retry_on_busy(func=None, *, attempts=None, delay=None):
+    """Повторяет функцию, если база занята другой пишущей транзакцией.
+
+    Функция должна сама открывать транзакцию: внутри внешнего
+    atomic() повтор невозможен, и ошибка передаётся дальше.
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            max_attempts = attempts or sqlite_setting('BUSY_RETRIES')
+            base_delay = delay if delay is not None else sqlite_setting('BUSY_RETRY_DELAY')
+            for attempt in range(1, max_attempts + 1):
+                try:
+                    return func(*args, **kwargs)
+                except OperationalError as e:
+                    if not is_busy_error(e) or attempt == max_attempts or connection.in_atomic_block:
+                        raise
+                    pause = base_delay * 2 ** (attempt - 1) * random.uniform(0.5, 1.5)
+                    logger.warning(
+                        "Database busy in %s, retry %d/%d in %.2fs",
+                        func.__qualname__, attempt, max_attempts - 1, pause,
+                    )
+                    time.sleep(pause)
+        return wrapper
+
+    if func is not None:
+        return decorator(func)
+    return decorator
+
+
+def save_atomic(instance, **kwargs):
+    """Сохраняет объект в отдельной транзакции с повтором при занятой базе"""
+    adding = instance._state.adding
+
+    @retry_on_busy
+    def save():
+        # После неудачной попытки вставки объект снова считается новым
+        if adding:
+            instance.pk = None
+            instance._state.adding = True
+        with transaction.atomic():
+            instance.save(**kwargs)
+
+    save()
+    return instance
@@ -0,0 +1,163 @@
+"""Потоковая выгрузка заявлений и записей на прием в CSV и NDJSON.
+
+Строки читаются через values_list(...).iterator(chunk_size), то есть без
+создания объектов моделей и без загрузки всей выборки в память, и сразу
+отдаются клиенту (StreamingHttpResponse) или пишутся в файл (команда
+``export_data``). Расход памяти не зависит от числа строк.
+"""
+import csv
+import json
+from datetime import datetime, time
+
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+
+from .models import Application, Appointment
+
+FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson; charset=utf-8',
+}
+
+# Строк в одном фрагменте ответа: меньше мелких записей в сокет
+ROWS_PER_CHUNK = 500
+
+
+class ExportError(Exception):
+    pass
+
+
+# Вид выгрузки -> модель, поле даты, поле статуса и колонки (заголовок, поле)
+EXPORTS = {
+    'applications': {
+        'model': Application,
+        'date_field': 'created_at',
+        'status_field': 'status__code',
+        'office_field': None,
+        'columns': [
+            ('id', 'id'),
+            ('created_at', 'created_at'),
+            ('updated_at', 'updated_at'),
+            ('status', 'status__name'),
+            ('status_code', 'status__code'),
+            ('service', 'service__name'),
+            ('category', 'service__category__name'),
+            ('username', 'user__username'),
+            ('first_name', 'user__first_name'),
+            ('last_name', 'user__last_name'),
+            ('email', 'user__email'),
+        ],
+    },
+    'appointments': {
+        'model': Appointment,
+        'date_field': 'appointment_datetime',
+        'status_field': 'status',
+        'office_field': 'office_id',
+        'columns': [
+            ('id', 'id'),
+            ('appointment_datetime', 'appointment_datetime'),
+            ('status', 'status'),
+            ('office', 'office__name'),
+            ('office_address', 'office__address'),
+            ('service', 'service__name'),
+            ('username', 'user__username'),
+            ('first_name', 'user__first_name'),
+            ('last_name', 'user__last_name'),
+            ('email', 'user__email'),
+        ],
+    },
+}
+
+
+def filter_queryset(kind, queryset=None, date_from=None, date_to=None, office=None, status=None):
+    """Выборка для выгрузки; даты включительно, в часовом поясе сайта"""
+    spec = EXPORTS[kind]
+    if queryset is None:
+        queryset = spec['model'].objects.all()
+    date_field = spec['date_field']
+    if date_from:
+        queryset = queryset.filter(**{
+            f'{date_field}__gte': timezone.make_aware(datetime.combine(date_from, time.min))
+        })
+    if date_to:
+        queryset = queryset.filter(**{
+            f'{date_field}__lte': timezone.make_aware(datetime.combine(date_to, time.max))
+        })
+    if office:
+        if spec['office_field'] is None:
+            raise ExportError('Фильтр по офису доступен только для записей на прием')
+        queryset = queryset.filter(**{spec['office_field']: office})
+    if status:
+        queryset = queryset.filter(**{spec['status_field']: status})
+    return queryset
+
+
+def iter_rows(kind, queryset, chunk_size=None):
+    """Словари {колонка: значение} в порядке id"""
+    columns = EXPORTS[kind]['columns']
+    headers = [header for header, field in columns]
+    values = (
+        queryset.order_by('pk')
+        .values_list(*(field for header, field in columns))
+        .iterator(chunk_size=chunk_size or settings.MFC_SETTINGS['EXPORT_CHUNK_SIZE'])
+    )
+    for row in values:
+        yield dict(zip(headers, (_format_value(value) for value in row)))
+
+
+def _format_value(value):
+    if isinstance(value, datetime):
+        return timezone.localtime(value).isoformat()
+    return '' if value is None else value
+
+
+class Echo:
+    """Псевдобуфер для csv.writer: возвращает строку вместо записи"""
+
+    def write(self, value):
+        return value
+
+
+def iter_csv(kind, queryset, chunk_size=None):
+    writer = csv.writer(Echo())
+    # BOM, чтобы Excel распознал UTF-8
+    buffer = ['\ufeff' + writer.writerow([header for header, field in EXPORTS[kind]['columns']])]
+    for row in iter_rows(kind, queryset, chunk_size):
+        buffer.append(writer.writerow(row.values()))
+        if len(buffer) >= ROWS_PER_CHUNK:
+            yield ''.join(buffer)
+            buffer = []
+    if buffer:
+        yield ''.join(buffer)
+
+
+def iter_ndjson(kind, queryset, chunk_size=None):
+    buffer = []
+    for row in iter_rows(kind, queryset, chunk_size):
+        buffer.append(json.dumps(row, ensure_ascii=False, default=str) + '\n')
+        if len(buffer) >= ROWS_PER_CHUNK:
+            yield ''.join(buffer)
+            buffer = []
+    if buffer:
+        yield ''.join(buffer)
+
+
+WRITERS = {
+    'csv': iter_csv,
+    'ndjson': iter_ndjson,
+}
+
+
+def iter_export(kind, queryset, fmt, chunk_size=None):
+    return WRITERS[fmt](kind, queryset, chunk_size)
+
+
+def filename(kind, fmt):
+    return f'{kind}-{timezone.localtime():%Y%m%d-%H%M}.{fmt}'
+
+
+def streaming_response(kind, queryset, fmt):
+    response = StreamingHttpResponse(iter_export(kind, queryset, fmt), content_type=FORMATS[fmt])
+    response['Content-Disposition'] = f'attachment; filename="{filename(kind, fmt)}"'
+    return response
@@ -1,9 +1,112 @@
 from django import forms
+from django.core.exceptions import ValidationError
+from django.urls import reverse_lazy
 from .models import Appointment, Service, MFCOffice, Application
+from . import application_data, reference, slots
 from django.utils import timezone
 from datetime import datetime, timedelta
 
+
+class ReferenceChoiceIterator:
+    """Варианты выбора, которые читаются из справочника при каждом выводе"""
+
+    def __init__(self, field):
+        self.field = field
+
+    def __iter__(self):
+        if self.field.empty_label is not None:
+            yield ('', self.field.empty_label)
+        for obj in reference.objects(self.field.source):
+            yield (obj.pk, self.field.label_from_instance(obj))
+
+    def __len__(self):
+        return len(reference.objects(self.field.source)) + (self.field.empty_label is not None)
+
+    def __bool__(self):
+        return self.field.empty_label is not None or bool(reference.objects(self.field.source))
+
+    def for_values(self, values):
+        """Пустой вариант и варианты только для значений values"""
+        if self.field.empty_label is not None:
+            yield ('', self.field.empty_label)
+        for value in values:
+            try:
+                obj = reference.get(self.field.source, int(value))
+            except (KeyError, TypeError, ValueError):
+                continue
+            yield (obj.pk, self.field.label_from_instance(obj))
+
+
+class LazySelect(forms.Select):
+    """Select, в котором выводятся только пустой и выбранный варианты.
+
+    Остальные варианты static/js/lazy_select.js подгружает из url по мере
+    поиска и прокрутки; depends_on — имя поля, значение которого
+    передаётся в url как параметр с тем же именем (например, офис для
+    списка услуг).
+    """
+
+    def __init__(self, url, depends_on=None, attrs=None):
+        super().__init__(attrs)
+        self.url = url
+        self.depends_on = depends_on
+
+    def get_context(self, name, value, attrs):
+        context = super().get_context(name, value, attrs)
+        widget_attrs = context['widget']['attrs']
+        widget_attrs['data-choices-url'] = str(self.url)
+        if self.depends_on:
+            widget_attrs['data-depends-on'] = self.depends_on
+        return context
+
+    def optgroups(self, name, value, attrs=None):
+        groups = []
+        for index, (option_value, option_label) in enumerate(self.choices.for_values(value)):
+            selected = str(option_value) in value
+            groups.append((None, [self.create_option(name, option_value, option_label, selected, index, attrs=attrs)], index))
+        return groups
+
+
+class ReferenceChoiceField(forms.ModelChoiceField):
+    """ModelChoiceField, берущий варианты из services/reference.py.
+
+    Ни вывод списка, ни проверка выбранного значения не обращаются к базе.
+    """
+
+    def __init__(self, source, *args, **kwargs):
+        self.source = source
+        super().__init__(*args, **kwargs)
+
+    def _get_choices(self):
+        return ReferenceChoiceIterator(self)
+
+    choices = property(_get_choices, forms.ChoiceField._set_choices)
+
+    def to_python(self, value):
+        if value in self.empty_values:
+            return None
+        if isinstance(value, self.queryset.model):
+            return value
+        try:
+            return reference.get(self.source, int(value))
+        except (KeyError, TypeError, ValueError):
+            raise ValidationError(
+                self.error_messages['invalid_choice'],
+                code='invalid_choice',
+                params={'value': value},
+            )
+
+
 class AppointmentForm(forms.ModelForm):
+    office = ReferenceChoiceField(
+        'offices', queryset=MFCOffice.objects.all(), label='Офис МФЦ', empty_label="Выберите офис",
+        widget=LazySelect(reverse_lazy('services:office_choices')),
+    )
+    service = ReferenceChoiceField(
+        'services', queryset=Service.objects.all(), label='Услуга', empty_label="Выберите услугу",
+        widget=LazySelect(reverse_lazy('services:service_choices'), depends_on='office'),
+    )
+
     class Meta:
         model = Appointment
         fields = ['office', 'service', 'appointment_datetime']
@@ -11,17 +114,11 @@ class AppointmentForm(forms.ModelForm):
             'appointment_datetime': forms.DateTimeInput(attrs={'type': 'datetime-local'}),
         }
         labels = {
-            'office': 'Офис МФЦ',
-            'service': 'Услуга',
             'appointment_datetime': 'Дата и время приема',
         }
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        self.fields['office'].queryset = MFCOffice.objects.all()
-        self.fields['office'].empty_label = "Выберите офис"
-        self.fields['service'].queryset = Service.objects.all()
-        self.fields['service'].empty_label = "Выберите услугу"
 
         # Устанавливаем минимальную дату для записи (текущий день)
         today = timezone.now().date()
@@ -34,22 +131,85 @@ class AppointmentForm(forms.ModelForm):
             raise forms.ValidationError("Дата и время приема должны быть в будущем.")
         return appointment_datetime
 
+    def clean(self):
+        cleaned_data = super().clean()
+        office = cleaned_data.get('office')
+        service = cleaned_data.get('service')
+        appointment_datetime = cleaned_data.get('appointment_datetime')
+        if not office or not service or not appointment_datetime:
+            return cleaned_data
+
+        if 'office' in self.changed_data or 'service' in self.changed_data:
+            if not slots.is_service_offered(office, service):
+                self.add_error('service', "Эта услуга не оказывается в выбранном офисе.")
+
+        # Время проверяем только при переносе записи: записи, сделанные до
+        # введения слотов, можно редактировать, не меняя время
+        if self.slot_changed:
+            if not slots.is_slot_start(office, appointment_datetime):
+                self.add_error(
+                    'appointment_datetime',
+                    f"Выберите время начала слота: офис принимает каждые {office.slot_minutes} мин. в часы работы."
+                )
+            elif slots.free_places(office, appointment_datetime) <= 0:
+                self.add_error('appointment_datetime', "На выбранное время свободных мест нет.")
+        return cleaned_data
+
+    @property
+    def slot_changed(self):
+        return 'office' in self.changed_data or 'appointment_datetime' in self.changed_data
+
 class ApplicationForm(forms.ModelForm):
+    service = ReferenceChoiceField(
+        'services', queryset=Service.objects.all(), label='Услуга', empty_label="Выберите услугу",
+        widget=LazySelect(reverse_lazy('services:service_choices')),
+    )
+    comment = forms.CharField(
+        label='Детали заявления',
+        required=False,
+        widget=forms.Textarea(attrs={
+            'rows': 4,
+            'placeholder': 'Опишите детали вашего заявления...'
+        }),
+    )
+
     class Meta:
         model = Application
-        fields = ['service', 'application_data']
-        widgets = {
-            'application_data': forms.Textarea(attrs={
-                'rows': 4, 
-                'placeholder': 'Опишите детали вашего заявления...'
-            }),
-        }
-        labels = {
-            'service': 'Услуга',
-            'application_data': 'Детали заявления',
-        }
+        fields = ['service']
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        self.fields['service'].queryset = Service.objects.all()
-        self.fields['service'].empty_label = "Выберите услугу"
\ No newline at end of file
+        # Поля данных заявления задаёт схема выбранной услуги
+        self.service_schema = getattr(self.selected_service(), 'data_schema', None) or []
+        self.fields.update(application_data.form_fields(self.service_schema))
+        if self.instance.pk:
+            self.initial.setdefault('comment', self.instance.comment)
+            for name, value in application_data.from_json(self.service_schema, self.instance.application_data).items():
+                self.initial.setdefault(name, value)
+
+    def selected_service(self):
+        if self.is_bound:
+            value = self.data.get(self.add_prefix('service'))
+        else:
+            value = self.initial.get('service')
+        try:
+            return reference.get('services', int(getattr(value, 'pk', value)))
+        except (KeyError, TypeError, ValueError):
+            return None
+
+    def data_fields(self):
+        """Поля формы по схеме услуги (для шаблона)"""
+        return [self[name] for name in self.fields if name.startswith(application_data.FORM_FIELD_PREFIX)]
+
+    def save(self, commit=True):
+        # Поля схемы и комментарий перезаписываются, остальные ключи (данные
+        # другой услуги, полей, убранных из схемы) сохраняются
+        data = dict(self.instance.application_data or {})
+        for field in self.service_schema:
+            data.pop(field['name'], None)
+        data.pop(application_data.COMMENT_KEY, None)
+        data.update(application_data.to_json(self.service_schema, self.cleaned_data))
+        if self.cleaned_data.get('comment'):
+            data[application_data.COMMENT_KEY] = self.cleaned_data['comment']
+        self.instance.application_data = data
+        return super().save(commit)
@@ -0,0 +1,170 @@
+"""Поиск ближайших офисов по координатам без геоинформационной базы.
+
+Офисы с координатами раскладываются по сетке ячеек размером
+MFC_SETTINGS['GEO']['CELL_DEGREES'] градусов. Поиск обходит кольца ячеек
+вокруг точки, начиная с её собственной, и останавливается, когда
+найдено нужное число офисов и ни один офис следующего кольца не может
+оказаться ближе последнего найденного. Если подходящих офисов мало,
+кольца пришлось бы обходить далеко по пустым ячейкам, поэтому после
+стольких ячеек, сколько всего кандидатов, поиск переходит к перебору
+кандидатов. Расстояние — по формуле гаверсинусов.
+
+Индекс строится из снимка офисов (services/reference.py) и
+перестраивается, когда меняется версия пространства имён 'offices'.
+Переход через 180-й меридиан не учитывается.
+"""
+import heapq
+import math
+import threading
+
+from django.conf import settings
+from django.utils import timezone
+
+from . import availability, reference
+from .caching import get_version
+from .schedule import opening_hours
+
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+
+
+def distance_km(lat1, lng1, lat2, lng2):
+    lat1, lng1, lat2, lng2 = map(math.radians, (lat1, lng1, lat2, lng2))
+    a = (
+        math.sin((lat2 - lat1) / 2) ** 2
+        + math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+class GridIndex:
+    def __init__(self, version, offices, cell_degrees):
+        self.version = version
+        self.cell = cell_degrees
+        self.cells = {}
+        self.offices = []
+        self.max_lat = 0.0
+        for office in offices:
+            if office.latitude is None or office.longitude is None:
+                continue
+            self.offices.append(office)
+            self.cells.setdefault(self._cell(office.latitude, office.longitude), []).append(office)
+            self.max_lat = max(self.max_lat, abs(office.latitude))
+        if self.cells:
+            rows = [row for row, col in self.cells]
+            cols = [col for row, col in self.cells]
+            self.bounds = (min(rows), max(rows), min(cols), max(cols))
+
+    def _cell(self, lat, lng):
+        return math.floor(lat / self.cell), math.floor(lng / self.cell)
+
+    def _ring(self, row, col, radius):
+        if radius == 0:
+            yield row, col
+            return
+        for dc in range(-radius, radius + 1):
+            yield row - radius, col + dc
+            yield row + radius, col + dc
+        for dr in range(-radius + 1, radius):
+            yield row + dr, col - radius
+            yield row + dr, col + radius
+
+    def nearest(self, lat, lng, limit, predicate=None, max_km=None, candidates=None):
+        """До limit ближайших офисов [(расстояние в км, офис)], подходящих под predicate.
+
+        candidates — офисы, среди которых заведомо лежит ответ (например, где
+        оказывается услуга); по ним идёт перебор, если обход колец затянулся.
+        """
+        if not self.cells or limit <= 0:
+            return []
+        if candidates is None:
+            candidates = self.offices
+        best = []
+        row, col = self._cell(lat, lng)
+        min_row, max_row, min_col, max_col = self.bounds
+        last_radius = max(row - min_row, max_row - row, col - min_col, max_col - col)
+        # Наименьшая длина ячейки в км: по долготе она убывает к полюсам
+        widest_lat = min(max(self.max_lat, abs(lat)) + self.cell, 90.0)
+        min_cell_km = self.cell * KM_PER_DEGREE * math.cos(math.radians(widest_lat))
+        scanned = 0
+        radius = 0
+        while radius <= last_radius:
+            scanned += 8 * radius or 1
+            if scanned > len(candidates):
+                # Перебор кандидатов дешевле дальнейшего обхода ячеек
+                best = []
+                self._push(best, lat, lng, limit, candidates, predicate, max_km)
+                break
+            for key in self._ring(row, col, radius):
+                self._push(best, lat, lng, limit, self.cells.get(key, ()), predicate, max_km)
+            # Любой офис кольца radius + 1 не ближе radius целых ячеек
+            bound = radius * min_cell_km
+            if len(best) == limit and bound >= -best[0][0]:
+                break
+            if max_km is not None and bound > max_km:
+                break
+            radius += 1
+        return sorted(((-negative, office) for negative, pk, office in best), key=lambda item: item[0])
+
+    @staticmethod
+    def _push(best, lat, lng, limit, offices, predicate, max_km):
+        """Добавляет офисы в кучу limit лучших: (-расстояние, id, офис)"""
+        for office in offices:
+            if office.latitude is None or office.longitude is None:
+                continue
+            distance = distance_km(lat, lng, office.latitude, office.longitude)
+            if max_km is not None and distance > max_km:
+                continue
+            if len(best) == limit and distance >= -best[0][0]:
+                continue
+            if predicate is not None and not predicate(office):
+                continue
+            heapq.heappush(best, (-distance, office.pk, office))
+            if len(best) > limit:
+                heapq.heappop(best)
+
+
+_index = None
+_lock = threading.Lock()
+
+
+def get_index():
+    global _index
+    version = get_version('offices')
+    index = _index
+    if index is None or index.version != version:
+        with _lock:
+            index = _index
+            if index is None or index.version != version:
+                index = GridIndex(version, reference.offices(), settings.MFC_SETTINGS['GEO']['CELL_DEGREES'])
+                _index = index
+    return index
+
+
+def hours_today(office, now=None):
+    """Часы работы сегодня: (открытие, закрытие) или None"""
+    now = now or timezone.localtime()
+    return opening_hours(office.work_schedule, now.date())
+
+
+def is_open(office, now=None):
+    now = now or timezone.localtime()
+    hours = hours_today(office, now)
+    return hours is not None and hours[0] <= now.time() < hours[1]
+
+
+def nearest_offices(lat, lng, limit, service=None, open_filter=None, max_km=None):
+    """Ближайшие офисы, где оказывается услуга и которые работают сегодня
+    (open_filter='today') или прямо сейчас (open_filter='now')"""
+    now = timezone.localtime()
+    # Услугу уже отбирают кандидаты, предикат проверяет только часы работы
+    candidates = availability.offices_for(service) if service is not None else None
+
+    def predicate(office):
+        if open_filter == 'today':
+            return hours_today(office, now) is not None
+        if open_filter == 'now':
+            return is_open(office, now)
+        return True
+
+    return get_index().nearest(lat, lng, limit, predicate, max_km, candidates)
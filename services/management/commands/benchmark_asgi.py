@@ -0,0 +1,106 @@
+import asyncio
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test import AsyncClient, Client, override_settings
+from django.urls import reverse
+
+from services.async_urls import ASYNC_VIEWS
+from services.models import News, Service
+
+from .benchmark_views import QUERY_PARAMS, percentile
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare throughput of the read-only pages under concurrent requests: '
+        'synchronous views through WSGI (thread pool) against async views through ASGI (event loop).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 8, 32])
+        parser.add_argument('--requests', type=int, default=400, help='Requests per run')
+        parser.add_argument('--routes', nargs='*', help='Only these route names')
+
+    def handle(self, *args, **options):
+        urls = self.build_urls(options['routes'])
+        total = options['requests']
+        plan = [urls[i % len(urls)] for i in range(total)]
+
+        self.stdout.write(f'{len(urls)} routes, {total} requests per run')
+        header = f'{"mode":<8}{"concurrency":>12}{"req/s":>10}{"p50 ms":>10}{"p95 ms":>10}{"errors":>8}'
+        self.stdout.write(header)
+        self.stdout.write('-' * len(header))
+
+        # Тестовые клиенты обращаются к серверу с именем testserver
+        with override_settings(ALLOWED_HOSTS=['testserver']):
+            for concurrency in options['concurrency']:
+                self.report('wsgi', concurrency, *self.run_wsgi(plan, concurrency))
+                with override_settings(ROOT_URLCONF='MFC.asgi_urls'):
+                    self.report('asgi', concurrency, *asyncio.run(self.run_asgi(plan, concurrency)))
+
+    def build_urls(self, only):
+        sample_ids = {
+            'service_id': Service.objects.values_list('id', flat=True).first(),
+            'news_id': News.objects.values_list('id', flat=True).first(),
+        }
+        urls = []
+        for name in ASYNC_VIEWS:
+            if only and name not in only:
+                continue
+            kwargs = {}
+            if name == 'service_detail':
+                kwargs = {'service_id': sample_ids['service_id']}
+            elif name == 'news_detail':
+                kwargs = {'news_id': sample_ids['news_id']}
+            if any(value is None for value in kwargs.values()):
+                self.stderr.write(f'Skipping {name}: no sample object')
+                continue
+            url = reverse(f'services:{name}', kwargs=kwargs)
+            params = QUERY_PARAMS.get(name)
+            if params:
+                url += '?' + '&'.join(f'{key}={value}' for key, value in params.items())
+            urls.append(url)
+        if not urls:
+            raise CommandError('No routes to benchmark')
+        return urls
+
+    def run_wsgi(self, plan, concurrency):
+        local = threading.local()
+
+        def fetch(url):
+            if not hasattr(local, 'client'):
+                local.client = Client()
+            started = time.perf_counter()
+            response = local.client.get(url)
+            return (time.perf_counter() - started) * 1000, response.status_code
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            results = list(executor.map(fetch, plan))
+        return results, time.perf_counter() - started
+
+    async def run_asgi(self, plan, concurrency):
+        client = AsyncClient()
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def fetch(url):
+            async with semaphore:
+                started = time.perf_counter()
+                response = await client.get(url)
+                return (time.perf_counter() - started) * 1000, response.status_code
+
+        started = time.perf_counter()
+        results = await asyncio.gather(*(fetch(url) for url in plan))
+        return results, time.perf_counter() - started
+
+    def report(self, mode, concurrency, results, elapsed):
+        timings = [timing for timing, status in results]
+        errors = sum(1 for timing, status in results if status >= 400)
+        self.stdout.write(
+            f'{mode:<8}{concurrency:>12}{len(results) / elapsed:>10.1f}'
+            f'{statistics.median(timings):>10.2f}{percentile(timings, 0.95):>10.2f}{errors:>8}'
+        )
@@ -0,0 +1,192 @@
+import json
+import platform
+import statistics
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from services import urls as service_urls
+from services.models import Application, Appointment, MFCOffice, News, Service
+
+# Параметры запроса для маршрутов, которым без них нечего делать.
+# Значения могут ссылаться на образцы объектов: '{service_id}'
+QUERY_PARAMS = {
+    'search': {'q': 'паспорт'},
+    'search_suggestions': {'q': 'па'},
+    'nearest_offices': {'lat': 55.7558, 'lng': 37.6173},
+}
+
+# Дополнительные замеры маршрута с другими параметрами: «маршрут:вариант»
+QUERY_VARIANTS = {
+    'nearest_offices': {
+        'service': {'lat': 55.7558, 'lng': 37.6173, 'service': '{service_id}'},
+    },
+}
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark every route in services/urls.py with the test client, anonymously '
+        'and as a logged-in user. Run gererate_fake_data first to get a realistic dataset.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=30)
+        parser.add_argument('--warmup', type=int, default=2)
+        parser.add_argument('--user', help='Username for authenticated requests (default: user with most applications)')
+        parser.add_argument('--routes', nargs='*', help='Only benchmark these route names')
+        parser.add_argument('--output', help='Write results as JSON to this file')
+        parser.add_argument('--compare', help='Compare with results from a previous --output file')
+
+    def handle(self, *args, **options):
+        user = self.get_user(options['user'])
+        routes = self.build_routes(user)
+        if options['routes']:
+            routes = [route for route in routes if route[0] in options['routes']]
+        if not routes:
+            raise CommandError('No routes to benchmark')
+
+        host = next((h for h in settings.ALLOWED_HOSTS if h != '*'), 'localhost')
+        results = []
+        for mode in ('anonymous', 'authenticated'):
+            client = Client(HTTP_HOST=host)
+            if mode == 'authenticated':
+                client.force_login(user)
+            for name, url in routes:
+                results.append(self.measure(client, mode, name, url, options['iterations'], options['warmup']))
+
+        self.print_results(results)
+
+        report = {
+            'created_at': timezone.now().isoformat(),
+            'python': platform.python_version(),
+            'database': connection.vendor,
+            'iterations': options['iterations'],
+            'results': results,
+        }
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                json.dump(report, f, ensure_ascii=False, indent=2)
+            self.stdout.write(self.style.SUCCESS(f'Results saved to {options["output"]}'))
+        if options['compare']:
+            self.compare(options['compare'], results)
+
+    def get_user(self, username):
+        if username:
+            try:
+                return User.objects.get(username=username)
+            except User.DoesNotExist:
+                raise CommandError(f'User {username} does not exist')
+        user_id = (
+            Application.objects.order_by().values('user_id')
+            .annotate(n=Count('id'))
+            .order_by('-n').values_list('user_id', flat=True).first()
+        )
+        user = User.objects.filter(id=user_id).first() or User.objects.first()
+        if user is None:
+            raise CommandError('No users in the database, run gererate_fake_data first')
+        return user
+
+    def build_routes(self, user):
+        """(имя маршрута, URL) для каждого маршрута services/urls.py"""
+        sample_ids = {
+            'service_id': Service.objects.values_list('id', flat=True).first(),
+            'office_id': MFCOffice.objects.values_list('id', flat=True).first(),
+            'news_id': News.objects.values_list('id', flat=True).first(),
+            'application_id': Application.objects.filter(user=user).values_list('id', flat=True).first(),
+            'appointment_id': Appointment.objects.filter(user=user).values_list('id', flat=True).first(),
+        }
+        routes = []
+        for pattern in service_urls.urlpatterns:
+            kwargs = {}
+            for argument in pattern.pattern.converters:
+                kwargs[argument] = sample_ids.get(argument)
+            if any(value is None for value in kwargs.values()):
+                self.stderr.write(f'Skipping {pattern.name}: no sample object for {list(kwargs)}')
+                continue
+            url = reverse(f'{service_urls.app_name}:{pattern.name}', kwargs=kwargs)
+            routes.append((pattern.name, self.with_params(url, QUERY_PARAMS.get(pattern.name), sample_ids)))
+            for variant, params in QUERY_VARIANTS.get(pattern.name, {}).items():
+                if '{service_id}' in ''.join(str(value) for value in params.values()) and sample_ids['service_id'] is None:
+                    continue
+                routes.append((f'{pattern.name}:{variant}', self.with_params(url, params, sample_ids)))
+        return routes
+
+    def with_params(self, url, params, sample_ids):
+        if not params:
+            return url
+        return url + '?' + '&'.join(f'{key}={str(value).format(**sample_ids)}' for key, value in params.items())
+
+    def measure(self, client, mode, name, url, iterations, warmup):
+        for _ in range(warmup):
+            client.get(url)
+
+        timings, queries, sizes, statuses = [], [], [], set()
+        for _ in range(iterations):
+            with CaptureQueriesContext(connection) as context:
+                started = time.perf_counter()
+                response = client.get(url)
+                body = b''.join(response.streaming_content) if response.streaming else response.content
+                timings.append((time.perf_counter() - started) * 1000)
+            queries.append(len(context.captured_queries))
+            sizes.append(len(body))
+            statuses.add(response.status_code)
+
+        return {
+            'mode': mode,
+            'route': name,
+            'url': url,
+            'status': sorted(statuses),
+            'p50_ms': round(statistics.median(timings), 3),
+            'p95_ms': round(percentile(timings, 0.95), 3),
+            'p99_ms': round(percentile(timings, 0.99), 3),
+            'queries': max(queries),
+            'bytes': max(sizes),
+        }
+
+    def print_results(self, results):
+        header = f'{"mode":<14}{"route":<26}{"status":<10}{"p50 ms":>9}{"p95 ms":>9}{"p99 ms":>9}{"queries":>9}{"bytes":>9}'
+        self.stdout.write(header)
+        self.stdout.write('-' * len(header))
+        for row in results:
+            status = ','.join(str(code) for code in row['status'])
+            self.stdout.write(
+                f'{row["mode"]:<14}{row["route"]:<26}{status:<10}'
+                f'{row["p50_ms"]:>9.2f}{row["p95_ms"]:>9.2f}{row["p99_ms"]:>9.2f}'
+                f'{row["queries"]:>9}{row["bytes"]:>9}'
+            )
+
+    def compare(self, path, results):
+        with open(path, encoding='utf-8') as f:
+            baseline = {(row['mode'], row['route']): row for row in json.load(f)['results']}
+
+        self.stdout.write('')
+        self.stdout.write(f'Comparison with {path}:')
+        self.stdout.write(f'{"mode":<14}{"route":<26}{"p50 ms":>18}{"p95 ms":>18}{"queries":>12}{"bytes":>16}')
+        for row in results:
+            old = baseline.get((row['mode'], row['route']))
+            if old is None:
+                self.stdout.write(f'{row["mode"]:<14}{row["route"]:<26}  (new route)')
+                continue
+
+            def delta(key, digits=2):
+                return f'{old[key]:.{digits}f}->{row[key]:.{digits}f}' if digits else f'{old[key]}->{row[key]}'
+
+            self.stdout.write(
+                f'{row["mode"]:<14}{row["route"]:<26}{delta("p50_ms"):>18}{delta("p95_ms"):>18}'
+                f'{delta("queries", 0):>12}{delta("bytes", 0):>16}'
+            )
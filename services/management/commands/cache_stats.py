@@ -0,0 +1,41 @@
+from collections import Counter
+
+from django.core.cache import caches
+from django.core.management.base import BaseCommand, CommandError
+
+COLUMNS = ['l1_hits', 'l2_hits', 'misses', 'sets', 'computes', 'flight_waits']
+
+
+class Command(BaseCommand):
+    help = 'Show hit/miss counters of the two-tier cache, per server process and in total.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--alias', default='default', help='Cache alias from settings.CACHES')
+
+    def handle(self, *args, **options):
+        cache = caches[options['alias']]
+        if not hasattr(cache, 'worker_stats'):
+            raise CommandError(f'Cache "{options["alias"]}" is not services.cache_backends.TwoTierCache')
+        workers = cache.worker_stats()
+        if not workers:
+            self.stdout.write('No statistics yet: server processes write them periodically')
+            return
+
+        header = f'{"process":<32}' + ''.join(f'{column:>14}' for column in COLUMNS) + f'{"hit ratio":>11}'
+        self.stdout.write(header)
+        self.stdout.write('-' * len(header))
+        total = Counter()
+        for worker, counters in workers.items():
+            total.update(counters)
+            self.write_row(worker, counters)
+        self.stdout.write('-' * len(header))
+        self.write_row('total', total)
+        self.stdout.write(f'L2 entries: {cache.stats()["l2_entries"]}')
+
+    def write_row(self, name, counters):
+        hits = counters.get('l1_hits', 0) + counters.get('l2_hits', 0)
+        reads = hits + counters.get('misses', 0)
+        ratio = f'{hits / reads:.1%}' if reads else '-'
+        self.stdout.write(
+            f'{name:<32}' + ''.join(f'{counters.get(column, 0):>14}' for column in COLUMNS) + f'{ratio:>11}'
+        )
@@ -0,0 +1,52 @@
+import time
+
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from services.db import retry_on_busy
+
+
+class Command(BaseCommand):
+    help = (
+        'Delete expired sessions in small batches, each in its own short transaction, '
+        'so the session table is never locked for long. Run it from cron instead of clearsessions.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=settings.MFC_SETTINGS['SESSION_CLEANUP_BATCH_SIZE'])
+        parser.add_argument('--pause', type=float, default=0.05, help='Seconds to sleep between batches')
+        parser.add_argument('--dry-run', action='store_true', help='Only count expired sessions')
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        expired = Session.objects.filter(expire_date__lt=now)
+        if options['dry_run']:
+            self.stdout.write(f'{expired.count()} expired sessions')
+            return
+
+        deleted = batches = 0
+        while True:
+            count = self.delete_batch(now, options['batch_size'])
+            if count is None:
+                break
+            deleted += count
+            batches += 1
+            if options['verbosity'] >= 2:
+                self.stdout.write(f'batch {batches}: {count} sessions')
+            time.sleep(options['pause'])
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} expired sessions in {batches} batches'))
+
+    @retry_on_busy
+    def delete_batch(self, now, batch_size):
+        keys = list(
+            Session.objects.filter(expire_date__lt=now)
+            .order_by('expire_date')
+            .values_list('session_key', flat=True)[:batch_size]
+        )
+        if not keys:
+            return None
+        # Сессию могли продлить между выборкой и удалением
+        deleted, _ = Session.objects.filter(session_key__in=keys, expire_date__lt=now).delete()
+        return deleted
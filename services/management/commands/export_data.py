@@ -0,0 +1,50 @@
+import sys
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from services import exports
+
+
+def parse_date(value):
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise CommandError(f'Invalid date {value!r}, expected YYYY-MM-DD')
+
+
+class Command(BaseCommand):
+    help = 'Stream applications or appointments to CSV or NDJSON with constant memory usage'
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=list(exports.EXPORTS))
+        parser.add_argument('--format', choices=list(exports.FORMATS), default='csv')
+        parser.add_argument('--date-from', type=parse_date, help='YYYY-MM-DD, inclusive')
+        parser.add_argument('--date-to', type=parse_date, help='YYYY-MM-DD, inclusive')
+        parser.add_argument('--office', type=int, help='Office id (appointments only)')
+        parser.add_argument('--status', help='Status code (applications) or status value (appointments)')
+        parser.add_argument('--chunk-size', type=int, help='Rows fetched from the database per query')
+        parser.add_argument('--output', help='Output file (default: stdout)')
+
+    def handle(self, *args, **options):
+        kind = options['kind']
+        try:
+            queryset = exports.filter_queryset(
+                kind,
+                date_from=options['date_from'],
+                date_to=options['date_to'],
+                office=options['office'],
+                status=options['status'],
+            )
+        except exports.ExportError as e:
+            raise CommandError(str(e))
+
+        chunks = exports.iter_export(kind, queryset, options['format'], options['chunk_size'])
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8', newline='') as f:
+                for chunk in chunks:
+                    f.write(chunk)
+            self.stderr.write(self.style.SUCCESS(f'Export written to {options["output"]}'))
+        else:
+            for chunk in chunks:
+                sys.stdout.write(chunk)
@@ -1,15 +1,111 @@
-import os
 import random
+import time
+from datetime import datetime, timedelta
+
+from django.core.management import call_command
 from django.core.management.base import BaseCommand
+from django.contrib.auth.hashers import make_password
 from django.contrib.auth.models import User
+from django.db import transaction
 from django.utils import timezone
+from services.caching import bump_version
 from services.models import *
+from services.schedule import parse_work_schedule
+
+# Итоговое количество объектов для пресетов --scale
+SCALES = {
+    'small': {
+        'users': 5, 'offices': 5, 'services': 10, 'news': 10,
+        'applications': 15, 'appointments': 10,
+    },
+    'medium': {
+        'users': 10_000, 'offices': 50, 'services': 200, 'news': 500,
+        'applications': 100_000, 'appointments': 50_000,
+    },
+    'large': {
+        'users': 100_000, 'offices': 200, 'services': 1_000, 'news': 2_000,
+        'applications': 1_000_000, 'appointments': 500_000,
+    },
+    'production': {
+        'users': 1_000_000, 'offices': 500, 'services': 2_000, 'news': 5_000,
+        'applications': 10_000_000, 'appointments': 3_000_000,
+    },
+}
+
+STREETS = ['Ленина', 'Мира', 'Гагарина', 'Советская', 'Садовая', 'Лесная', 'Школьная', 'Победы', 'Молодежная', 'Центральная']
+SCHEDULES = ['пн-пт 9:00-18:00', 'пн-пт 8:00-20:00, сб 10:00-15:00', 'пн-чт 9:00-17:00, пт 9:00-16:00', 'пн-пт 9:00-19:00', 'пн-сб 8:00-20:00']
+# Центр города, вокруг которого размещаются офисы (широта, долгота)
+CITY_CENTER = (55.7558, 37.6173)
+SERVICE_ACTIONS = ['Выдача', 'Замена', 'Регистрация', 'Оформление', 'Прием документов на', 'Продление', 'Получение справки о']
+SERVICE_SUBJECTS = ['паспорта', 'водительского удостоверения', 'пособия', 'субсидии', 'права собственности', 'льготы', 'выписки ЕГРН', 'СНИЛС', 'полиса ОМС', 'разрешения']
+FIRST_NAMES = ['Иван', 'Петр', 'Мария', 'Алексей', 'Ольга', 'Дмитрий', 'Екатерина', 'Сергей', 'Анна', 'Максим']
+LAST_NAMES = ['Иванов', 'Петров', 'Сидоров', 'Кузнецов', 'Смирнов', 'Васильев', 'Николаев', 'Федоров', 'Александров', 'Дмитриев']
+POSITIONS = ['specialist', 'manager', 'consultant', 'operator']
+
+# Схемы данных заявления (см. services/application_data.py) по ключевому слову в названии услуги
+PASSPORT_SCHEMA = [
+    {'name': 'passport_series', 'label': 'Серия паспорта', 'type': 'string', 'required': True,
+     'pattern': r'^\d{4}$', 'pattern_error': 'Серия паспорта — 4 цифры.'},
+    {'name': 'passport_number', 'label': 'Номер паспорта', 'type': 'string', 'required': True,
+     'pattern': r'^\d{6}$', 'pattern_error': 'Номер паспорта — 6 цифр.'},
+    {'name': 'issue_date', 'label': 'Дата выдачи', 'type': 'date'},
+]
+SNILS_SCHEMA = [
+    {'name': 'snils', 'label': 'СНИЛС', 'type': 'string', 'required': True,
+     'pattern': r'^\d{11}$', 'pattern_error': 'СНИЛС — 11 цифр без пробелов и дефисов.'},
+]
+INN_SCHEMA = [
+    {'name': 'inn', 'label': 'ИНН', 'type': 'string', 'required': True,
+     'pattern': r'^\d{10}(\d{2})?$', 'pattern_error': 'ИНН — 10 или 12 цифр.'},
+]
+DATA_SCHEMAS = [
+    ('паспорт', PASSPORT_SCHEMA),
+    ('снилс', SNILS_SCHEMA),
+    ('налог', INN_SCHEMA),
+    ('инн', INN_SCHEMA),
+]
+FAKE_DATA_VALUES = {
+    'passport_series': lambda rng: f'{rng.randint(0, 9999):04d}',
+    'passport_number': lambda rng: f'{rng.randint(0, 999_999):06d}',
+    'issue_date': lambda rng: (timezone.localdate() - timedelta(days=rng.randint(30, 7000))).isoformat(),
+    'snils': lambda rng: f'{rng.randint(0, 99_999_999_999):011d}',
+    'inn': lambda rng: f'{rng.randint(0, 999_999_999_999):012d}',
+}
+
+
+def schema_for(service_name):
+    name = service_name.lower()
+    for keyword, schema in DATA_SCHEMAS:
+        if keyword in name:
+            return schema
+    return []
 
 class Command(BaseCommand):
     help = 'Generate fake data for MFC project'
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--scale', choices=sorted(SCALES), default='small',
+            help='Preset of total object counts (default: small)'
+        )
+        for name in SCALES['small']:
+            parser.add_argument(
+                f'--{name}', type=int, default=None,
+                help=f'Total number of {name} (overrides --scale)'
+            )
+        parser.add_argument('--seed', type=int, default=None, help='Random seed for reproducible data')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Rows per bulk_create batch')
+
     def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        targets = dict(SCALES[options['scale']])
+        for name in targets:
+            if options[name] is not None:
+                targets[name] = options[name]
+
         self.stdout.write('Generating fake data...')
+        started = time.monotonic()
 
         # Очистка старых данных (осторожно!)
         # News.objects.all().delete()
@@ -22,15 +118,43 @@ class Command(BaseCommand):
         # MFCOffice.objects.all().delete()
         # ApplicationStatus.objects.all().delete()
 
+        self.create_reference_data()
+
+        # Массовая генерация до заданного количества объектов
+        self.generate_services(targets['services'])
+        self.generate_offices(targets['offices'])
+        self.generate_users(targets['users'])
+        self.generate_applications(targets['applications'])
+        self.generate_appointments(targets['appointments'])
+        self.generate_news(targets['news'])
+
+        # bulk_create обходит сигналы: пересчитываем производные данные
+        call_command('reconcile_stats', stdout=self.stdout)
+        call_command('rebuild_search_index', stdout=self.stdout)
+        bump_version('news', 'services', 'offices', 'applications', 'statuses')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Successfully generated fake data in {time.monotonic() - started:.1f}s'
+        ))
+
+    def create_reference_data(self):
+        """Базовые справочники и небольшой набор именованных объектов"""
+        rng = self.rng
+
         # Создание статусов заявлений
-        statuses = ['Подано', 'В работе', 'Выполнено', 'Отклонено']
-        for status in statuses:
-            ApplicationStatus.objects.get_or_create(name=status)
+        statuses = [
+            (ApplicationStatus.SUBMITTED, 'Подано'),
+            (ApplicationStatus.IN_PROGRESS, 'В работе'),
+            (ApplicationStatus.COMPLETED, 'Выполнено'),
+            (ApplicationStatus.REJECTED, 'Отклонено'),
+        ]
+        for code, name in statuses:
+            ApplicationStatus.objects.get_or_create(code=code, defaults={'name': name})
 
         # Создание категорий услуг
         categories_data = [
             'Паспортные услуги',
-            'Налоговые услуги', 
+            'Налоговые услуги',
             'Социальные услуги',
             'Регистрационные услуги',
             'Жилищно-коммунальные услуги'
@@ -65,27 +189,30 @@ class Command(BaseCommand):
                     'category': category,
                     'description': f'Описание услуги {service_name}',
                     'execution_term': term,
-                    'cost': cost
+                    'cost': cost,
+                    'data_schema': schema_for(service_name),
                 }
             )
             services.append(service)
 
         # Создание офисов МФЦ
         offices_data = [
-            ('МФЦ на Ленина', 'ул. Ленина, д. 1', '+74951234567', 'пн-пт 9:00-18:00'),
-            ('МФЦ на Мира', 'ул. Мира, д. 15', '+74957654321', 'пн-пт 8:00-20:00, сб 10:00-15:00'),
-            ('МФЦ Центральный', 'пл. Центральная, д. 5', '+74951122334', 'пн-чт 9:00-17:00, пт 9:00-16:00'),
-            ('МФЦ Западный', 'ул. Западная, д. 25', '+74953344556', 'пн-пт 9:00-19:00'),
-            ('МФЦ Восточный', 'пр. Восточный, д. 10', '+74954455667', 'пн-пт 8:00-20:00, сб 9:00-14:00'),
+            ('МФЦ на Ленина', 'ул. Ленина, д. 1', '+74951234567', 'пн-пт 9:00-18:00', (55.7601, 37.6186)),
+            ('МФЦ на Мира', 'ул. Мира, д. 15', '+74957654321', 'пн-пт 8:00-20:00, сб 10:00-15:00', (55.7794, 37.6330)),
+            ('МФЦ Центральный', 'пл. Центральная, д. 5', '+74951122334', 'пн-чт 9:00-17:00, пт 9:00-16:00', (55.7539, 37.6208)),
+            ('МФЦ Западный', 'ул. Западная, д. 25', '+74953344556', 'пн-пт 9:00-19:00', (55.7370, 37.4330)),
+            ('МФЦ Восточный', 'пр. Восточный, д. 10', '+74954455667', 'пн-пт 8:00-20:00, сб 9:00-14:00', (55.7640, 37.8440)),
         ]
         offices = []
-        for name, address, phone, schedule in offices_data:
+        for name, address, phone, schedule, (latitude, longitude) in offices_data:
             office, created = MFCOffice.objects.get_or_create(
                 name=name,
                 defaults={
                     'address': address,
                     'phone': phone,
-                    'work_schedule': schedule
+                    'work_schedule': schedule,
+                    'latitude': latitude,
+                    'longitude': longitude,
                 }
             )
             offices.append(office)
@@ -103,24 +230,24 @@ class Command(BaseCommand):
             ('Александрова Анна Павловна', 'manager'),
             ('Дмитриев Максим Олегович', 'specialist'),
         ]
-        employees = []
         for name, position in employees_data:
-            office = random.choice(offices)
-            employee, created = Employee.objects.get_or_create(
+            Employee.objects.get_or_create(
                 full_name=name,
                 defaults={
-                    'office': office,
+                    'office': rng.choice(offices),
                     'position': position
                 }
             )
-            employees.append(employee)
 
         # Создание связей офисов и услуг (OfficeService)
+        existing_pairs = set(OfficeService.objects.values_list('office_id', 'service_id'))
+        new_links = []
         for office in offices:
             # Каждый офис предоставляет случайный набор услуг (от 3 до всех)
-            office_services = random.sample(services, random.randint(3, len(services)))
-            for service in office_services:
-                OfficeService.objects.get_or_create(office=office, service=service)
+            for service in rng.sample(services, rng.randint(3, len(services))):
+                if (office.id, service.id) not in existing_pairs:
+                    new_links.append(OfficeService(office=office, service=service))
+        OfficeService.objects.bulk_create(new_links, ignore_conflicts=True)
 
         # Создание пользователей и профилей
         users_data = [
@@ -130,7 +257,6 @@ class Command(BaseCommand):
             ('user4', 'user4@example.com', '12345678904'),
             ('user5', 'user5@example.com', '12345678905'),
         ]
-        users = []
         for username, email, snils in users_data:
             user, created = User.objects.get_or_create(
                 username=username,
@@ -143,50 +269,229 @@ class Command(BaseCommand):
             if created:
                 user.set_password('password123')
                 user.save()
-            profile, created = UserProfile.objects.get_or_create(
+            UserProfile.objects.get_or_create(
                 user=user,
                 defaults={
-                    'phone': '+7999' + str(random.randint(1000000, 9999999)),
+                    'phone': '+7999' + str(rng.randint(1000000, 9999999)),
                     'snils': snils,
                 }
             )
-            users.append(user)
-
-        # Создание заявлений (Application)
-        status_objs = list(ApplicationStatus.objects.all())
-        for user in users:
-            for _ in range(random.randint(1, 5)):
-                service = random.choice(services)
-                status = random.choice(status_objs)
-                application, created = Application.objects.get_or_create(
-                    user=user,
-                    service=service,
-                    status=status,
-                    defaults={
-                        'application_data': {'key': 'value'},
-                        'created_at': timezone.now() - timezone.timedelta(days=random.randint(1, 30))
-                    }
+
+    def bulk_generate(self, label, model, total, make_objects):
+        """Создает total объектов пачками по batch_size, каждая пачка в своей транзакции.
+
+        make_objects(start, count) возвращает список несохраненных объектов.
+        """
+        if total <= 0:
+            return
+        started = time.monotonic()
+        report_every = max(total // 20, self.batch_size)
+        created = next_report = 0
+        while created < total:
+            count = min(self.batch_size, total - created)
+            with transaction.atomic():
+                model.objects.bulk_create(make_objects(created, count), batch_size=self.batch_size)
+            created += count
+            if created >= next_report or created == total:
+                elapsed = time.monotonic() - started
+                self.stdout.write(
+                    f'  {label}: {created}/{total} ({elapsed:.1f}s, {created / max(elapsed, 1e-6):.0f} rows/s)'
                 )
+                next_report = created + report_every
+
+    def generate_services(self, target):
+        rng = self.rng
+        missing = target - Service.objects.count()
+        category_ids = list(ServiceCategory.objects.values_list('id', flat=True))
+        offset = Service.objects.count()
+
+        def make(start, count):
+            objects = []
+            for number in range(offset + start + 1, offset + start + count + 1):
+                name = f'{rng.choice(SERVICE_ACTIONS)} {rng.choice(SERVICE_SUBJECTS)} №{number}'
+                objects.append(Service(
+                    category_id=rng.choice(category_ids),
+                    name=name,
+                    description=f'Описание услуги {name}',
+                    execution_term=f'{rng.randint(1, 30)} дней',
+                    cost=rng.choice([0, 0, 0, 200, 300, 350, 1000, 2000]),
+                    data_schema=schema_for(name),
+                ))
+            return objects
 
-        # Создание записей на прием (Appointment)
-        for user in users:
-            for _ in range(random.randint(1, 3)):
-                office = random.choice(offices)
-                service = random.choice(services)
-                # Проверяем, что услуга доступна в выбранном офисе
-                if OfficeService.objects.filter(office=office, service=service).exists():
-                    date_time = timezone.now() + timezone.timedelta(days=random.randint(1, 30))
-                    Appointment.objects.get_or_create(
-                        user=user,
-                        office=office,
-                        service=service,
-                        appointment_datetime=date_time,
-                        defaults={
-                            'status': random.choice(['active', 'completed', 'cancelled'])
-                        }
-                    )
-
-        # Создание новостей
+        self.bulk_generate('services', Service, missing, make)
+
+    def generate_offices(self, target):
+        rng = self.rng
+        missing = target - MFCOffice.objects.count()
+        offset = MFCOffice.objects.count()
+
+        def make(start, count):
+            objects = []
+            for number in range(offset + start + 1, offset + start + count + 1):
+                street = rng.choice(STREETS)
+                objects.append(MFCOffice(
+                    name=f'МФЦ №{number} на {street}',
+                    address=f'ул. {street}, д. {rng.randint(1, 200)}',
+                    phone=f'+7495{rng.randint(1000000, 9999999)}',
+                    work_schedule=rng.choice(SCHEDULES),
+                    slot_minutes=rng.choice([10, 15, 20, 30]),
+                    slot_capacity=rng.randint(1, 8),
+                    latitude=round(CITY_CENTER[0] + rng.uniform(-0.35, 0.35), 6),
+                    longitude=round(CITY_CENTER[1] + rng.uniform(-0.55, 0.55), 6),
+                ))
+            return objects
+
+        self.bulk_generate('offices', MFCOffice, missing, make)
+        if missing <= 0:
+            return
+
+        # Сотрудники и услуги для новых офисов
+        new_offices = list(MFCOffice.objects.order_by('-id').values_list('id', flat=True)[:missing])
+        service_ids = list(Service.objects.values_list('id', flat=True))
+
+        def make_employees(start, count):
+            return [
+                Employee(
+                    office_id=office_id,
+                    full_name=f'{rng.choice(LAST_NAMES)} {rng.choice(FIRST_NAMES)}',
+                    position=rng.choice(POSITIONS),
+                )
+                for office_id in new_offices[start:start + count]
+                for _ in range(rng.randint(3, 10))
+            ]
+
+        def make_links(start, count):
+            return [
+                OfficeService(office_id=office_id, service_id=service_id)
+                for office_id in new_offices[start:start + count]
+                for service_id in rng.sample(service_ids, rng.randint(min(3, len(service_ids)), min(len(service_ids), 100)))
+            ]
+
+        self.bulk_generate('employees', Employee, len(new_offices), make_employees)
+        self.bulk_generate('office services', OfficeService, len(new_offices), make_links)
+
+    def generate_users(self, target):
+        rng = self.rng
+        missing = target - User.objects.count()
+        if missing <= 0:
+            return
+        offset = User.objects.count()
+        # Хэш пароля считаем один раз: хэширование — самая дорогая часть создания пользователя
+        password = make_password('password123')
+        first_id = offset + 1
+
+        def make(start, count):
+            objects = []
+            for number in range(first_id + start, first_id + start + count):
+                objects.append(User(
+                    username=f'loaduser{number}',
+                    email=f'loaduser{number}@example.com',
+                    first_name=rng.choice(FIRST_NAMES),
+                    last_name=rng.choice(LAST_NAMES),
+                    password=password,
+                ))
+            return objects
+
+        self.bulk_generate('users', User, missing, make)
+
+        new_users = list(
+            User.objects.filter(username__startswith='loaduser', userprofile__isnull=True)
+            .values_list('id', flat=True)
+        )
+
+        def make_profiles(start, count):
+            return [
+                UserProfile(
+                    user_id=user_id,
+                    phone=f'+7999{rng.randint(1000000, 9999999)}',
+                    snils=f'{90_000_000_000 + user_id:011d}',
+                )
+                for user_id in new_users[start:start + count]
+            ]
+
+        self.bulk_generate('profiles', UserProfile, len(new_users), make_profiles)
+
+    def generate_applications(self, target):
+        rng = self.rng
+        missing = target - Application.objects.count()
+        if missing <= 0:
+            return
+        user_ids = list(User.objects.values_list('id', flat=True))
+        schemas = dict(Service.objects.values_list('id', 'data_schema'))
+        service_ids = list(schemas)
+        status_ids = list(ApplicationStatus.objects.values_list('id', flat=True))
+        now = timezone.now()
+
+        def make(start, count):
+            objects = []
+            for _ in range(count):
+                created_at = now - timedelta(seconds=rng.randint(3600, 365 * 24 * 3600))
+                service_id = rng.choice(service_ids)
+                data = {'comment': 'Сгенерированное заявление', 'copies': rng.randint(1, 3)}
+                for field in schemas[service_id] or []:
+                    if field['name'] in FAKE_DATA_VALUES:
+                        data[field['name']] = FAKE_DATA_VALUES[field['name']](rng)
+                objects.append(Application(
+                    user_id=rng.choice(user_ids),
+                    service_id=service_id,
+                    status_id=rng.choice(status_ids),
+                    application_data=data,
+                    created_at=created_at,
+                ))
+            return objects
+
+        self.bulk_generate('applications', Application, missing, make)
+
+    def generate_appointments(self, target):
+        rng = self.rng
+        missing = target - Appointment.objects.count()
+        if missing <= 0:
+            return
+        user_ids = list(User.objects.values_list('id', flat=True))
+        services_by_office = {}
+        for office_id, service_id in OfficeService.objects.values_list('office_id', 'service_id'):
+            services_by_office.setdefault(office_id, []).append(service_id)
+
+        # Время приема выбирается из сетки слотов офиса (см. services/slots.py)
+        offices = []
+        for office in MFCOffice.objects.filter(id__in=services_by_office):
+            schedule = parse_work_schedule(office.work_schedule)
+            if schedule:
+                offices.append((office, schedule))
+        if not offices:
+            self.stdout.write(self.style.WARNING('  appointments: no offices with schedule and services'))
+            return
+
+        today = timezone.localdate()
+
+        def make(start, count):
+            objects = []
+            for _ in range(count):
+                office, schedule = rng.choice(offices)
+                day = today + timedelta(days=rng.randint(-60, 60))
+                while day.weekday() not in schedule:
+                    day += timedelta(days=1)
+                opening, closing = schedule[day.weekday()]
+                slots_per_day = (
+                    (closing.hour * 60 + closing.minute) - (opening.hour * 60 + opening.minute)
+                ) // office.slot_minutes
+                start_time = timezone.make_aware(datetime.combine(day, opening)) + timedelta(
+                    minutes=office.slot_minutes * rng.randrange(max(slots_per_day, 1))
+                )
+                objects.append(Appointment(
+                    user_id=rng.choice(user_ids),
+                    office_id=office.id,
+                    service_id=rng.choice(services_by_office[office.id]),
+                    appointment_datetime=start_time,
+                    status='active' if day >= today else rng.choice(['completed', 'cancelled']),
+                ))
+            return objects
+
+        self.bulk_generate('appointments', Appointment, missing, make)
+
+    def generate_news(self, target):
+        rng = self.rng
         news_titles = [
             'Открытие нового офиса МФЦ',
             'Введение новых услуг',
@@ -199,14 +504,25 @@ class Command(BaseCommand):
             'Обновление оборудования',
             'Повышение качества обслуживания',
         ]
-        for title in news_titles:
-            News.objects.get_or_create(
-                title=title,
-                defaults={
-                    'content': f'Содержание новости: {title}. Подробности будут позже.',
-                    'author': random.choice(employees),
-                    'published_at': timezone.now() - timezone.timedelta(days=random.randint(1, 100))
-                }
-            )
+        existing = News.objects.count()
+        missing = target - existing
+        if missing <= 0:
+            return
+        employee_ids = list(Employee.objects.values_list('id', flat=True))
+        now = timezone.now()
+
+        def make(start, count):
+            objects = []
+            for number in range(existing + start, existing + start + count):
+                title = news_titles[number % len(news_titles)]
+                if number >= len(news_titles):
+                    title = f'{title} ({number // len(news_titles) + 1})'
+                objects.append(News(
+                    title=title,
+                    content=f'Содержание новости: {title}. Подробности будут позже.',
+                    author_id=rng.choice(employee_ids),
+                    published_at=now - timedelta(days=rng.randint(1, 100), seconds=rng.randint(0, 86400)),
+                ))
+            return objects
 
-        self.stdout.write(self.style.SUCCESS('Successfully generated fake data'))
\ No newline at end of file
+        self.bulk_generate('news', News, missing, make)
@@ -0,0 +1,48 @@
+import os
+import socket
+import time
+import uuid
+
+from django.core.management.base import BaseCommand
+
+from services import tasks
+
+
+class Command(BaseCommand):
+    help = 'Process queued background tasks (notifications)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=None)
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Process ready tasks and exit instead of polling'
+        )
+        parser.add_argument(
+            '--sleep', type=float, default=None,
+            help='Seconds to wait when the queue is empty'
+        )
+
+    def handle(self, *args, **options):
+        worker_id = f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}'
+        batch_size = options['batch_size'] or tasks.task_setting('BATCH_SIZE')
+        sleep = options['sleep'] if options['sleep'] is not None else tasks.task_setting('IDLE_SLEEP_SECONDS')
+
+        self.stdout.write(f'Worker {worker_id} started')
+        total_done = total_failed = 0
+        try:
+            while True:
+                done, failed = tasks.run_batch(worker_id, batch_size)
+                total_done += done
+                total_failed += failed
+                if done or failed:
+                    self.stdout.write(f'Batch: {done} done, {failed} failed')
+                if done + failed < batch_size:
+                    if options['once']:
+                        break
+                    time.sleep(sleep)
+        except KeyboardInterrupt:
+            pass
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Processed {total_done} tasks, {total_failed} failed'
+        ))
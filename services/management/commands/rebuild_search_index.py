@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from services import search
+
+
+class Command(BaseCommand):
+    help = 'Rebuild full-text search index for services, offices and news'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        if not search.is_available():
+            raise CommandError('Full-text search index requires SQLite with FTS5')
+
+        self.stdout.write('Rebuilding search index...')
+        with transaction.atomic():
+            total = search.rebuild_index(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Indexed {total} documents'))
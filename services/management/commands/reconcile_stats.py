@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+
+from services import stats
+from services.caching import bump_version
+
+
+class Command(BaseCommand):
+    help = 'Recompute statistics counters and repair drift'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Only report drift, do not fix counters'
+        )
+
+    def handle(self, *args, **options):
+        drift = stats.reconcile(fix=not options['dry_run'])
+        daily_drift = stats.reconcile_daily(fix=not options['dry_run'])
+        if not drift and not daily_drift:
+            self.stdout.write(self.style.SUCCESS('All counters are consistent'))
+            return
+
+        for name, (stored, actual) in drift.items():
+            self.stdout.write(f'{name}: stored={stored} actual={actual}')
+        for day, (stored, actual) in sorted(daily_drift.items())[:20]:
+            self.stdout.write(f'applications on {day}: stored={stored} actual={actual}')
+        if len(daily_drift) > 20:
+            self.stdout.write(f'... and {len(daily_drift) - 20} more days')
+
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING(
+                f'{len(drift)} counters and {len(daily_drift)} daily totals drifted (not fixed)'
+            ))
+        else:
+            bump_version('services', 'offices', 'applications')
+            self.stdout.write(self.style.SUCCESS(f'Fixed {len(drift)} counters and {len(daily_drift)} daily totals'))
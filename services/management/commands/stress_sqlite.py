@@ -0,0 +1,191 @@
+import copy
+import statistics
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection
+from django.db.models import F
+from django.test import override_settings
+
+from services import db
+from services.models import Application, Service
+
+from .benchmark_views import percentile
+
+
+class Command(BaseCommand):
+    help = (
+        'Concurrency stress test for the SQLite profile: writer threads hold the exclusive write lock '
+        '(BEGIN EXCLUSIVE ... sleep ... COMMIT, the window a rollback-journal commit or cache spill '
+        'needs) while reader threads query the same tables. Read latency is compared with a run '
+        'without writers. The configured journal mode must not stall readers; the same run in '
+        '--compare-mode (delete by default) must stall them, which shows the test can detect '
+        'blocking. Writers only rewrite existing values, the data is not changed.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--readers', type=int, default=8)
+        parser.add_argument('--writers', type=int, default=4)
+        parser.add_argument('--duration', type=float, default=5.0, help='Seconds')
+        parser.add_argument('--hold-ms', type=float, default=50.0,
+                            help='How long each write transaction holds the write lock')
+        parser.add_argument('--journal-mode', help='Override the configured journal_mode for the main run')
+        parser.add_argument('--compare-mode', default='delete',
+                            help='Journal mode that is expected to stall readers (default: delete)')
+        parser.add_argument('--no-compare', action='store_true', help='Skip the comparison run')
+        parser.add_argument('--no-check', action='store_true', help='Only report, do not fail')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('This command only makes sense for SQLite')
+        sample = list(Application.objects.order_by('-id').values_list('id', 'user_id')[:200])
+        if not sample:
+            raise CommandError('No applications: run gererate_fake_data first')
+
+        journal_mode = options['journal_mode'] or settings.MFC_SETTINGS['SQLITE']['PRAGMAS'].get('journal_mode', 'delete')
+        blocked = self.run_mode(sample, options, journal_mode)
+        if not options['no_check'] and blocked:
+            raise CommandError(f'Readers were blocked by writers in {journal_mode} mode')
+
+        if options['no_compare'] or options['compare_mode'] == journal_mode:
+            if not options['no_check']:
+                self.stdout.write(self.style.SUCCESS(f'Readers were not blocked by writers in {journal_mode} mode'))
+            return
+        compare_blocked = self.run_mode(sample, options, options['compare_mode'])
+        if options['no_check']:
+            return
+        if not compare_blocked:
+            raise CommandError(
+                f'Readers were not blocked in {options["compare_mode"]} mode either: the run does not '
+                f'show that {journal_mode} is what keeps readers unblocked'
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'Readers were not blocked in {journal_mode} mode and were stalled in {options["compare_mode"]} mode'
+        ))
+
+    def run_mode(self, sample, options, journal_mode):
+        """Прогон без писателей и с писателями в режиме журнала journal_mode;
+        True, если читатели ждали писателей"""
+        mfc_settings = copy.deepcopy(settings.MFC_SETTINGS)
+        mfc_settings['SQLITE']['PRAGMAS']['journal_mode'] = journal_mode
+        # Режим журнала меняется только при единственном открытом соединении
+        connection.close()
+        with override_settings(MFC_SETTINGS=mfc_settings):
+            connection.ensure_connection()
+            self.stdout.write(f'\nPRAGMA: {db.pragmas()}')
+            connection.close()
+            baseline, _ = self.run(sample, options, writers=0)
+            reads, writes = self.run(sample, options, writers=options['writers'])
+        connection.close()
+        return self.report(baseline, reads, writes, options)
+
+    def run(self, sample, options, writers):
+        deadline = time.perf_counter() + options['duration']
+        hold = options['hold_ms'] / 1000
+        start = threading.Barrier(options['readers'] + writers)
+        reads = {'timings': [], 'errors': 0}
+        writes = {'commits': 0, 'errors': 0, 'timings': []}
+        lock = threading.Lock()
+        application_ids = [application_id for application_id, user_id in sample]
+        user_ids = [user_id for application_id, user_id in sample]
+
+        def reader(number):
+            start.wait()
+            i = number
+            try:
+                while time.perf_counter() < deadline:
+                    i += 1
+                    started = time.perf_counter()
+                    try:
+                        list(
+                            Application.objects.filter(user_id=user_ids[i % len(user_ids)])
+                            .select_related('service', 'status').order_by('-created_at')[:20]
+                        )
+                        Service.objects.filter(category__isnull=False).count()
+                    except OperationalError:
+                        with lock:
+                            reads['errors'] += 1
+                        continue
+                    with lock:
+                        reads['timings'].append((time.perf_counter() - started) * 1000)
+            finally:
+                connection.close()
+
+        @db.retry_on_busy
+        def write(ids):
+            # BEGIN EXCLUSIVE берёт блокировку записи сразу и держит её до
+            # COMMIT — как фиксация или сброс страниц кэша на диск в режиме
+            # журнала отката, когда читать базу нельзя. В WAL читатели
+            # продолжают читать последний зафиксированный снимок.
+            with connection.cursor() as cursor:
+                cursor.execute('BEGIN EXCLUSIVE')
+                try:
+                    # Запись без изменения данных: страницы всё равно переписываются
+                    Application.objects.filter(id__in=ids).update(updated_at=F('updated_at'))
+                    time.sleep(hold)
+                except BaseException:
+                    cursor.execute('ROLLBACK')
+                    raise
+                cursor.execute('COMMIT')
+
+        def writer(number):
+            start.wait()
+            i = number
+            try:
+                while time.perf_counter() < deadline:
+                    i += 1
+                    ids = application_ids[(i * 10) % len(application_ids):][:10]
+                    started = time.perf_counter()
+                    try:
+                        write(ids)
+                    except OperationalError:
+                        with lock:
+                            writes['errors'] += 1
+                        continue
+                    with lock:
+                        writes['commits'] += 1
+                        writes['timings'].append((time.perf_counter() - started) * 1000)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=reader, args=(n,)) for n in range(options['readers'])]
+        threads += [threading.Thread(target=writer, args=(n,)) for n in range(writers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return reads, writes
+
+    def report(self, baseline, reads, writes, options):
+        if not baseline['timings'] or not reads['timings']:
+            raise CommandError('No successful reads')
+        duration = options['duration']
+        self.report_reads('reads, no writers:  ', baseline, duration)
+        self.report_reads('reads, with writers:', reads, duration)
+        if writes['timings']:
+            self.stdout.write(
+                f'writes: {writes["commits"] / duration:.1f}/s, p50 {statistics.median(writes["timings"]):.2f} ms, '
+                f'max {max(writes["timings"]):.2f} ms, errors {writes["errors"]}'
+            )
+        else:
+            self.stdout.write(f'writes: none committed, errors {writes["errors"]}')
+
+        # Заблокированный читатель ждал бы конца пишущей транзакции, то есть
+        # порядка hold-ms; рост задержки меньше половины этого времени —
+        # шум от конкуренции потоков
+        slowdown = percentile(reads['timings'], 0.95) - percentile(baseline['timings'], 0.95)
+        blocked = bool(reads['errors']) or slowdown >= options['hold_ms'] / 2
+        self.stdout.write(
+            f'p95 read slowdown under writes: {slowdown:.2f} ms (hold {options["hold_ms"]:.0f} ms): '
+            f'{"readers stalled" if blocked else "readers not blocked"}'
+        )
+        return blocked
+
+    def report_reads(self, title, reads, duration):
+        timings = reads['timings']
+        self.stdout.write(
+            f'{title} {len(timings) / duration:.1f}/s, p50 {statistics.median(timings):.2f} ms, '
+            f'p95 {percentile(timings, 0.95):.2f} ms, max {max(timings):.2f} ms, errors {reads["errors"]}'
+        )
@@ -0,0 +1,164 @@
+"""Учет SQL-запросов по каждому HTTP-запросу.
+
+Middleware считает запросы и время работы с базой через
+connection.execute_wrapper, группирует запросы по тексту SQL (форме
+запроса без параметров) и пишет в логгер ``services`` предупреждение,
+если одна форма выполнялась много раз с разными параметрами — типичный
+признак N+1. Инструментируется только доля запросов SAMPLE_RATE.
+
+Обертка execute_wrapper ставится на каждое соединение при его создании
+(install_query_hook) и передает запросы сборщику текущего HTTP-запроса
+из contextvar. Под ASGI ORM работает в потоке sync_to_async со своим
+соединением, но asgiref переносит туда контекст, поэтому запросы
+асинхронных представлений учитываются так же, как синхронных.
+"""
+import contextvars
+import logging
+import random
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+logger = logging.getLogger('services')
+
+
+class QueryRecorder:
+    """Обертка execute_wrapper, собирающая статистику запросов"""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        # SQL -> [число выполнений, множество отпечатков параметров]
+        self.shapes = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - started
+            self.count += 1
+            shape = self.shapes.get(sql)
+            if shape is None:
+                shape = self.shapes[sql] = [0, set()]
+            shape[0] += 1
+            shape[1].add(self._fingerprint(params, many))
+
+    @classmethod
+    def _fingerprint(cls, params, many=False):
+        """Отпечаток параметров; у executemany — кортеж отпечатков строк"""
+        if params is None:
+            return None
+        if many:
+            return tuple(cls._fingerprint(row) for row in params)
+        if isinstance(params, dict):
+            params = sorted(params.items())
+        try:
+            return hash(tuple(params))
+        except TypeError:
+            return repr(tuple(params))
+
+    def repeated_shapes(self, threshold):
+        """Формы запросов, выполненные не меньше threshold раз с разными параметрами"""
+        return [
+            (sql, executions, len(fingerprints))
+            for sql, (executions, fingerprints) in self.shapes.items()
+            if executions >= threshold and len(fingerprints) > 1
+        ]
+
+    def duplicates(self):
+        """Запросы, повторенные с одинаковыми параметрами"""
+        return [
+            (sql, executions - len(fingerprints))
+            for sql, (executions, fingerprints) in self.shapes.items()
+            if executions > len(fingerprints)
+        ]
+
+
+_current_recorder = contextvars.ContextVar('query_recorder', default=None)
+
+
+def record_query(execute, sql, params, many, context):
+    recorder = _current_recorder.get()
+    if recorder is None:
+        return execute(sql, params, many, context)
+    return recorder(execute, sql, params, many, context)
+
+
+def install_query_hook(sender, connection, **kwargs):
+    """Обработчик connection_created: подключает record_query к соединению"""
+    # Объект соединения переживает переподключения, обертка нужна одна
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+class QueryInstrumentationMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.config = settings.MFC_SETTINGS['SQL_INSTRUMENTATION']
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def sampled(self):
+        return self.config['ENABLED'] and random.random() < self.config['SAMPLE_RATE']
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        if not self.sampled():
+            return self.get_response(request)
+
+        recorder = QueryRecorder()
+        token = _current_recorder.set(recorder)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current_recorder.reset(token)
+        return self.finish(request, response, recorder, started)
+
+    async def __acall__(self, request):
+        if not self.sampled():
+            return await self.get_response(request)
+
+        recorder = QueryRecorder()
+        token = _current_recorder.set(recorder)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current_recorder.reset(token)
+        return self.finish(request, response, recorder, started)
+
+    def finish(self, request, response, recorder, started):
+        total_ms = (time.perf_counter() - started) * 1000
+        self.report(request, recorder, total_ms)
+        if self.config['SERVER_TIMING']:
+            response['Server-Timing'] = (
+                f'db;dur={recorder.duration * 1000:.1f};desc="{recorder.count} queries", '
+                f'app;dur={total_ms:.1f}'
+            )
+        return response
+
+    def report(self, request, recorder, total_ms):
+        match = getattr(request, 'resolver_match', None)
+        view = match.view_name if match else request.path
+        db_ms = recorder.duration * 1000
+
+        logger.debug('%s %s: %d queries, db %.1f ms, total %.1f ms',
+                     request.method, view, recorder.count, db_ms, total_ms)
+
+        for sql, executions, variants in recorder.repeated_shapes(self.config['N_PLUS_ONE_THRESHOLD']):
+            logger.warning('Possible N+1 in %s: query executed %d times with %d different parameter sets: %s',
+                           view, executions, variants, sql[:300])
+        for sql, repeats in recorder.duplicates():
+            logger.info('Duplicate query in %s repeated %d extra times: %s', view, repeats, sql[:300])
+
+        if total_ms >= self.config['SLOW_REQUEST_MS']:
+            logger.warning('Slow request %s %s: %.1f ms (%d queries, db %.1f ms)',
+                           request.method, view, total_ms, recorder.count, db_ms)
@@ -0,0 +1,50 @@
+from django.db import migrations
+
+SEARCH_TABLE = 'services_search_index'
+TYPE_BITS = 2
+
+
+def _normalize(text):
+    return (text or '').lower().replace('ё', 'е')
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5("
+        f"title, body, tokenize = 'unicode61 remove_diacritics 2')"
+    )
+    sources = [
+        ('Service', 1, 'name', 'description'),
+        ('MFCOffice', 2, 'name', 'address'),
+        ('News', 3, 'title', 'content'),
+    ]
+    with schema_editor.connection.cursor() as cursor:
+        for model_name, type_code, title_field, body_field in sources:
+            model = apps.get_model('services', model_name)
+            rows = [
+                ((pk << TYPE_BITS) | type_code, _normalize(title), _normalize(body))
+                for pk, title, body in model.objects.values_list('pk', title_field, body_field)
+            ]
+            cursor.executemany(
+                f'INSERT INTO {SEARCH_TABLE} (rowid, title, body) VALUES (%s, %s, %s)',
+                rows
+            )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(f'DROP TABLE IF EXISTS {SEARCH_TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('services', '0003_application_services_ap_user_id_504ac0_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
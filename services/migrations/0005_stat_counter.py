@@ -0,0 +1,42 @@
+# Generated by Django 4.2.7 on 2026-10-18 01:45
+
+from django.db import migrations, models
+from django.db.models import Sum
+
+
+def fill_counters(apps, schema_editor):
+    StatCounter = apps.get_model('services', 'StatCounter')
+    Service = apps.get_model('services', 'Service')
+    MFCOffice = apps.get_model('services', 'MFCOffice')
+    Application = apps.get_model('services', 'Application')
+    total_cost = Service.objects.aggregate(total=Sum('cost'))['total'] or 0
+    StatCounter.objects.bulk_create([
+        StatCounter(name='services', value=Service.objects.count()),
+        StatCounter(name='offices', value=MFCOffice.objects.count()),
+        StatCounter(name='applications', value=Application.objects.count()),
+        StatCounter(name='service_cost_kopecks', value=int(total_cost * 100)),
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('services', '0004_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StatCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True, verbose_name='Название счётчика')),
+                ('value', models.BigIntegerField(default=0, verbose_name='Значение')),
+            ],
+            options={
+                'verbose_name': 'Счётчик статистики',
+                'verbose_name_plural': 'Счётчики статистики',
+                'ordering': ['name'],
+            },
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
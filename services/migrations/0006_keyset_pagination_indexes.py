@@ -0,0 +1,25 @@
+# Generated by Django 4.2.7 on 2026-10-18 01:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('services', '0005_stat_counter'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='mfcoffice',
+            index=models.Index(fields=['name', 'id'], name='services_mf_name_781a99_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='news',
+            index=models.Index(fields=['-published_at', 'id'], name='services_ne_publish_04e5cd_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='application',
+            index=models.Index(fields=['user', '-created_at', '-id'], name='services_ap_user_id_cea4ff_idx'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 4.2.7 on 2026-10-18 01:47
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('services', '0006_keyset_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mfcoffice',
+            name='slot_capacity',
+            field=models.PositiveSmallIntegerField(default=1, validators=[django.core.validators.MinValueValidator(1)], verbose_name='Мест в слоте приема'),
+        ),
+        migrations.AddField(
+            model_name='mfcoffice',
+            name='slot_minutes',
+            field=models.PositiveSmallIntegerField(default=15, validators=[django.core.validators.MinValueValidator(1)], verbose_name='Длительность слота приема (мин)'),
+        ),
+        migrations.AddConstraint(
+            model_name='mfcoffice',
+            constraint=models.CheckConstraint(check=models.Q(('slot_minutes__gte', 1)), name='mfcoffice_slot_minutes_positive'),
+        ),
+        migrations.AddConstraint(
+            model_name='mfcoffice',
+            constraint=models.CheckConstraint(check=models.Q(('slot_capacity__gte', 1)), name='mfcoffice_slot_capacity_positive'),
+        ),
+    ]
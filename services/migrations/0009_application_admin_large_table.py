@@ -0,0 +1,54 @@
+# Generated by Django 4.2.7 on 2026-10-18 01:53
+
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+
+
+def fill_daily_stats(apps, schema_editor):
+    Application = apps.get_model('services', 'Application')
+    ApplicationDailyStat = apps.get_model('services', 'ApplicationDailyStat')
+    rows = (
+        Application.objects.order_by()
+        .annotate(day=TruncDate('created_at'))
+        .values('day').annotate(total=Count('id'))
+        .values_list('day', 'total')
+    )
+    ApplicationDailyStat.objects.bulk_create(
+        [ApplicationDailyStat(day=day, count=total) for day, total in rows],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('services', '0008_background_task'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ApplicationDailyStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(unique=True, verbose_name='День')),
+                ('count', models.PositiveIntegerField(default=0, verbose_name='Заявлений')),
+            ],
+            options={
+                'verbose_name': 'Заявления за день',
+                'verbose_name_plural': 'Заявления по дням',
+                'ordering': ['-day'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='application',
+            index=models.Index(fields=['created_at', 'id'], name='services_ap_created_dc1e23_idx'),
+        ),
+        migrations.RunPython(fill_daily_stats, migrations.RunPython.noop),
+        # Поиск заявлений в админке по началу логина без учёта регистра
+        migrations.RunSQL(
+            'CREATE INDEX services_auth_user_username_lower ON auth_user (lower(username))',
+            'DROP INDEX services_auth_user_username_lower',
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 4.2.7 on 2026-10-18 02:10
+
+from django.db import migrations, models
+
+STATUS_CODES = {
+    'Подано': 'submitted',
+    'В работе': 'in_progress',
+    'Выполнено': 'completed',
+    'Отклонено': 'rejected',
+}
+
+
+def fill_status_codes(apps, schema_editor):
+    ApplicationStatus = apps.get_model('services', 'ApplicationStatus')
+    for status in ApplicationStatus.objects.all():
+        status.code = STATUS_CODES.get(status.name, f'status-{status.id}')
+        status.save(update_fields=['code'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('services', '0009_application_admin_large_table'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='applicationstatus',
+            name='code',
+            field=models.SlugField(max_length=30, null=True, verbose_name='Код статуса'),
+        ),
+        migrations.RunPython(fill_status_codes, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='applicationstatus',
+            name='code',
+            field=models.SlugField(max_length=30, unique=True, verbose_name='Код статуса'),
+        ),
+    ]
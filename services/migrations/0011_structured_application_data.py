@@ -0,0 +1,75 @@
+# Generated by Django 4.2.7 on 2026-10-18 02:02
+
+import json
+
+from django.db import migrations, models
+import services.application_data
+
+BATCH_SIZE = 2000
+
+
+def as_json_object(text):
+    """Текст заявления в виде JSON-объекта; произвольный текст становится комментарием"""
+    text = (text or '').strip()
+    if not text:
+        return '{}'
+    value = services.application_data.parse_legacy_text(text)
+    if value is None:
+        value = {'comment': text}
+    return json.dumps(value, ensure_ascii=False)
+
+
+def text_to_json(apps, schema_editor):
+    Application = apps.get_model('services', 'Application')
+    last_id = 0
+    while True:
+        rows = list(
+            Application.objects.filter(id__gt=last_id).order_by('id')
+            .values_list('id', 'application_data')[:BATCH_SIZE]
+        )
+        if not rows:
+            break
+        last_id = rows[-1][0]
+        changed = [
+            Application(id=pk, application_data=as_json_object(text))
+            for pk, text in rows
+            if as_json_object(text) != text
+        ]
+        Application.objects.bulk_update(changed, ['application_data'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('services', '0010_application_status_code'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='service',
+            name='data_schema',
+            field=models.JSONField(blank=True, default=list, help_text='Описание полей данных заявления, см. services/application_data.py', verbose_name='Поля заявления'),
+        ),
+        migrations.RunPython(text_to_json, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='application',
+            name='application_data',
+            field=models.JSONField(blank=True, default=dict, verbose_name='Данные заявления'),
+        ),
+        migrations.AddIndex(
+            model_name='application',
+            index=models.Index(services.application_data.JSONExtract('application_data', 'passport_series'), name='app_data_passport_series_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='application',
+            index=models.Index(services.application_data.JSONExtract('application_data', 'passport_number'), name='app_data_passport_number_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='application',
+            index=models.Index(services.application_data.JSONExtract('application_data', 'snils'), name='app_data_snils_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='application',
+            index=models.Index(services.application_data.JSONExtract('application_data', 'inn'), name='app_data_inn_idx'),
+        ),
+    ]
@@ -1,8 +1,11 @@
 from django.db import models
+from django.core.validators import MaxValueValidator, MinValueValidator
 from django.contrib.auth.models import User
 from django.urls import reverse
 from django.utils import timezone
 
+from .application_data import COMMENT_KEY, INDEXED_KEYS, JSONExtract, display_items, validate_schema
+
 class ServiceCategory(models.Model):
     name = models.CharField(max_length=200, verbose_name="Название категории")
     description = models.TextField(verbose_name="Описание", blank=True)
@@ -21,6 +24,8 @@ class Service(models.Model):
     description = models.TextField(verbose_name="Описание", blank=True)
     execution_term = models.CharField(max_length=100, verbose_name="Срок исполнения")
     cost = models.DecimalField(max_digits=10, decimal_places=2, verbose_name="Стоимость", default=0)
+    data_schema = models.JSONField(default=list, blank=True, verbose_name="Поля заявления",
+                                   help_text="Описание полей данных заявления, см. services/application_data.py")
     
     class Meta:
         verbose_name = "Услуга"
@@ -33,17 +38,40 @@ class Service(models.Model):
     
     def __str__(self):
         return self.name
+    
+    def clean(self):
+        validate_schema(self.data_schema)
 
 class MFCOffice(models.Model):
     name = models.CharField(max_length=200, verbose_name="Название офиса")
     address = models.CharField(max_length=300, verbose_name="Адрес")
     phone = models.CharField(max_length=20, verbose_name="Телефон")
     work_schedule = models.CharField(max_length=100, verbose_name="График работы")
+    slot_minutes = models.PositiveSmallIntegerField(
+        default=15, validators=[MinValueValidator(1)], verbose_name="Длительность слота приема (мин)"
+    )
+    slot_capacity = models.PositiveSmallIntegerField(
+        default=1, validators=[MinValueValidator(1)], verbose_name="Мест в слоте приема"
+    )
+    # Координаты для поиска ближайших офисов (services/geo.py)
+    latitude = models.FloatField(
+        null=True, blank=True, validators=[MinValueValidator(-90), MaxValueValidator(90)], verbose_name="Широта"
+    )
+    longitude = models.FloatField(
+        null=True, blank=True, validators=[MinValueValidator(-180), MaxValueValidator(180)], verbose_name="Долгота"
+    )
     
     class Meta:
         verbose_name = "Офис МФЦ"
         verbose_name_plural = "Офисы МФЦ"
         ordering = ['name']
+        indexes = [
+            models.Index(fields=['name', 'id']),
+        ]
+        constraints = [
+            models.CheckConstraint(check=models.Q(slot_minutes__gte=1), name='mfcoffice_slot_minutes_positive'),
+            models.CheckConstraint(check=models.Q(slot_capacity__gte=1), name='mfcoffice_slot_capacity_positive'),
+        ]
     
     def __str__(self):
         return self.name
@@ -69,6 +97,12 @@ class Employee(models.Model):
         return f"{self.full_name} - {self.get_position_display()}"
 
 class ApplicationStatus(models.Model):
+    SUBMITTED = 'submitted'
+    IN_PROGRESS = 'in_progress'
+    COMPLETED = 'completed'
+    REJECTED = 'rejected'
+    
+    code = models.SlugField(max_length=30, unique=True, verbose_name="Код статуса")
     name = models.CharField(max_length=50, verbose_name="Название статуса")
     
     class Meta:
@@ -95,7 +129,7 @@ class Application(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, verbose_name="Пользователь")
     service = models.ForeignKey(Service, on_delete=models.CASCADE, verbose_name="Услуга")
     status = models.ForeignKey(ApplicationStatus, on_delete=models.CASCADE, verbose_name="Статус")
-    application_data = models.TextField(verbose_name="Данные заявления", default="", blank=True)  
+    application_data = models.JSONField(verbose_name="Данные заявления", default=dict, blank=True)
     created_at = models.DateTimeField(default=timezone.now, verbose_name="Дата создания")
     updated_at = models.DateTimeField(auto_now=True, verbose_name="Дата обновления")
     
@@ -105,12 +139,26 @@ class Application(models.Model):
         ordering = ['-created_at']
         indexes = [
             models.Index(fields=['user', 'created_at']),
+            # Список заявлений пользователя: фильтр и курсорная сортировка по одному индексу
+            models.Index(fields=['user', '-created_at', '-id']),
             models.Index(fields=['status']),
+            models.Index(fields=['created_at', 'id']),
+        ] + [
+            models.Index(JSONExtract('application_data', key), name=f'app_data_{key}_idx')
+            for key in INDEXED_KEYS
         ]
     
     def __str__(self):
         return f"Заявление #{self.id} - {self.service.name}"
     
+    @property
+    def comment(self):
+        return (self.application_data or {}).get(COMMENT_KEY, '')
+    
+    def data_items(self):
+        """Данные заявления с подписями из схемы услуги"""
+        return display_items(self.service.data_schema, self.application_data)
+    
     def get_absolute_url(self):
         return reverse('application_detail', args=[str(self.id)])
 
@@ -161,9 +209,73 @@ class News(models.Model):
         verbose_name = "Новость"
         verbose_name_plural = "Новости"
         ordering = ['-published_at']
+        indexes = [
+            models.Index(fields=['-published_at', 'id']),
+        ]
     
     def __str__(self):
         return self.title
     
     def get_absolute_url(self):
-        return reverse('news_detail', args=[str(self.id)])
\ No newline at end of file
+        return reverse('news_detail', args=[str(self.id)])
+
+class StatCounter(models.Model):
+    name = models.CharField(max_length=50, unique=True, verbose_name="Название счётчика")
+    value = models.BigIntegerField(default=0, verbose_name="Значение")
+    
+    class Meta:
+        verbose_name = "Счётчик статистики"
+        verbose_name_plural = "Счётчики статистики"
+        ordering = ['name']
+    
+    def __str__(self):
+        return f"{self.name}: {self.value}"
+
+
+class ApplicationDailyStat(models.Model):
+    day = models.DateField(unique=True, verbose_name="День")
+    count = models.PositiveIntegerField(default=0, verbose_name="Заявлений")
+    
+    class Meta:
+        verbose_name = "Заявления за день"
+        verbose_name_plural = "Заявления по дням"
+        ordering = ['-day']
+    
+    def __str__(self):
+        return f"{self.day}: {self.count}"
+
+
+class BackgroundTask(models.Model):
+    STATUS_PENDING = 'pending'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'В очереди'),
+        (STATUS_RUNNING, 'Выполняется'),
+        (STATUS_DONE, 'Выполнена'),
+        (STATUS_FAILED, 'Ошибка'),
+    ]
+    
+    task_type = models.CharField(max_length=50, verbose_name="Тип задачи")
+    payload = models.JSONField(default=dict, blank=True, verbose_name="Параметры")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_PENDING, verbose_name="Статус")
+    attempts = models.PositiveSmallIntegerField(default=0, verbose_name="Попыток")
+    max_attempts = models.PositiveSmallIntegerField(default=5, verbose_name="Максимум попыток")
+    run_after = models.DateTimeField(default=timezone.now, verbose_name="Выполнить после")
+    locked_by = models.CharField(max_length=100, blank=True, verbose_name="Обработчик")
+    locked_at = models.DateTimeField(null=True, blank=True, verbose_name="Взята в работу")
+    last_error = models.TextField(blank=True, verbose_name="Последняя ошибка")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата создания")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Дата обновления")
+    
+    class Meta:
+        verbose_name = "Фоновая задача"
+        verbose_name_plural = "Фоновые задачи"
+        ordering = ['run_after', 'id']
+        indexes = [
+            models.Index(fields=['status', 'run_after']),
+        ]
+    
+    def __str__(self):
+        return f"Задача #{self.id} - {self.task_type} ({self.get_status_display()})"
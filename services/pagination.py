@@ -0,0 +1,196 @@
+"""Курсорная (keyset) пагинация списков.
+
+Вместо OFFSET страница выбирается условием по ключу сортировки последней
+показанной строки, например для заявлений (-created_at, -id):
+
+    created_at <= :created_at
+    AND (created_at < :created_at OR (created_at = :created_at AND id < :id))
+
+Первое условие избыточно, но только с ним SQLite начинает просмотр
+индекса сразу с нужной строки. Такой запрос стоит одинаково на любой
+глубине, а COUNT(*) для числа страниц не нужен: достаточно выбрать на
+одну строку больше, чтобы узнать, есть ли следующая страница.
+"""
+import base64
+import binascii
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+class KeysetPage:
+    """Страница результатов курсорной пагинации"""
+
+    def __init__(self, object_list, has_next, has_previous, next_cursor, previous_cursor):
+        self.object_list = object_list
+        self.has_next = has_next
+        self.has_previous = has_previous
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+        self.next_querystring = ''
+        self.previous_querystring = ''
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __bool__(self):
+        return bool(self.object_list)
+
+    @property
+    def has_other_pages(self):
+        return self.has_next or self.has_previous
+
+
+class KeysetPaginator:
+    """Курсорный пагинатор по упорядоченному уникальному ключу.
+
+    ordering -- поля сортировки в формате order_by(); последнее поле должно
+    делать ключ уникальным (обычно 'id').
+    """
+
+    def __init__(self, queryset, ordering, per_page=None):
+        self.queryset = queryset
+        self.ordering = list(ordering)
+        self.per_page = per_page or settings.MFC_SETTINGS['PAGINATION_PER_PAGE']
+        self.fields = [
+            (name.lstrip('-'), name.startswith('-')) for name in self.ordering
+        ]
+
+    def encode_cursor(self, obj):
+        values = [self._field(name).value_to_string(obj) for name, descending in self.fields]
+        data = json.dumps(values, ensure_ascii=False, separators=(',', ':')).encode()
+        return base64.urlsafe_b64encode(data).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        try:
+            data = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+            values = json.loads(data)
+        except (ValueError, binascii.Error):
+            raise InvalidCursor(cursor)
+        if not isinstance(values, list) or len(values) != len(self.fields):
+            raise InvalidCursor(cursor)
+        try:
+            return [
+                self._field(name).to_python(value)
+                for (name, descending), value in zip(self.fields, values)
+            ]
+        except ValidationError:
+            raise InvalidCursor(cursor)
+
+    def _field(self, name):
+        return self.queryset.model._meta.get_field(name)
+
+    def _seek_filter(self, values, forward):
+        """Условие «строго после (или до) ключа values» в порядке сортировки"""
+        condition = Q()
+        for position, (name, descending) in enumerate(self.fields):
+            lookup = 'lt' if descending == forward else 'gt'
+            step = Q(**{f'{name}__{lookup}': values[position]})
+            for previous in range(position):
+                step &= Q(**{self.fields[previous][0]: values[previous]})
+            condition |= step
+        # Избыточная граница по первому полю: без неё SQLite не превращает
+        # OR-цепочку в поиск по индексу и просматривает его с начала
+        name, descending = self.fields[0]
+        bound = 'lte' if descending == forward else 'gte'
+        return Q(**{f'{name}__{bound}': values[0]}) & condition
+
+    def page(self, after=None, before=None):
+        """Страница после курсора after, до курсора before или первая страница"""
+        if before:
+            values = self.decode_cursor(before)
+            reversed_ordering = [
+                name[1:] if name.startswith('-') else f'-{name}' for name in self.ordering
+            ]
+            rows = list(
+                self.queryset.filter(self._seek_filter(values, forward=False))
+                .order_by(*reversed_ordering)[:self.per_page + 1]
+            )
+            has_previous = len(rows) > self.per_page
+            object_list = rows[:self.per_page][::-1]
+            has_next = True
+        else:
+            queryset = self.queryset
+            if after:
+                queryset = queryset.filter(self._seek_filter(self.decode_cursor(after), forward=True))
+            rows = list(queryset.order_by(*self.ordering)[:self.per_page + 1])
+            has_next = len(rows) > self.per_page
+            object_list = rows[:self.per_page]
+            has_previous = bool(after)
+
+        return KeysetPage(
+            object_list,
+            has_next=has_next and bool(object_list),
+            has_previous=has_previous and bool(object_list),
+            next_cursor=self.encode_cursor(object_list[-1]) if object_list else None,
+            previous_cursor=self.encode_cursor(object_list[0]) if object_list else None,
+        )
+
+
+def paginate(request, queryset, ordering, per_page=None):
+    """Страница для параметров запроса ?after=/?before=; ссылки сохраняют остальные параметры.
+
+    Некорректный курсор приводит к первой странице.
+    """
+    paginator = KeysetPaginator(queryset, ordering, per_page)
+    try:
+        page = paginator.page(
+            after=request.GET.get('after'),
+            before=request.GET.get('before'),
+        )
+    except InvalidCursor:
+        page = paginator.page()
+
+    params = request.GET.copy()
+    params.pop('after', None)
+    params.pop('before', None)
+    if page.has_next:
+        params['after'] = page.next_cursor
+        page.next_querystring = params.urlencode()
+        del params['after']
+    if page.has_previous:
+        params['before'] = page.previous_cursor
+        page.previous_querystring = params.urlencode()
+    return page
+
+
+class CachedCountPaginator(Paginator):
+    """Пагинатор админки для больших таблиц.
+
+    Число строк без фильтров берётся из total() (например, из счётчика
+    StatCounter), а для отфильтрованного списка COUNT(*) выполняется один
+    раз и кэшируется на ADMIN_COUNT_CACHE_SECONDS — при листании страниц и
+    смене сортировки он не повторяется. Число может немного отставать от
+    фактического, для навигации по страницам это допустимо.
+    """
+
+    def __init__(self, object_list, per_page, orphans=0, allow_empty_first_page=True, total=None):
+        super().__init__(object_list, per_page, orphans, allow_empty_first_page)
+        self.total = total
+
+    @cached_property
+    def count(self):
+        query = self.object_list.query
+        if self.total is not None and not query.where:
+            return self.total()
+        count_query = self.object_list.order_by()
+        sql, params = count_query.query.sql_with_params()
+        digest = hashlib.md5(repr((sql, params)).encode()).hexdigest()
+        return cache.get_or_set(
+            f'mfc:admin-count:{digest}',
+            count_query.count,
+            settings.MFC_SETTINGS['ADMIN_COUNT_CACHE_SECONDS'],
+        )
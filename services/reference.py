@@ -0,0 +1,110 @@
+"""Справочные данные в памяти процесса.
+
+Статусы заявлений, категории услуг, услуги и офисы малы и меняются
+редко, поэтому каждый процесс держит их снимок в памяти. Снимок
+источника перестраивается, когда меняется версия его пространства имён
+в кэше (см. services/caching.py и services/signals.py), так что изменение
+в одном процессе видят все остальные.
+
+Объекты снимка общие для всех запросов процесса: их можно присваивать
+внешним ключам и показывать, но нельзя изменять.
+"""
+import threading
+
+from django.core.signals import request_started
+
+from .caching import get_version
+from .models import ApplicationStatus, MFCOffice, Service, ServiceCategory
+
+
+def _load_statuses():
+    return list(ApplicationStatus.objects.all())
+
+
+def _load_categories():
+    return list(ServiceCategory.objects.all())
+
+
+def _load_services():
+    return list(Service.objects.select_related('category'))
+
+
+def _load_offices():
+    return list(MFCOffice.objects.all())
+
+
+# Источник -> (функция загрузки, пространство имён версии кэша)
+SOURCES = {
+    'statuses': (_load_statuses, 'statuses'),
+    'categories': (_load_categories, 'services'),
+    'services': (_load_services, 'services'),
+    'offices': (_load_offices, 'offices'),
+}
+
+
+class Snapshot:
+    """Объекты источника в порядке модели, словари по первичному ключу:
+    объект и его место в этом порядке"""
+
+    def __init__(self, version, objects):
+        self.version = version
+        self.objects = objects
+        self.by_id = {obj.pk: obj for obj in objects}
+        self.positions = {obj.pk: position for position, obj in enumerate(objects)}
+
+
+_snapshots = {}
+_lock = threading.Lock()
+
+
+def get_snapshot(source):
+    load, namespace = SOURCES[source]
+    version = get_version(namespace)
+    snapshot = _snapshots.get(source)
+    if snapshot is None or snapshot.version != version:
+        with _lock:
+            snapshot = _snapshots.get(source)
+            if snapshot is None or snapshot.version != version:
+                snapshot = Snapshot(version, load())
+                _snapshots[source] = snapshot
+    return snapshot
+
+
+def objects(source):
+    return get_snapshot(source).objects
+
+
+def get(source, pk):
+    """Объект источника по первичному ключу; KeyError, если его нет"""
+    return get_snapshot(source).by_id[pk]
+
+
+def status(code):
+    """Статус заявления по коду (ApplicationStatus.SUBMITTED и т.д.)"""
+    for item in objects('statuses'):
+        if item.code == code:
+            return item
+    raise ApplicationStatus.DoesNotExist(f'Статус с кодом {code!r} не найден')
+
+
+def statuses():
+    return objects('statuses')
+
+
+def categories():
+    return objects('categories')
+
+
+def services():
+    return objects('services')
+
+
+def offices():
+    return objects('offices')
+
+
+def warm_up(**kwargs):
+    """Загружает все снимки; вызывается на первом запросе процесса"""
+    request_started.disconnect(warm_up, dispatch_uid='reference_warm_up')
+    for source in SOURCES:
+        get_snapshot(source)
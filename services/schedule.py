@@ -0,0 +1,50 @@
+"""Разбор графика работы офиса.
+
+График хранится текстом в MFCOffice.work_schedule, например
+«пн-пт 8:00-20:00, сб 10:00-15:00». Разбор возвращает словарь
+{день недели (0 — понедельник): (время открытия, время закрытия)}.
+"""
+from datetime import time
+from functools import lru_cache
+import re
+
+WEEKDAYS = ['пн', 'вт', 'ср', 'чт', 'пт', 'сб', 'вс']
+
+_SEGMENT_RE = re.compile(
+    r'(?P<days>[а-я]{2}(?:\s*-\s*[а-я]{2})?)\s+'
+    r'(?P<open>\d{1,2}[:.]\d{2})\s*-\s*(?P<close>\d{1,2}[:.]\d{2})'
+)
+
+
+def _parse_time(value):
+    hours, minutes = re.split(r'[:.]', value)
+    hours, minutes = int(hours), int(minutes)
+    if hours == 24 and minutes == 0:
+        return time.max
+    return time(hours, minutes)
+
+
+@lru_cache(maxsize=1024)
+def parse_work_schedule(text):
+    """Разбирает текст графика; нераспознанные части пропускаются"""
+    schedule = {}
+    for match in _SEGMENT_RE.finditer((text or '').lower()):
+        days = [day.strip() for day in match.group('days').split('-')]
+        if any(day not in WEEKDAYS for day in days):
+            continue
+        first = WEEKDAYS.index(days[0])
+        last = WEEKDAYS.index(days[-1])
+        try:
+            hours = (_parse_time(match.group('open')), _parse_time(match.group('close')))
+        except ValueError:
+            continue
+        if hours[0] >= hours[1]:
+            continue
+        for weekday in range(first, last + 1):
+            schedule[weekday] = hours
+    return schedule
+
+
+def opening_hours(text, day):
+    """Часы работы в указанную дату: (открытие, закрытие) или None, если выходной"""
+    return parse_work_schedule(text).get(day.weekday())
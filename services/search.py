@@ -0,0 +1,189 @@
+"""Полнотекстовый поиск по услугам, офисам и новостям.
+
+Индекс хранится в виртуальной таблице SQLite FTS5 и синхронизируется
+с моделями через сигналы (см. services/signals.py). Полная перестройка
+индекса выполняется командой ``rebuild_search_index``.
+"""
+import asyncio
+import re
+
+from asgiref.sync import sync_to_async
+from django.db import connection
+
+from .models import Service, MFCOffice, News
+
+SEARCH_TABLE = 'services_search_index'
+
+# Тип документа хранится в младших битах rowid: так запись индекса
+# обновляется и удаляется по первичному ключу, без сканирования таблицы
+TYPE_BITS = 2
+DOCUMENT_TYPES = {
+    'service': 1,
+    'office': 2,
+    'news': 3,
+}
+DOCUMENT_TYPE_NAMES = {code: name for name, code in DOCUMENT_TYPES.items()}
+
+# Модель -> (тип документа, заголовок, текст)
+INDEXED_MODELS = {
+    Service: ('service', lambda obj: obj.name, lambda obj: obj.description),
+    MFCOffice: ('office', lambda obj: obj.name, lambda obj: obj.address),
+    News: ('news', lambda obj: obj.title, lambda obj: obj.content),
+}
+
+# Вес совпадения в заголовке относительно совпадения в тексте
+TITLE_WEIGHT = 10.0
+BODY_WEIGHT = 1.0
+
+_TOKEN_RE = re.compile(r'\w+')
+
+
+def is_available():
+    """FTS5 есть только в SQLite; для остальных СУБД используется LIKE-поиск"""
+    return connection.vendor == 'sqlite'
+
+
+def normalize(text):
+    """Приводит текст к виду, в котором он хранится в индексе.
+
+    Регистр (в том числе кириллический) FTS5 сворачивает сам, а «ё»
+    токенизатор unicode61 не считает диакритикой, поэтому заменяем её явно.
+    """
+    return (text or '').lower().replace('ё', 'е')
+
+
+def make_rowid(doc_type, object_id):
+    return (object_id << TYPE_BITS) | DOCUMENT_TYPES[doc_type]
+
+
+def split_rowid(rowid):
+    return DOCUMENT_TYPE_NAMES[rowid & ((1 << TYPE_BITS) - 1)], rowid >> TYPE_BITS
+
+
+def build_match_expression(query):
+    """Строит выражение MATCH: все слова запроса обязательны, каждое как префикс.
+
+    Префиксный поиск покрывает словоформы: «паспорт» находит «паспорта».
+    """
+    tokens = _TOKEN_RE.findall(normalize(query))
+    if not tokens:
+        return None
+    return ' '.join(f'"{token}"*' for token in tokens)
+
+
+def index_object(obj):
+    """Добавляет или обновляет документ в индексе"""
+    if not is_available():
+        return
+    doc_type, get_title, get_body = INDEXED_MODELS[type(obj)]
+    rowid = make_rowid(doc_type, obj.pk)
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {SEARCH_TABLE} WHERE rowid = %s', [rowid])
+        cursor.execute(
+            f'INSERT INTO {SEARCH_TABLE} (rowid, title, body) VALUES (%s, %s, %s)',
+            [rowid, normalize(get_title(obj)), normalize(get_body(obj))]
+        )
+
+
+def remove_object(obj):
+    """Удаляет документ из индекса"""
+    if not is_available():
+        return
+    doc_type = INDEXED_MODELS[type(obj)][0]
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {SEARCH_TABLE} WHERE rowid = %s',
+            [make_rowid(doc_type, obj.pk)]
+        )
+
+
+def rebuild_index(batch_size=1000):
+    """Полностью перестраивает индекс. Возвращает число проиндексированных документов"""
+    total = 0
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {SEARCH_TABLE}')
+        for model, (doc_type, get_title, get_body) in INDEXED_MODELS.items():
+            batch = []
+            for obj in model.objects.order_by().iterator(chunk_size=batch_size):
+                batch.append((
+                    make_rowid(doc_type, obj.pk),
+                    normalize(get_title(obj)),
+                    normalize(get_body(obj)),
+                ))
+                if len(batch) >= batch_size:
+                    cursor.executemany(
+                        f'INSERT INTO {SEARCH_TABLE} (rowid, title, body) VALUES (%s, %s, %s)',
+                        batch
+                    )
+                    total += len(batch)
+                    batch = []
+            if batch:
+                cursor.executemany(
+                    f'INSERT INTO {SEARCH_TABLE} (rowid, title, body) VALUES (%s, %s, %s)',
+                    batch
+                )
+                total += len(batch)
+        cursor.execute(f"INSERT INTO {SEARCH_TABLE} ({SEARCH_TABLE}) VALUES ('optimize')")
+    return total
+
+
+def find_hits(query, limit=50):
+    """Пары (тип, id) из индекса, отсортированные по релевантности (BM25)"""
+    expression = build_match_expression(query)
+    if expression is None:
+        return []
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT rowid FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s '
+            f'ORDER BY bm25({SEARCH_TABLE}, %s, %s) LIMIT %s',
+            [expression, TITLE_WEIGHT, BODY_WEIGHT, limit]
+        )
+        return [split_rowid(row[0]) for row in cursor.fetchall()]
+
+
+def _group_ids(hits):
+    ids_by_type = {}
+    for doc_type, object_id in hits:
+        ids_by_type.setdefault(doc_type, []).append(object_id)
+    return ids_by_type
+
+
+def _hit_queryset(doc_type):
+    return {
+        'service': Service.objects.select_related('category'),
+        'office': MFCOffice.objects.all(),
+        'news': News.objects.select_related('author'),
+    }[doc_type]
+
+
+def _resolve(hits, objects):
+    # Документы, удалённые в обход сигналов, просто пропускаем
+    return [
+        (doc_type, objects[doc_type][object_id])
+        for doc_type, object_id in hits
+        if object_id in objects[doc_type]
+    ]
+
+
+def search(query, limit=50):
+    """Ищет по всем типам документов одним запросом к индексу.
+
+    Возвращает список пар (тип, объект), отсортированный по релевантности (BM25).
+    """
+    hits = find_hits(query, limit)
+    objects = {
+        doc_type: _hit_queryset(doc_type).in_bulk(ids)
+        for doc_type, ids in _group_ids(hits).items()
+    }
+    return _resolve(hits, objects)
+
+
+async def asearch(query, limit=50):
+    """Асинхронный вариант search: объекты разных типов загружаются параллельно"""
+    hits = await sync_to_async(find_hits)(query, limit)
+    ids_by_type = _group_ids(hits)
+    loaded = await asyncio.gather(*(
+        _hit_queryset(doc_type).ain_bulk(ids) for doc_type, ids in ids_by_type.items()
+    ))
+    return _resolve(hits, dict(zip(ids_by_type, loaded)))
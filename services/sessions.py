@@ -0,0 +1,40 @@
+"""Сессии с чтением из кэша и без лишних записей в базу.
+
+SessionStore — вариант cached_db: сессия читается из кэша
+SESSION_CACHE_ALIAS (SQLiteCache, общий для всех процессов и отдельный от
+кэша страниц, см. services/cache_backends.py), таблица сессий нужна
+только при промахе кэша и при изменении сессии. Если данные сессии после
+запроса совпадают с прочитанными (значение присвоили заново, ключ
+удалили и вернули), сохранение пропускается.
+
+Устаревшие сессии удаляет команда ``cleanup_sessions``.
+"""
+import hashlib
+
+from django.contrib.sessions.backends.cached_db import SessionStore as CachedDBStore
+
+KEY_PREFIX = 'mfc:session:'
+
+
+class SessionStore(CachedDBStore):
+    cache_key_prefix = KEY_PREFIX
+
+    def __init__(self, session_key=None):
+        super().__init__(session_key)
+        self._loaded_digest = None
+
+    def _digest(self, data):
+        serialized = self.serializer().dumps(dict(sorted(data.items())))
+        return hashlib.md5(serialized).hexdigest()
+
+    def load(self):
+        data = super().load()
+        if self.session_key is not None:
+            self._loaded_digest = self._digest(data)
+        return data
+
+    def save(self, must_create=False):
+        if not must_create and self._loaded_digest is not None and self._digest(self._session) == self._loaded_digest:
+            return
+        super().save(must_create)
+        self._loaded_digest = self._digest(self._session)
@@ -0,0 +1,113 @@
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import (
+    ServiceCategory, Service, MFCOffice, OfficeService, Employee, News, Application, ApplicationStatus,
+)
+from . import search, stats
+from .caching import bump_version
+
+# Модель -> пространства имён кэша, версии которых поднимаются при её изменении
+CACHE_NAMESPACES = {
+    ServiceCategory: ['services'],
+    Service: ['services'],
+    MFCOffice: ['offices'],
+    OfficeService: ['offices'],
+    News: ['news'],
+    # Имя автора показывается на страницах новостей
+    Employee: ['news'],
+    Application: ['applications'],
+    ApplicationStatus: ['statuses'],
+}
+
+
+@receiver(post_save, sender=Service)
+@receiver(post_save, sender=MFCOffice)
+@receiver(post_save, sender=News)
+def update_search_index(sender, instance, raw=False, **kwargs):
+    """Обновление поискового индекса при сохранении"""
+    if raw:
+        return
+    search.index_object(instance)
+
+
+@receiver(post_delete, sender=Service)
+@receiver(post_delete, sender=MFCOffice)
+@receiver(post_delete, sender=News)
+def remove_from_search_index(sender, instance, **kwargs):
+    """Удаление документа из поискового индекса"""
+    search.remove_object(instance)
+
+
+# Модель -> счётчик количества объектов (см. services/stats.py)
+COUNTED_MODELS = {
+    Service: stats.SERVICES,
+    MFCOffice: stats.OFFICES,
+    Application: stats.APPLICATIONS,
+}
+
+
+@receiver(pre_save, sender=Service)
+def remember_service_cost(sender, instance, raw=False, **kwargs):
+    """Запоминает прежнюю стоимость услуги для пересчёта суммы стоимостей"""
+    instance._previous_cost = None
+    if raw or instance._state.adding or instance.pk is None:
+        return
+    instance._previous_cost = (
+        Service.objects.filter(pk=instance.pk).values_list('cost', flat=True).first()
+    )
+
+
+@receiver(post_save, sender=Service)
+def update_service_cost_counter(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    previous = 0 if created else getattr(instance, '_previous_cost', None)
+    if previous is None:
+        return
+    stats.increment(
+        stats.SERVICE_COST_KOPECKS,
+        stats.to_kopecks(instance.cost) - stats.to_kopecks(previous)
+    )
+
+
+@receiver(post_delete, sender=Service)
+def decrement_service_cost_counter(sender, instance, **kwargs):
+    stats.increment(stats.SERVICE_COST_KOPECKS, -stats.to_kopecks(instance.cost))
+
+
+def increment_counter(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        stats.increment(COUNTED_MODELS[sender], 1)
+
+
+def decrement_counter(sender, instance, **kwargs):
+    stats.increment(COUNTED_MODELS[sender], -1)
+
+
+for model in COUNTED_MODELS:
+    post_save.connect(increment_counter, sender=model, dispatch_uid=f'increment_counter_{model.__name__}')
+    post_delete.connect(decrement_counter, sender=model, dispatch_uid=f'decrement_counter_{model.__name__}')
+
+
+@receiver(post_save, sender=Application)
+def increment_daily_stat(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        stats.increment_daily(timezone.localdate(instance.created_at), 1)
+
+
+@receiver(post_delete, sender=Application)
+def decrement_daily_stat(sender, instance, **kwargs):
+    stats.increment_daily(timezone.localdate(instance.created_at), -1)
+
+
+# Версии кэша поднимаются последними, когда счётчики уже обновлены
+def invalidate_cache(sender, **kwargs):
+    """Поднимает версии кэша, зависящие от изменённой модели"""
+    bump_version(*CACHE_NAMESPACES[sender])
+
+
+for model in CACHE_NAMESPACES:
+    post_save.connect(invalidate_cache, sender=model, dispatch_uid=f'invalidate_cache_save_{model.__name__}')
+    post_delete.connect(invalidate_cache, sender=model, dispatch_uid=f'invalidate_cache_delete_{model.__name__}')
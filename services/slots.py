@@ -0,0 +1,161 @@
+"""Слоты записи на прием.
+
+День работы офиса делится на слоты длиной MFCOffice.slot_minutes, в каждый
+слот можно записать не больше MFCOffice.slot_capacity посетителей.
+Занятость считается одним агрегирующим запросом по индексу
+(office, appointment_datetime).
+"""
+from datetime import datetime, timedelta
+
+from django.db import connection, transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from . import availability
+from .db import retry_on_busy
+from .models import Appointment, MFCOffice
+from .schedule import opening_hours
+
+MAX_RANGE_DAYS = 31
+
+
+class SlotUnavailable(Exception):
+    pass
+
+
+def day_slots(office, day):
+    """Начала слотов офиса в указанную дату (aware datetime)"""
+    hours = opening_hours(office.work_schedule, day)
+    # Нулевой шаг зациклил бы перебор; в базе его не пропускает CheckConstraint
+    if hours is None or office.slot_minutes <= 0:
+        return []
+    step = timedelta(minutes=office.slot_minutes)
+    current = timezone.make_aware(datetime.combine(day, hours[0]))
+    closing = timezone.make_aware(datetime.combine(day, hours[1]))
+    starts = []
+    while current + step <= closing:
+        starts.append(current)
+        current += step
+    return starts
+
+
+def slot_start(office, moment):
+    """Начало слота, в который попадает moment, или None вне часов работы"""
+    local = timezone.localtime(moment)
+    hours = opening_hours(office.work_schedule, local.date())
+    if hours is None or office.slot_minutes <= 0:
+        return None
+    opening = timezone.make_aware(datetime.combine(local.date(), hours[0]))
+    closing = timezone.make_aware(datetime.combine(local.date(), hours[1]))
+    if not opening <= local < closing:
+        return None
+    step = timedelta(minutes=office.slot_minutes)
+    start = opening + ((local - opening) // step) * step
+    if start + step > closing:
+        return None
+    return start
+
+
+def is_slot_start(office, moment):
+    return slot_start(office, moment) == moment
+
+
+def is_service_offered(office, service):
+    return availability.is_offered(office, service)
+
+
+def booked_counts(office, start, end):
+    """Число активных записей по слотам офиса в интервале [start, end)"""
+    rows = (
+        Appointment.objects
+        .filter(office=office, appointment_datetime__gte=start, appointment_datetime__lt=end, status='active')
+        .order_by()
+        .values('appointment_datetime')
+        .annotate(booked=Count('id'))
+    )
+    counts = {}
+    for row in rows:
+        # Записи, сделанные до введения слотов, относим к слоту, в который они попадают
+        start_of_slot = slot_start(office, row['appointment_datetime']) or row['appointment_datetime']
+        counts[start_of_slot] = counts.get(start_of_slot, 0) + row['booked']
+    return counts
+
+
+def available_slots(office, date_from, date_to, service=None):
+    """Свободные слоты офиса с date_from по date_to включительно.
+
+    Возвращает список словарей {'start': datetime, 'free': int}.
+    Если услуга указана и не оказывается в офисе, свободных слотов нет.
+    """
+    if service is not None and not is_service_offered(office, service):
+        return []
+    date_to = min(date_to, date_from + timedelta(days=MAX_RANGE_DAYS - 1))
+
+    range_start = timezone.make_aware(datetime.combine(date_from, datetime.min.time()))
+    range_end = timezone.make_aware(datetime.combine(date_to + timedelta(days=1), datetime.min.time()))
+    counts = booked_counts(office, range_start, range_end)
+    now = timezone.now()
+
+    slots = []
+    day = date_from
+    while day <= date_to:
+        for start in day_slots(office, day):
+            free = office.slot_capacity - counts.get(start, 0)
+            if start > now and free > 0:
+                slots.append({'start': start, 'free': free})
+        day += timedelta(days=1)
+    return slots
+
+
+def free_places(office, start):
+    return office.slot_capacity - booked_counts(
+        office, start, start + timedelta(minutes=office.slot_minutes)
+    ).get(start, 0)
+
+
+def book_appointment(appointment):
+    """Сохраняет запись, не допуская превышения вместимости слота.
+
+    Запись сначала вставляется, затем пересчитывается занятость слота;
+    при переполнении транзакция откатывается. В SQLite первая же запись
+    в транзакции берёт блокировку на запись, поэтому параллельные
+    бронирования выполняются строго по очереди. В СУБД с SELECT ... FOR
+    UPDATE бронирования одного офиса сериализуются блокировкой строки офиса.
+    Если база занята дольше таймаута, бронирование повторяется (retry_on_busy).
+    """
+    office = appointment.office
+    if not is_slot_start(office, appointment.appointment_datetime):
+        raise SlotUnavailable('Выбранное время не совпадает с началом слота приема.')
+
+    adding = appointment._state.adding
+    try:
+        _save_booking(appointment, adding)
+    except SlotUnavailable:
+        if adding:
+            appointment.pk = None
+            appointment._state.adding = True
+        raise
+    return appointment
+
+
+@retry_on_busy
+def _save_booking(appointment, adding):
+    # Повтор после «database is locked» начинается с несохранённой записи
+    if adding:
+        appointment.pk = None
+        appointment._state.adding = True
+    office = appointment.office
+    with transaction.atomic():
+        if connection.features.has_select_for_update:
+            list(MFCOffice.objects.select_for_update().filter(pk=office.pk).values_list('pk'))
+        appointment.save()
+        if appointment.status == 'active':
+            start = appointment.appointment_datetime
+            booked = Appointment.objects.filter(
+                office=office,
+                appointment_datetime__gte=start,
+                appointment_datetime__lt=start + timedelta(minutes=office.slot_minutes),
+                status='active',
+            ).count()
+            if booked > office.slot_capacity:
+                raise SlotUnavailable('На выбранное время свободных мест нет.')
@@ -0,0 +1,128 @@
+"""Счётчики статистики системы.
+
+Значения хранятся в таблице StatCounter и меняются инкрементально при
+создании и удалении услуг, офисов и заявлений (см. services/signals.py),
+поэтому чтение статистики — один запрос независимо от объёма данных.
+Так же ведётся число заявлений по дням (ApplicationDailyStat) — по нему
+админка показывает разбивку по датам без сканирования таблицы заявлений.
+Расхождения (например, после bulk_create в обход сигналов) исправляет
+команда ``reconcile_stats``.
+"""
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+
+from .models import StatCounter, Service, MFCOffice, Application, ApplicationDailyStat
+
+SERVICES = 'services'
+OFFICES = 'offices'
+APPLICATIONS = 'applications'
+# Сумма стоимостей услуг в копейках — для средней стоимости без AVG()
+SERVICE_COST_KOPECKS = 'service_cost_kopecks'
+
+
+def to_kopecks(amount):
+    return int((amount or 0) * 100)
+
+
+def _total_service_cost():
+    return to_kopecks(Service.objects.aggregate(total=Sum('cost'))['total'])
+
+
+# Счётчик -> функция точного пересчёта
+COUNTERS = {
+    SERVICES: lambda: Service.objects.count(),
+    OFFICES: lambda: MFCOffice.objects.count(),
+    APPLICATIONS: lambda: Application.objects.count(),
+    SERVICE_COST_KOPECKS: _total_service_cost,
+}
+
+
+def increment(name, delta=1):
+    """Атомарно изменяет счётчик на delta"""
+    if not delta:
+        return
+    with transaction.atomic():
+        updated = StatCounter.objects.filter(name=name).update(value=F('value') + delta)
+        if not updated:
+            # Счётчика ещё нет: создаём его сразу с точным значением
+            StatCounter.objects.get_or_create(name=name, defaults={'value': COUNTERS[name]()})
+
+
+def get_counter(name):
+    value = StatCounter.objects.filter(name=name).values_list('value', flat=True).first()
+    return COUNTERS[name]() if value is None else value
+
+
+def get_counters():
+    """Все счётчики одним запросом"""
+    values = dict(StatCounter.objects.values_list('name', 'value'))
+    return {name: values.get(name, 0) for name in COUNTERS}
+
+
+def site_stats():
+    """Статистика для главной страницы"""
+    counters = get_counters()
+    total_services = counters[SERVICES]
+    avg_cost = 0
+    if total_services:
+        avg_cost = (Decimal(counters[SERVICE_COST_KOPECKS]) / 100 / total_services).quantize(Decimal('0.01'))
+    return {
+        'total_services': total_services,
+        'total_offices': counters[OFFICES],
+        'total_applications': counters[APPLICATIONS],
+        'avg_service_cost': avg_cost,
+    }
+
+
+def reconcile(fix=True):
+    """Сверяет счётчики с фактическими данными.
+
+    Возвращает словарь {счётчик: (сохранённое значение, фактическое значение)}
+    только для расходящихся счётчиков. При fix=True исправляет их.
+    """
+    drift = {}
+    with transaction.atomic():
+        stored = dict(StatCounter.objects.select_for_update().values_list('name', 'value'))
+        for name, compute in COUNTERS.items():
+            actual = compute()
+            if stored.get(name) != actual:
+                drift[name] = (stored.get(name), actual)
+                if fix:
+                    StatCounter.objects.update_or_create(name=name, defaults={'value': actual})
+    return drift
+
+
+def increment_daily(day, delta=1):
+    """Атомарно изменяет число заявлений за день"""
+    with transaction.atomic():
+        updated = ApplicationDailyStat.objects.filter(day=day).update(count=F('count') + delta)
+        if not updated and delta > 0:
+            ApplicationDailyStat.objects.get_or_create(day=day, defaults={'count': _daily_counts(day).get(day, 0)})
+
+
+def _daily_counts(day=None):
+    """Фактическое число заявлений по дням (в часовом поясе сайта)"""
+    queryset = Application.objects.order_by().annotate(day=TruncDate('created_at'))
+    if day is not None:
+        queryset = queryset.filter(day=day)
+    return dict(queryset.values('day').annotate(total=Count('id')).values_list('day', 'total'))
+
+
+def reconcile_daily(fix=True):
+    """Сверяет ApplicationDailyStat с заявлениями, возвращает {день: (сохранено, факт)}"""
+    drift = {}
+    with transaction.atomic():
+        stored = dict(ApplicationDailyStat.objects.select_for_update().values_list('day', 'count'))
+        actual = _daily_counts()
+        for day in stored.keys() | actual.keys():
+            if stored.get(day) != actual.get(day, 0):
+                drift[day] = (stored.get(day), actual.get(day, 0))
+        if fix and drift:
+            ApplicationDailyStat.objects.filter(day__in=[day for day in drift if day not in actual]).delete()
+            for day in drift:
+                if day in actual:
+                    ApplicationDailyStat.objects.update_or_create(day=day, defaults={'count': actual[day]})
+    return drift
@@ -0,0 +1,119 @@
+"""Подсказки поиска из индекса префиксов в памяти процесса.
+
+Индекс каждого источника (услуги, офисы, популярные запросы) строится
+при первом обращении и перестраивается, когда меняется версия данных
+источника в кэше (см. services/caching.py), поэтому ответ на подсказку
+не обращается к базе данных.
+"""
+from bisect import bisect_left
+import threading
+
+from .caching import get_version
+from .models import Service, MFCOffice
+from .search import normalize
+
+MIN_QUERY_LENGTH = 2
+MAX_SUGGESTIONS = 8
+
+POPULAR_QUERIES = [
+    'паспорт',
+    'загранпаспорт',
+    'регистрация',
+    'налоговый вычет',
+    'пособие',
+]
+
+
+class PrefixIndex:
+    """Отсортированный массив ключей с поиском по префиксу через bisect.
+
+    Ключ строится от начала каждого слова текста, поэтому запрос
+    «паспорт» находит «Замена паспорта в 20 лет».
+    """
+
+    def __init__(self, entries):
+        keys = []
+        for text, label in entries:
+            normalized = normalize(text)
+            for position, char in enumerate(normalized):
+                if char.isalnum() and (position == 0 or not normalized[position - 1].isalnum()):
+                    keys.append((normalized[position:], label))
+        keys.sort()
+        self._keys = keys
+
+    def __len__(self):
+        return len(self._keys)
+
+    def lookup(self, prefix, limit):
+        """Возвращает до limit уникальных подписей, ключи которых начинаются с prefix"""
+        keys = self._keys
+        results = []
+        position = bisect_left(keys, (prefix,))
+        while position < len(keys) and len(results) < limit:
+            key, label = keys[position]
+            if not key.startswith(prefix):
+                break
+            if label not in results:
+                results.append(label)
+            position += 1
+        return results
+
+
+def _service_entries():
+    return [(name, name) for name in Service.objects.values_list('name', flat=True)]
+
+
+def _office_entries():
+    entries = []
+    for name, address in MFCOffice.objects.values_list('name', 'address'):
+        entries.append((name, name))
+        entries.append((address, name))
+    return entries
+
+
+def _popular_entries():
+    return [(text, text) for text in POPULAR_QUERIES]
+
+
+# Источник -> (функция построения записей, пространство имён версии кэша)
+SOURCES = {
+    'service': (_service_entries, 'services'),
+    'office': (_office_entries, 'offices'),
+    'popular': (_popular_entries, None),
+}
+
+_indexes = {}
+_lock = threading.Lock()
+
+
+def get_index(source):
+    build, namespace = SOURCES[source]
+    version = get_version(namespace) if namespace else None
+    cached = _indexes.get(source)
+    if cached is None or cached[0] != version:
+        with _lock:
+            cached = _indexes.get(source)
+            if cached is None or cached[0] != version:
+                cached = (version, PrefixIndex(build()))
+                _indexes[source] = cached
+    return cached[1]
+
+
+def suggest(query):
+    """Подсказки для строки запроса: сначала услуги, затем офисы, затем популярные запросы"""
+    prefix = normalize(query.strip())
+    if len(prefix) < MIN_QUERY_LENGTH:
+        return []
+
+    suggestions = get_index('service').lookup(prefix, 5)
+    for text in get_index('office').lookup(prefix, 3):
+        if text not in suggestions:
+            suggestions.append(text)
+
+    # Добавляем популярные запросы, если мало результатов
+    if len(suggestions) < 3:
+        for text in get_index('popular').lookup(prefix, MAX_SUGGESTIONS):
+            if text not in suggestions:
+                suggestions.append(text)
+
+    return suggestions[:MAX_SUGGESTIONS]
@@ -0,0 +1,142 @@
+"""Очередь фоновых задач в базе данных.
+
+Обработчики запросов только ставят задачу в очередь (enqueue), а
+выполняет её команда ``process_tasks``: она забирает задачи пачками,
+повторяет неудачные с экспоненциальной задержкой и использует одно
+SMTP-соединение на всю пачку.
+"""
+from datetime import timedelta
+import logging
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import BackgroundTask
+
+logger = logging.getLogger(__name__)
+
+TASK_HANDLERS = {}
+
+
+def task_setting(name):
+    return settings.MFC_SETTINGS['TASKS'][name]
+
+
+def register(task_type):
+    """Регистрирует обработчик задачи: handler(payload, context)"""
+    def decorator(handler):
+        TASK_HANDLERS[task_type] = handler
+        return handler
+    return decorator
+
+
+def enqueue(task_type, payload, run_after=None):
+    if task_type not in TASK_HANDLERS:
+        raise ValueError(f'Unknown task type: {task_type}')
+    return BackgroundTask.objects.create(
+        task_type=task_type,
+        payload=payload,
+        run_after=run_after or timezone.now(),
+        max_attempts=task_setting('MAX_ATTEMPTS'),
+    )
+
+
+def enqueue_email(to, subject, body):
+    return enqueue('send_email', {'to': to, 'subject': subject, 'body': body})
+
+
+class TaskContext:
+    """Ресурсы, общие для всех задач пачки (открываются при первом обращении)"""
+
+    def __init__(self):
+        self._email_connection = None
+
+    @property
+    def email_connection(self):
+        if self._email_connection is None:
+            self._email_connection = get_connection()
+            self._email_connection.open()
+        return self._email_connection
+
+    def close(self):
+        if self._email_connection is not None:
+            self._email_connection.close()
+            self._email_connection = None
+
+
+@register('send_email')
+def send_email(payload, context):
+    EmailMessage(
+        subject=payload['subject'],
+        body=payload['body'],
+        from_email=settings.DEFAULT_FROM_EMAIL,
+        to=[payload['to']],
+        connection=context.email_connection,
+    ).send()
+
+
+def claim_batch(worker_id, batch_size):
+    """Забирает до batch_size готовых задач.
+
+    Задача захватывается условным UPDATE, поэтому параллельные обработчики
+    не получат одну и ту же задачу. Задачи, зависшие у упавшего обработчика
+    дольше LOCK_TIMEOUT, забираются повторно.
+    """
+    now = timezone.now()
+    stale = now - timedelta(seconds=task_setting('LOCK_TIMEOUT'))
+    claimable = (
+        Q(status=BackgroundTask.STATUS_PENDING, run_after__lte=now) |
+        Q(status=BackgroundTask.STATUS_RUNNING, locked_at__lt=stale)
+    )
+    ids = list(
+        BackgroundTask.objects.filter(claimable)
+        .order_by('run_after', 'id')
+        .values_list('id', flat=True)[:batch_size]
+    )
+    if not ids:
+        return []
+    BackgroundTask.objects.filter(claimable, id__in=ids).update(
+        status=BackgroundTask.STATUS_RUNNING,
+        locked_by=worker_id,
+        locked_at=now,
+        attempts=F('attempts') + 1,
+    )
+    return list(BackgroundTask.objects.filter(id__in=ids, locked_by=worker_id, locked_at=now))
+
+
+def retry_delay(attempts):
+    return timedelta(seconds=task_setting('RETRY_BASE_SECONDS') * 2 ** (attempts - 1))
+
+
+def run_batch(worker_id, batch_size=None):
+    """Выполняет одну пачку задач. Возвращает (выполнено, с ошибкой)"""
+    tasks = claim_batch(worker_id, batch_size or task_setting('BATCH_SIZE'))
+    done = failed = 0
+    context = TaskContext()
+    try:
+        for task in tasks:
+            try:
+                TASK_HANDLERS[task.task_type](task.payload, context)
+            except Exception as e:
+                failed += 1
+                logger.warning('Task %s (%s) failed, attempt %s: %s', task.id, task.task_type, task.attempts, e)
+                if task.attempts >= task.max_attempts:
+                    task.status = BackgroundTask.STATUS_FAILED
+                else:
+                    task.status = BackgroundTask.STATUS_PENDING
+                    task.run_after = timezone.now() + retry_delay(task.attempts)
+                task.last_error = f'{type(e).__name__}: {e}'
+                # После ошибки SMTP-соединение может быть разорвано
+                context.close()
+            else:
+                done += 1
+                task.status = BackgroundTask.STATUS_DONE
+                task.last_error = ''
+            task.locked_by = ''
+            task.locked_at = None
+            task.save(update_fields=['status', 'run_after', 'last_error', 'locked_by', 'locked_at', 'updated_at'])
+    finally:
+        context.close()
+    return done, failed
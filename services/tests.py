@@ -1,3 +1,1601 @@
-from django.test import TestCase
+from datetime import datetime, timedelta
+from decimal import Decimal
+from io import StringIO
+import csv
+import importlib
+import json
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync, sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser, User
+from django.contrib.sessions.models import Session
+from django.core import mail
+from django.core.cache import caches
+from django.core.exceptions import ValidationError
+from django.core.management import CommandError, call_command
+from django.core.signals import request_started
+from django.db import OperationalError, connection
+from django.http import Http404, HttpResponse, QueryDict
+from django.test import (
+    AsyncRequestFactory, RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings,
+)
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from . import (
+    application_data, assets, async_urls, async_views, availability, caching, catalog, exports, geo, reference, search,
+    slots, stats, suggestions, tasks, views, widgets,
+)
+from .cache_backends import TwoTierCache
+from .db import retry_on_busy
+from .forms import ApplicationForm, AppointmentForm
+from .middleware import QueryInstrumentationMiddleware, QueryRecorder
+from .models import (
+    Application, ApplicationDailyStat, ApplicationStatus, Appointment, BackgroundTask, Employee, MFCOffice, News,
+    OfficeService, Service, ServiceCategory, UserProfile,
+)
+from .pagination import InvalidCursor, KeysetPaginator, paginate
+from .sessions import SessionStore
+
+
+class IsolatedCacheMixin:
+    """Кэш версий и сессий во временном каталоге, а не в общем CACHE_DIR"""
+
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        override = override_settings(CACHES={
+            'default': {
+                'BACKEND': 'services.cache_backends.TwoTierCache',
+                'LOCATION': directory,
+                'OPTIONS': {'L1_BYPASS_PREFIXES': ('mfc:version:',)},
+            },
+            'sessions': {
+                'BACKEND': 'services.cache_backends.SQLiteCache',
+                'LOCATION': os.path.join(directory, 'sessions'),
+            },
+        })
+        override.enable()
+        self.addCleanup(override.disable)
+
+
+def make_service(name, category=None, **fields):
+    category = category or ServiceCategory.objects.get_or_create(name='Документы')[0]
+    fields.setdefault('execution_term', '5 дней')
+    return Service.objects.create(category=category, name=name, **fields)
+
+
+def make_office(name, **fields):
+    fields.setdefault('address', 'ул. Ленина, д. 1')
+    fields.setdefault('phone', '+7 (495) 000-00-00')
+    fields.setdefault('work_schedule', 'пн-вс 9:00-18:00')
+    return MFCOffice.objects.create(name=name, **fields)
+
+
+class TwoTierCacheTests(SimpleTestCase):
+    MAX_ENTRIES = 10000
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        self.cache = TwoTierCache(self.directory, {
+            'OPTIONS': {'MAX_ENTRIES': self.MAX_ENTRIES, 'CULL_EVERY': 100},
+        })
+
+    def fill(self, count, prefix='fill'):
+        for i in range(count):
+            self.cache.set(f'{prefix}:{i}', {'value': i}, 300)
+
+    def test_set_on_near_full_cache_is_fast(self):
+        self.fill(self.MAX_ENTRIES - 500)
+        started = time.perf_counter()
+        for i in range(500):
+            self.cache.set(f'new:{i}', i, 300)
+        per_set_ms = (time.perf_counter() - started) / 500 * 1000
+        # FileBasedCache тратил на такую запись десятки миллисекунд
+        self.assertLess(per_set_ms, 2)
+        self.assertEqual(self.cache.get('new:499'), 499)
+
+    def test_size_stays_bounded(self):
+        self.fill(self.MAX_ENTRIES + 3000)
+        self.assertLessEqual(self.cache.stats()['l2_entries'], self.MAX_ENTRIES + 100)
+        # Вытесняются ближайшие к истечению, последние записи на месте
+        self.assertEqual(self.cache.get(f'fill:{self.MAX_ENTRIES + 2999}'), {'value': self.MAX_ENTRIES + 2999})
+
+    def test_expiry_add_and_incr(self):
+        self.cache.set('short', 1, 0)
+        self.assertIsNone(self.cache.get('short'))
+        self.assertTrue(self.cache.add('counter', 5))
+        self.assertFalse(self.cache.add('counter', 1))
+        self.assertEqual(self.cache.incr('counter', 2), 7)
+        self.assertEqual(self.cache.get_many(['counter', 'missing']), {'counter': 7})
+
+    def test_version_keys_are_shared_between_processes(self):
+        other = TwoTierCache(self.directory, {'OPTIONS': {}})
+        self.cache.set('mfc:version:news', 1, None)
+        self.assertEqual(other.get('mfc:version:news'), 1)
+        other.set('mfc:version:news', 2, None)
+        self.assertEqual(self.cache.get('mfc:version:news'), 2)
+
+    def test_get_or_set_computes_once_across_processes(self):
+        other = TwoTierCache(self.directory, {'OPTIONS': {}})
+        calls = []
+
+        def compute():
+            calls.append(1)
+            return 42
+
+        # Значение вычисляет «другой процесс», держащий блокировку ключа
+        self.assertTrue(self.cache._l2.acquire_lock('value', None, 30))
+
+        def finish():
+            time.sleep(0.2)
+            self.cache.set('value', 41)
+            self.cache._l2.release_lock('value', None)
+
+        thread = threading.Thread(target=finish)
+        thread.start()
+        self.assertEqual(other.get_or_set('value', compute), 41)
+        thread.join()
+        self.assertEqual(calls, [])
+
+        self.assertEqual(self.cache.get_or_set('other', compute), 42)
+        self.assertEqual(other.get_or_set('other', compute), 42)
+        self.assertEqual(len(calls), 1)
+
+
+class SearchTests(IsolatedCacheMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.in_body = make_service('Справка о несудимости', description='Нужен паспорт заявителя')
+        self.in_title = make_service('Замена паспорта', description='Выдача нового документа')
+        self.office = make_office('МФЦ на Ёлочной', address='ул. Ёлочная, д. 5')
+
+    def test_title_match_ranks_first(self):
+        hits = search.search('паспорт')
+        self.assertEqual([obj for doc_type, obj in hits], [self.in_title, self.in_body])
+
+    def test_prefix_and_yo_normalization(self):
+        self.assertEqual(search.search('паспорта'), [('service', self.in_title)])
+        self.assertEqual(search.search('пасп'), [('service', self.in_title), ('service', self.in_body)])
+        self.assertEqual(search.search('елочн'), [('office', self.office)])
+
+    def test_index_follows_saves_and_deletes(self):
+        self.in_title.name = 'Замена водительского удостоверения'
+        self.in_title.description = ''
+        self.in_title.save()
+        self.assertEqual(search.search('паспорт'), [('service', self.in_body)])
+        self.in_body.delete()
+        self.assertEqual(search.search('паспорт'), [])
+
+    def test_punctuation_only_query(self):
+        self.assertEqual(search.search('"*()'), [])
+
+    def test_view_falls_back_to_like_search(self):
+        author = Employee.objects.create(office=self.office, full_name='Иванов И. И.', position='manager')
+        News.objects.create(title='Оформление паспорта за один день', content='', author=author)
+        with mock.patch.object(search, 'is_available', return_value=False):
+            response = self.client.get(reverse('services:search'), {'q': 'паспорт'})
+        results = response.context['results']
+        self.assertNotIn('ranked', results)
+        self.assertEqual(list(results['services']), [self.in_title, self.in_body])
+        self.assertEqual([news.title for news in results['news']], ['Оформление паспорта за один день'])
+
+
+class SuggestionTests(IsolatedCacheMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.passport = make_service('Замена паспорта')
+        make_service('Выдача загранпаспорта')
+        self.office = make_office('МФЦ на Ёлочной', address='ул. Садовая, д. 5')
+
+    def test_prefix_matches_word_starts(self):
+        # «загранпаспорта» не подходит: префикс ищется с начала слова
+        self.assertEqual(suggestions.suggest('пасп'), ['Замена паспорта', 'паспорт'])
+        self.assertEqual(suggestions.suggest('загран'), ['Выдача загранпаспорта', 'загранпаспорт'])
+        self.assertEqual(suggestions.suggest('садов'), ['МФЦ на Ёлочной'])
+        self.assertEqual(suggestions.suggest('п'), [])
+        self.assertEqual(suggestions.suggest('справка'), [])
+
+    def test_case_and_yo_folding(self):
+        self.assertEqual(suggestions.suggest('  ПАСП '), suggestions.suggest('пасп'))
+        self.assertEqual(suggestions.suggest('ЕЛОЧ'), ['МФЦ на Ёлочной'])
+        self.assertEqual(suggestions.suggest('ёлоч'), ['МФЦ на Ёлочной'])
+
+    def test_limits(self):
+        for number in range(7):
+            make_service(f'Справка {number}')
+        for number in range(4):
+            make_office(f'Справочный офис {number}')
+        result = suggestions.suggest('справ')
+        self.assertEqual(len(result), suggestions.MAX_SUGGESTIONS)
+        self.assertEqual(result[:5], [f'Справка {number}' for number in range(5)])
+        self.assertEqual(result[5:], [f'Справочный офис {number}' for number in range(3)])
+
+    def test_index_rebuilt_after_catalog_change(self):
+        self.assertEqual(suggestions.suggest('водит'), [])
+        service = make_service('Замена водительского удостоверения')
+        self.assertEqual(suggestions.suggest('водит'), ['Замена водительского удостоверения'])
+        with self.assertNumQueries(0):
+            suggestions.suggest('водит')
+
+        self.passport.name = 'Замена паспорта в 20 и 45 лет'
+        self.passport.save()
+        self.assertEqual(suggestions.suggest('пасп'), ['Замена паспорта в 20 и 45 лет', 'паспорт'])
+        service.delete()
+        self.assertEqual(suggestions.suggest('водит'), [])
+        self.office.name = 'МФЦ на Садовой'
+        self.office.save()
+        self.assertEqual(suggestions.suggest('елоч'), [])
+        self.assertEqual(suggestions.suggest('садов'), ['МФЦ на Садовой'])
+
+
+class WidgetTests(IsolatedCacheMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.office = make_office('МФЦ Центральный')
+        self.author = Employee.objects.create(office=self.office, full_name='Иванов И. И.', position='manager')
+        self.news = News.objects.create(title='График работы в праздники', content='', author=self.author)
+        self.service = make_service('Замена паспорта', cost=Decimal('300'))
+        self.user = User.objects.create_user('applicant')
+        self.status = ApplicationStatus.objects.create(code=ApplicationStatus.SUBMITTED, name='Подано')
+        Application.objects.create(user=self.user, service=self.service, status=self.status)
+
+    def test_home_renders_widgets(self):
+        make_service('Выдача справки')
+        response = self.client.get(reverse('services:home'))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'График работы в праздники')
+        self.assertContains(response, 'Заявлений: 1')
+        self.assertContains(response, 'Всего услуг в системе: 2')
+        self.assertEqual(
+            [service.name for service in response.context['popular_services']],
+            ['Замена паспорта', 'Выдача справки'],
+        )
+        self.assertEqual(response.context['offices'], [self.office])
+        self.assertEqual(response.context['stats']['total_applications'], 1)
+
+    def test_widgets_cached_until_their_data_changes(self):
+        widgets.latest_news(), widgets.popular_services(), widgets.random_offices(), widgets.site_stats()
+        with self.assertNumQueries(0):
+            widgets.latest_news(), widgets.popular_services(), widgets.random_offices(), widgets.site_stats()
+
+        News.objects.create(title='Новый офис', content='', author=self.author)
+        with self.assertNumQueries(0):
+            widgets.popular_services(), widgets.random_offices(), widgets.site_stats()
+        self.assertEqual([news.title for news in widgets.latest_news()], ['Новый офис', 'График работы в праздники'])
+
+        Application.objects.create(user=self.user, service=self.service, status=self.status)
+        with self.assertNumQueries(0):
+            widgets.latest_news(), widgets.random_offices()
+        self.assertEqual(widgets.popular_services()[0].application_count, 2)
+        self.assertEqual(widgets.site_stats()['total_applications'], 2)
+
+        office = make_office('МФЦ Северный')
+        self.assertCountEqual(widgets.random_offices(), [self.office, office])
+        self.assertEqual(widgets.site_stats()['total_offices'], 2)
+
+    def test_async_widgets_share_cache(self):
+        widgets.latest_news(), widgets.popular_services(), widgets.random_offices(), widgets.site_stats()
+
+        async def load():
+            return await widgets.alatest_news(), await widgets.apopular_services(), await widgets.asite_stats()
+
+        with self.assertNumQueries(0):
+            news, services, site_stats = async_to_sync(load)()
+        self.assertEqual(news, [self.news])
+        self.assertEqual(services, [self.service])
+        self.assertEqual(site_stats['total_services'], 1)
+
+
+class ReferenceSnapshotTests(IsolatedCacheMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.submitted = ApplicationStatus.objects.create(code=ApplicationStatus.SUBMITTED, name='Подано')
+        self.passport = make_service('Замена паспорта')
+        self.office = make_office('МФЦ Центральный')
+
+    def test_snapshot_reused_until_version_changes(self):
+        with self.assertNumQueries(1):
+            services = reference.services()
+        with self.assertNumQueries(0):
+            self.assertIs(reference.services(), services)
+            self.assertIs(reference.get('services', self.passport.pk), services[0])
+            self.assertEqual(services[0].category.name, 'Документы')
+        with self.assertRaises(KeyError):
+            reference.get('services', self.passport.pk + 1)
+
+        # Изменение в другом процессе видно по версии в общем кэше
+        caching.bump_version('services')
+        with self.assertNumQueries(1):
+            self.assertIsNot(reference.services(), services)
+
+    def test_invalidated_on_save_and_delete(self):
+        self.assertEqual(reference.status(ApplicationStatus.SUBMITTED), self.submitted)
+        with self.assertRaises(ApplicationStatus.DoesNotExist):
+            reference.status(ApplicationStatus.COMPLETED)
+        completed = ApplicationStatus.objects.create(code=ApplicationStatus.COMPLETED, name='Выполнено')
+        self.assertEqual(reference.status(ApplicationStatus.COMPLETED), completed)
+
+        self.passport.name = 'Замена паспорта в 20 и 45 лет'
+        self.passport.save()
+        self.assertEqual([service.name for service in reference.services()], ['Замена паспорта в 20 и 45 лет'])
+        category = self.passport.category
+        category.name = 'Паспорта'
+        category.save()
+        self.assertEqual([category.name for category in reference.categories()], ['Паспорта'])
+        self.assertEqual(reference.services()[0].category.name, 'Паспорта')
+
+        offices = reference.offices()
+        self.assertEqual(offices, [self.office])
+        self.office.delete()
+        self.assertEqual(reference.offices(), [])
+        self.passport.delete()
+        self.assertEqual(reference.services(), [])
+
+    def test_warm_up_loads_all_sources(self):
+        request_started.connect(reference.warm_up, dispatch_uid='reference_warm_up')
+        self.addCleanup(request_started.disconnect, reference.warm_up, dispatch_uid='reference_warm_up')
+        with self.assertNumQueries(len(reference.SOURCES)):
+            request_started.send(sender=None)
+        with self.assertNumQueries(0):
+            reference.statuses(), reference.categories(), reference.services(), reference.offices()
+        # Обработчик срабатывает только на первом запросе процесса
+        caching.bump_version('statuses', 'services', 'offices')
+        with self.assertNumQueries(0):
+            request_started.send(sender=None)
+
+
+class FormChoiceTests(IsolatedCacheMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.central = make_office('МФЦ Центральный', address='ул. Ленина, д. 1')
+        self.north = make_office('МФЦ Северный', address='пр. Мира, д. 10')
+        self.passport = make_service('Замена паспорта')
+        self.benefit = make_service('Детское пособие', category=ServiceCategory.objects.create(name='Пособия'))
+        OfficeService.objects.create(office=self.central, service=self.passport)
+        OfficeService.objects.create(office=self.central, service=self.benefit)
+        OfficeService.objects.create(office=self.north, service=self.passport)
+
+    def form_choices(self, field):
+        return [label for value, label in AppointmentForm().fields[field].choices if value]
+
+    def page(self, name, **params):
+        response = self.client.get(reverse(f'services:{name}_choices'), params)
+        return response.status_code, response.json()
+
+    def test_form_choices_follow_create_and_delete(self):
+        self.assertEqual(self.form_choices('office'), [str(self.north), str(self.central)])
+        south = make_office('МФЦ Южный')
+        self.assertEqual(self.form_choices('office'), [str(self.north), str(self.central), str(south)])
+        self.north.delete()
+        with self.assertNumQueries(1):
+            self.assertEqual(self.form_choices('office'), [str(self.central), str(south)])
+
+        visa = make_service('Оформление визы')
+        self.assertIn(str(visa), self.form_choices('service'))
+        visa.delete()
+        self.assertNotIn(str(visa), self.form_choices('service'))
+
+    def test_validation_uses_current_snapshot(self):
+        form = ApplicationForm()
+        field = form.fields['service']
+        with self.assertNumQueries(1):
+            self.assertEqual(field.clean(str(self.passport.pk)), self.passport)
+        with self.assertNumQueries(0):
+            self.assertEqual(field.clean(self.benefit.pk), self.benefit)
+        self.benefit.delete()
+        with self.assertRaises(ValidationError) as error:
+            field.clean(str(self.benefit.pk))
+        self.assertEqual(error.exception.code, 'invalid_choice')
+
+    def test_widget_renders_selected_option_only(self):
+        html = ApplicationForm(initial={'service': self.benefit.pk})['service'].as_widget()
+        self.assertIn(f'data-choices-url="{reverse("services:service_choices")}"', html)
+        self.assertEqual(html.count('<option'), 2)
+        self.assertIn(f'<option value="{self.benefit.pk}" selected>{self.benefit}</option>', html)
+        self.assertNotIn(str(self.passport), html)
+
+    def test_dependent_choices_follow_office_services(self):
+        # Варианты в порядке моделей (по названию)
+        self.assertEqual(self.page('service', office=self.north.pk)[1]['results'], [
+            {'id': self.passport.pk, 'text': str(self.passport)},
+        ])
+        link = OfficeService.objects.create(office=self.north, service=self.benefit)
+        self.assertEqual([row['id'] for row in self.page('service', office=self.north.pk)[1]['results']],
+                         [self.benefit.pk, self.passport.pk])
+        self.assertEqual([row['id'] for row in self.page('office', service=self.benefit.pk)[1]['results']],
+                         [self.north.pk, self.central.pk])
+        link.delete()
+        self.assertEqual([row['id'] for row in self.page('office', service=self.benefit.pk)[1]['results']],
+                         [self.central.pk])
+
+    def test_search_paging_and_errors(self):
+        # Поиск по категории и адресу без учёта регистра
+        self.assertEqual([row['id'] for row in self.page('service', q='ПОСОБ')[1]['results']], [self.benefit.pk])
+        self.assertEqual([row['id'] for row in self.page('office', q='мира')[1]['results']], [self.north.pk])
+
+        with override_settings(MFC_SETTINGS={**settings.MFC_SETTINGS, 'PAGINATION_PER_PAGE': 1}):
+            self.assertEqual(self.page('office'), (200, {
+                'results': [{'id': self.north.pk, 'text': str(self.north)}], 'next': 1,
+            }))
+            self.assertEqual(self.page('office', offset=1)[1]['next'], None)
+
+        status, payload = self.page('service', office='центр')
+        self.assertEqual(status, 400)
+        self.assertIn('error', payload)
+        self.assertEqual(self.page('office', service=10 ** 6), (200, {'results': [], 'next': None}))
+
+
+class StatCounterTests(IsolatedCacheMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user('applicant')
+        self.status = ApplicationStatus.objects.create(code=ApplicationStatus.SUBMITTED, name='Подано')
+
+    def test_counters_follow_saves_and_deletes(self):
+        first = make_service('Первая', cost=Decimal('100.50'))
+        second = make_service('Вторая', cost=Decimal('200'))
+        make_office('МФЦ')
+        Application.objects.create(user=self.user, service=first, status=self.status)
+        self.assertEqual(stats.site_stats(), {
+            'total_services': 2,
+            'total_offices': 1,
+            'total_applications': 1,
+            'avg_service_cost': Decimal('150.25'),
+        })
+
+        second.cost = Decimal('300')
+        second.save()
+        self.assertEqual(stats.get_counter(stats.SERVICE_COST_KOPECKS), 40050)
+        first.delete()
+        self.assertEqual(stats.get_counters(), {
+            stats.SERVICES: 1,
+            stats.OFFICES: 1,
+            stats.APPLICATIONS: 0,
+            stats.SERVICE_COST_KOPECKS: 30000,
+        })
+        self.assertEqual(stats.reconcile(), {})
+        self.assertEqual(stats.reconcile_daily(), {})
+
+    def test_reconcile_repairs_bulk_create_drift(self):
+        service = make_service('Услуга', cost=Decimal('10'))
+        Service.objects.bulk_create([Service(category=service.category, name='Без сигнала', execution_term='1 день', cost=5)])
+        created_at = timezone.now() - timedelta(days=3)
+        Application.objects.bulk_create([
+            Application(user=self.user, service=service, status=self.status, created_at=created_at)
+            for _ in range(2)
+        ])
+
+        out = StringIO()
+        call_command('reconcile_stats', '--dry-run', stdout=out)
+        self.assertIn('services: stored=1 actual=2', out.getvalue())
+        self.assertIn('(not fixed)', out.getvalue())
+        self.assertEqual(stats.get_counter(stats.SERVICES), 1)
+
+        drift = stats.reconcile()
+        self.assertEqual(drift[stats.APPLICATIONS], (0, 2))
+        self.assertEqual(drift[stats.SERVICE_COST_KOPECKS], (1000, 1500))
+        day = timezone.localdate(created_at)
+        self.assertEqual(stats.reconcile_daily(), {day: (None, 2)})
+        self.assertEqual(ApplicationDailyStat.objects.get(day=day).count, 2)
+        self.assertEqual(stats.reconcile(fix=False), {})
+        self.assertEqual(stats.reconcile_daily(fix=False), {})
+
+
+class KeysetPaginationTests(IsolatedCacheMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        # Повторяющиеся имена: порядок между ними задаёт только id
+        for name in ['А', 'Б', 'Б', 'Б', 'В', 'Г', 'Г']:
+            make_office(name)
+        self.expected = list(MFCOffice.objects.order_by('name', 'id'))
+
+    def walk(self, paginator):
+        pages = [paginator.page()]
+        while pages[-1].has_next:
+            pages.append(paginator.page(after=pages[-1].next_cursor))
+        return pages
+
+    def test_forward_and_backward_walks_cover_ties(self):
+        paginator = KeysetPaginator(MFCOffice.objects.all(), ('name', 'id'), per_page=3)
+        pages = self.walk(paginator)
+        self.assertEqual([obj for page in pages for obj in page], self.expected)
+        self.assertEqual([len(page) for page in pages], [3, 3, 1])
+        self.assertFalse(pages[0].has_previous)
+
+        backward = [pages[-1]]
+        while backward[-1].has_previous:
+            backward.append(paginator.page(before=backward[-1].previous_cursor))
+        self.assertEqual([list(page) for page in backward[::-1]], [list(page) for page in pages])
+
+    def test_descending_ordering(self):
+        paginator = KeysetPaginator(MFCOffice.objects.all(), ('-name', 'id'), per_page=2)
+        objects = [obj for page in self.walk(paginator) for obj in page]
+        self.assertEqual(objects, list(MFCOffice.objects.order_by('-name', 'id')))
+
+    def test_last_full_page_has_no_next(self):
+        paginator = KeysetPaginator(MFCOffice.objects.all(), ('name', 'id'), per_page=7)
+        page = paginator.page()
+        self.assertEqual(len(page), 7)
+        self.assertFalse(page.has_next)
+        self.assertFalse(page.has_other_pages)
+
+    def test_empty_queryset_and_cursor_past_the_end(self):
+        paginator = KeysetPaginator(MFCOffice.objects.none(), ('name', 'id'))
+        page = paginator.page()
+        self.assertFalse(page)
+        self.assertIsNone(page.next_cursor)
+
+        paginator = KeysetPaginator(MFCOffice.objects.all(), ('name', 'id'), per_page=3)
+        past_end = paginator.page(after=paginator.encode_cursor(self.expected[-1]))
+        self.assertEqual(list(past_end), [])
+        self.assertFalse(past_end.has_next or past_end.has_previous)
+
+    def test_invalid_cursors(self):
+        paginator = KeysetPaginator(MFCOffice.objects.all(), ('name', 'id'), per_page=3)
+        # Не base64, не JSON, id не число, не то число значений
+        for cursor in ['!!!', 'bm90IGpzb24', 'WyJcdTA0MTAiLCAieCJd', 'WyJhIl0']:
+            with self.subTest(cursor=cursor), self.assertRaises(InvalidCursor):
+                paginator.page(after=cursor)
+
+    def test_seek_uses_index_search(self):
+        user = User.objects.create_user('applicant')
+        cases = [
+            (News.objects.all(), ('-published_at', 'id'), 'services_ne_publish_04e5cd_idx'),
+            (Application.objects.filter(user=user), ('-created_at', '-id'), 'services_ap_user_id_cea4ff_idx'),
+        ]
+        for queryset, ordering, index in cases:
+            paginator = KeysetPaginator(queryset, ordering)
+            values = [timezone.now(), 100]
+            for forward in (True, False):
+                with self.subTest(ordering=ordering, forward=forward):
+                    if forward:
+                        order = ordering
+                    else:
+                        order = [name[1:] if name.startswith('-') else f'-{name}' for name in ordering]
+                    plan = queryset.filter(paginator._seek_filter(values, forward)).order_by(*order)[:21].explain()
+                    # Поиск начала страницы по индексу, без сортировки во временном B-дереве
+                    self.assertIn(f'SEARCH {queryset.model._meta.db_table} USING INDEX {index}', plan)
+                    self.assertNotIn('TEMP B-TREE', plan)
+
+    def test_paginate_keeps_params_and_ignores_bad_cursor(self):
+        request = RequestFactory().get('/offices/', {'q': 'МФЦ', 'after': 'garbage'})
+        page = paginate(request, MFCOffice.objects.all(), ('name', 'id'), per_page=3)
+        self.assertEqual(list(page), self.expected[:3])
+        self.assertFalse(page.has_previous)
+        self.assertEqual(QueryDict(page.next_querystring), QueryDict(f'q=МФЦ&after={page.next_cursor}'))
+
+
+class SlotTests(IsolatedCacheMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user('visitor')
+        self.service = make_service('Паспорт')
+        self.office = make_office('МФЦ', work_schedule='пн-вс 9:00-10:00', slot_minutes=20, slot_capacity=2)
+        self.day = timezone.localdate() + timedelta(days=1)
+        self.first_slot = slots.day_slots(self.office, self.day)[0]
+
+    def book(self, start, status='active'):
+        return slots.book_appointment(Appointment(
+            user=self.user, office=self.office, service=self.service, appointment_datetime=start, status=status,
+        ))
+
+    def test_day_slots(self):
+        starts = slots.day_slots(self.office, self.day)
+        self.assertEqual([timezone.localtime(start).strftime('%H:%M') for start in starts], ['09:00', '09:20', '09:40'])
+        self.assertEqual(slots.slot_start(self.office, self.first_slot + timedelta(minutes=25)), starts[1])
+        self.assertIsNone(slots.slot_start(self.office, starts[-1] + timedelta(minutes=20)))
+        self.assertEqual(slots.day_slots(MFCOffice(work_schedule='пн-вс 9:00-10:00', slot_minutes=0), self.day), [])
+
+    def test_capacity_is_enforced(self):
+        self.book(self.first_slot)
+        self.book(self.first_slot, status='cancelled')
+        self.assertEqual(slots.free_places(self.office, self.first_slot), 1)
+        self.book(self.first_slot)
+        with self.assertRaises(slots.SlotUnavailable):
+            self.book(self.first_slot)
+        self.assertEqual(Appointment.objects.filter(status='active').count(), 2)
+
+        available = slots.available_slots(self.office, self.day, self.day)
+        self.assertEqual([slot['free'] for slot in available], [2, 2])
+        self.assertNotIn(self.first_slot, [slot['start'] for slot in available])
+
+    def test_time_between_slots_is_rejected(self):
+        with self.assertRaises(slots.SlotUnavailable):
+            self.book(self.first_slot + timedelta(minutes=5))
+
+    def test_service_not_offered_has_no_slots(self):
+        self.assertEqual(slots.available_slots(self.office, self.day, self.day, service=self.service), [])
+        OfficeService.objects.create(office=self.office, service=self.service)
+        self.assertEqual(len(slots.available_slots(self.office, self.day, self.day, service=self.service)), 3)
+
+
+class ConcurrentBookingTests(IsolatedCacheMixin, TransactionTestCase):
+    def test_parallel_bookings_never_overfill_a_slot(self):
+        user = User.objects.create_user('visitor')
+        service = make_service('Паспорт')
+        office = make_office('МФЦ', work_schedule='пн-вс 9:00-10:00', slot_minutes=20, slot_capacity=3)
+        start = slots.day_slots(office, timezone.localdate() + timedelta(days=1))[0]
+        barrier = threading.Barrier(8)
+        results = []
+
+        def book():
+            try:
+                barrier.wait()
+                slots.book_appointment(Appointment(
+                    user=user, office=office, service=service, appointment_datetime=start,
+                ))
+                results.append('booked')
+            except slots.SlotUnavailable:
+                results.append('full')
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=book) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(sorted(results), ['booked'] * 3 + ['full'] * 5)
+        self.assertEqual(Appointment.objects.filter(appointment_datetime=start).count(), 3)
+
+
+class RetryOnBusyTests(SimpleTestCase):
+    def test_retries_busy_errors_then_succeeds(self):
+        calls = []
+
+        @retry_on_busy(attempts=3, delay=0)
+        def write():
+            calls.append(1)
+            if len(calls) < 3:
+                raise OperationalError('database is locked')
+            return 'done'
+
+        self.assertEqual(write(), 'done')
+        self.assertEqual(len(calls), 3)
+
+    def test_gives_up_and_passes_other_errors(self):
+        for message, attempts, expected_calls in [('database is locked', 2, 2), ('no such table: x', 5, 1)]:
+            calls = []
+
+            def write():
+                calls.append(1)
+                raise OperationalError(message)
+
+            with self.subTest(message=message), self.assertRaises(OperationalError):
+                retry_on_busy(attempts=attempts, delay=0)(write)()
+            self.assertEqual(len(calls), expected_calls)
+
+
+class TaskQueueTests(IsolatedCacheMixin, TestCase):
+    def test_email_task_is_sent(self):
+        task = tasks.enqueue_email('user@example.com', 'Заявление', 'Принято')
+        self.assertEqual(tasks.run_batch('worker'), (1, 0))
+        task.refresh_from_db()
+        self.assertEqual((task.status, task.attempts, task.locked_by), (BackgroundTask.STATUS_DONE, 1, ''))
+        self.assertEqual([message.to for message in mail.outbox], [['user@example.com']])
+
+    def test_unknown_task_type(self):
+        with self.assertRaises(ValueError):
+            tasks.enqueue('missing', {})
+
+    def test_failures_back_off_exponentially_then_give_up(self):
+        with mock.patch.dict(tasks.TASK_HANDLERS, {'flaky': mock.Mock(side_effect=ConnectionError('down'))}):
+            task = tasks.enqueue('flaky', {})
+            task.max_attempts = 3
+            task.save()
+            for attempt, delay in [(1, 60), (2, 120)]:
+                started = timezone.now()
+                self.assertEqual(tasks.run_batch('worker'), (0, 1))
+                task.refresh_from_db()
+                self.assertEqual((task.status, task.attempts), (BackgroundTask.STATUS_PENDING, attempt))
+                self.assertEqual(task.last_error, 'ConnectionError: down')
+                self.assertAlmostEqual((task.run_after - started).total_seconds(), delay, delta=5)
+                # Задача ещё не готова: пачка пустая
+                self.assertEqual(tasks.run_batch('worker'), (0, 0))
+                BackgroundTask.objects.filter(pk=task.pk).update(run_after=timezone.now())
+
+            self.assertEqual(tasks.run_batch('worker'), (0, 1))
+            task.refresh_from_db()
+            self.assertEqual((task.status, task.attempts), (BackgroundTask.STATUS_FAILED, 3))
+            self.assertEqual(tasks.run_batch('worker'), (0, 0))
+
+    def test_claims_are_exclusive_and_stale_locks_expire(self):
+        task = tasks.enqueue_email('user@example.com', 'Тема', 'Текст')
+        self.assertEqual(tasks.claim_batch('first', 10), [task])
+        self.assertEqual(tasks.claim_batch('second', 10), [])
+
+        BackgroundTask.objects.filter(pk=task.pk).update(locked_at=timezone.now() - timedelta(hours=1))
+        reclaimed = tasks.claim_batch('second', 10)
+        self.assertEqual([(t.pk, t.locked_by, t.attempts) for t in reclaimed], [(task.pk, 'second', 2)])
+
+
+class ApplicationDataTests(IsolatedCacheMixin, TestCase):
+    SCHEMA = [
+        {'name': 'passport_series', 'label': 'Серия паспорта', 'required': True, 'pattern': r'^\d{4}$'},
+        {'name': 'issued', 'label': 'Дата выдачи', 'type': 'date'},
+    ]
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user('applicant')
+        self.status = ApplicationStatus.objects.create(code=ApplicationStatus.SUBMITTED, name='Подано')
+        self.service = make_service('Паспорт', data_schema=self.SCHEMA)
+
+    def test_parse_legacy_text(self):
+        self.assertEqual(application_data.parse_legacy_text('{"a": 1}'), {'a': 1})
+        self.assertEqual(
+            application_data.parse_legacy_text("{'passport_series': '4510', 'ids': {1, 2}, 'ok': True}"),
+            {'passport_series': '4510', 'ids': '{1, 2}', 'ok': True},
+        )
+        for text in ['', 'просто текст', '{не словарь', '{1, 2}', "{'a': __import__('os')}"]:
+            with self.subTest(text=text):
+                self.assertIsNone(application_data.parse_legacy_text(text))
+
+    def test_migration_converts_text(self):
+        migration = importlib.import_module('services.migrations.0011_structured_application_data')
+        self.assertEqual(migration.as_json_object('  '), '{}')
+        self.assertEqual(json.loads(migration.as_json_object('Прошу ускорить')), {'comment': 'Прошу ускорить'})
+        self.assertEqual(json.loads(migration.as_json_object('{"snils": "123"}')), {'snils': '123'})
+        self.assertEqual(json.loads(migration.as_json_object("{'snils': '123'}")), {'snils': '123'})
+
+    def test_form_save_merges_into_existing_data(self):
+        application = self.create({'passport_series': '1111', 'old_field': 'сохранить', 'comment': 'старый'})
+        form = ApplicationForm({
+            'service': self.service.pk,
+            'data_passport_series': '4510',
+            'data_issued': '2020-05-01',
+            'comment': '',
+        }, instance=application)
+        self.assertTrue(form.is_valid(), form.errors)
+        form.save()
+        application.refresh_from_db()
+        self.assertEqual(application.application_data, {
+            'old_field': 'сохранить', 'passport_series': '4510', 'issued': '2020-05-01',
+        })
+
+        form = ApplicationForm({'service': self.service.pk, 'data_passport_series': '45'}, instance=application)
+        self.assertFalse(form.is_valid())
+        self.assertIn('data_passport_series', form.errors)
+
+    def create(self, data):
+        return Application.objects.create(user=self.user, service=self.service, status=self.status, application_data=data)
+
+
+class SessionStoreTests(IsolatedCacheMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.session = SessionStore()
+        self.session['cart'] = [1, 2]
+        self.session['step'] = 'office'
+        self.session.save()
+
+    def reload(self):
+        session = SessionStore(self.session.session_key)
+        session.load()
+        return session
+
+    def test_unchanged_session_is_not_written(self):
+        session = self.reload()
+        # Значение присвоено заново, ключ удалён и возвращён: данные те же
+        session['cart'] = [1, 2]
+        step = session.pop('step')
+        session['step'] = step
+        self.assertTrue(session.modified)
+        with self.assertNumQueries(0):
+            session.save()
+
+    def test_changed_session_is_written_and_cached_separately(self):
+        session = self.reload()
+        session['step'] = 'time'
+        session.save()
+        self.assertEqual(Session.objects.get(pk=session.session_key).get_decoded()['step'], 'time')
+        with self.assertNumQueries(0):
+            self.assertEqual(self.reload()['step'], 'time')
+
+        key = SessionStore.cache_key_prefix + session.session_key
+        self.assertIsNotNone(caches['sessions'].get(key))
+        self.assertIsNone(caches['default'].get(key))
+
+    def test_cleanup_deletes_only_expired_sessions(self):
+        expired = SessionStore()
+        expired['step'] = 'old'
+        expired.set_expiry(-60)
+        expired.save()
+        call_command('cleanup_sessions', '--batch-size', '1', '--pause', '0', stdout=StringIO())
+        self.assertEqual(list(Session.objects.values_list('session_key', flat=True)), [self.session.session_key])
+
+
+class ConditionalGetTests(IsolatedCacheMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.service = make_service('Паспорт')
+        self.url = reverse('services:service_list')
+
+    def test_unchanged_page_is_not_rendered_again(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        self.assertIn('no-cache', response['Cache-Control'])
+
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        response = self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=self.client.get(self.url)['Last-Modified'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_changes_and_deletes_change_the_etag(self):
+        etag = self.client.get(self.url)['ETag']
+        self.service.name = 'Замена паспорта'
+        self.service.save()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Замена паспорта')
+
+        etag = response['ETag']
+        self.service.delete()
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_etag_depends_on_query_string(self):
+        make_service('Справка')
+        first = self.client.get(self.url, {'q': 'Паспорт'})
+        second = self.client.get(self.url, {'q': 'Справка'})
+        self.assertNotEqual(first['ETag'], second['ETag'])
+        response = self.client.get(self.url, {'q': 'Справка'}, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Справка')
+        response = self.client.get(self.url, {'q': 'Паспорт'}, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_etag_depends_on_user(self):
+        anonymous = self.client.get(self.url)
+        self.client.force_login(User.objects.create_user('applicant'))
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=anonymous['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], anonymous['ETag'])
+        self.assertFalse(response.has_header('Last-Modified'))
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+
+
+class CatalogFacetTests(IsolatedCacheMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.documents = ServiceCategory.objects.create(name='Документы')
+        self.property = ServiceCategory.objects.create(name='Недвижимость')
+        for name, category, cost in [
+            ('Паспорт', self.documents, 0),
+            ('Загранпаспорт', self.documents, 500),
+            ('Справка', self.documents, 2500),
+            ('Выписка ЕГРН', self.property, 300),
+            ('Регистрация права', self.property, 2000),
+        ]:
+            make_service(name, category, cost=Decimal(cost))
+
+    def counts(self, **filters):
+        data = catalog.facets(**filters)
+        return (
+            data['total'],
+            {item['name']: item['count'] for item in data['categories']},
+            {item['key']: item['count'] for item in data['costs']},
+        )
+
+    def test_unfiltered_counts(self):
+        self.assertEqual(self.counts(), (
+            5,
+            {'Документы': 3, 'Недвижимость': 2},
+            {'free': 1, 'upto500': 2, '500to2000': 1, 'over2000': 1},
+        ))
+
+    def test_each_facet_ignores_its_own_filter(self):
+        self.assertEqual(self.counts(category=self.documents.id, cost='upto500'), (
+            1,
+            {'Документы': 1, 'Недвижимость': 1},
+            {'free': 1, 'upto500': 1, '500to2000': 0, 'over2000': 1},
+        ))
+        self.assertEqual(self.counts(query='паспорт'), (
+            1,
+            {'Документы': 1, 'Недвижимость': 0},
+            {'free': 0, 'upto500': 1, '500to2000': 0, 'over2000': 0},
+        ))
+
+    def test_cached_matrix_follows_changes(self):
+        # Матрица одним запросом и снимок категорий
+        with self.assertNumQueries(2):
+            catalog.facets()
+        with self.assertNumQueries(0):
+            catalog.facets()
+        make_service('Водительское удостоверение', self.documents, cost=Decimal(3000))
+        self.assertEqual(self.counts()[2]['over2000'], 2)
+
+    def test_json_endpoint(self):
+        url = reverse('services:service_catalog')
+        data = self.client.get(url, {'category': self.property.id}).json()
+        self.assertEqual(data['total'], 2)
+        self.assertEqual([service['name'] for service in data['services']], ['Выписка ЕГРН', 'Регистрация права'])
+        self.assertEqual(self.client.get(url, {'cost': 'cheap'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'category': 'x'}).status_code, 400)
+
+
+class AvailabilityMatrixTests(IsolatedCacheMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.passport = make_service('Паспорт')
+        self.snils = make_service('СНИЛС')
+        self.center = make_office('МФЦ Центральный')
+        self.east = make_office('МФЦ Восточный')
+        OfficeService.objects.create(office=self.center, service=self.passport)
+        OfficeService.objects.create(office=self.center, service=self.snils)
+        OfficeService.objects.create(office=self.east, service=self.snils)
+
+    def test_bit_ids(self):
+        self.assertEqual(availability.bit_ids(0), [])
+        self.assertEqual(availability.bit_ids(1 << 70 | 1 << 3 | 1), [0, 3, 70])
+
+    def test_masks_use_dense_ordinals(self):
+        matrix = availability.AvailabilityMatrix(1, [(10 ** 9, 7), (3, 7), (3, 5 * 10 ** 8)])
+        self.assertLessEqual(max(mask.bit_length() for mask in matrix.services_by_office.values()), 2)
+        self.assertLessEqual(max(mask.bit_length() for mask in matrix.offices_by_service.values()), 2)
+        self.assertEqual(matrix.office_ids(7), [3, 10 ** 9])
+        self.assertEqual(matrix.service_ids(3), [7, 5 * 10 ** 8])
+        self.assertTrue(matrix.is_offered(10 ** 9, 7))
+        self.assertFalse(matrix.is_offered(10 ** 9, 5 * 10 ** 8))
+        self.assertFalse(matrix.is_offered(3, 8))
+
+    def test_lookups_match_office_services(self):
+        matrix = availability.get_matrix()
+        self.assertTrue(matrix.is_offered(self.center.pk, self.passport.pk))
+        self.assertFalse(availability.is_offered(self.east, self.passport))
+        self.assertFalse(availability.is_offered(self.east.pk, 10 ** 6))
+        self.assertEqual(matrix.office_ids(self.snils.pk), sorted([self.center.pk, self.east.pk]))
+        # Порядок — как в модели (по имени)
+        self.assertEqual(availability.offices_for(self.snils), [self.east, self.center])
+        self.assertEqual(availability.services_at(self.center.pk), [self.passport, self.snils])
+
+    def test_matrix_is_rebuilt_after_changes_only(self):
+        matrix = availability.get_matrix()
+        with self.assertNumQueries(0):
+            self.assertIs(availability.get_matrix(), matrix)
+        OfficeService.objects.create(office=self.east, service=self.passport)
+        self.assertTrue(availability.is_offered(self.east, self.passport))
+        OfficeService.objects.filter(office=self.center).delete()
+        self.assertEqual(availability.offices_for(self.passport), [self.east])
+        self.assertEqual(availability.services_at(self.center), [])
+
+    def test_api(self):
+        data = self.client.get(reverse('services:service_offices', args=[self.snils.pk])).json()
+        self.assertEqual([office['name'] for office in data['offices']], ['МФЦ Восточный', 'МФЦ Центральный'])
+        data = self.client.get(reverse('services:office_services', args=[self.east.pk])).json()
+        self.assertEqual(data['services'], [{'id': self.snils.pk, 'name': 'СНИЛС', 'category': 'Документы'}])
+
+
+class GridIndexTests(SimpleTestCase):
+    def brute_force(self, offices, lat, lng, limit, predicate=None, max_km=None):
+        found = sorted(
+            (geo.distance_km(lat, lng, office.latitude, office.longitude), office.pk)
+            for office in offices
+            if office.latitude is not None and (predicate is None or predicate(office))
+        )
+        return [pk for distance, pk in found if max_km is None or distance <= max_km][:limit]
+
+    def test_matches_brute_force(self):
+        rng = random.Random(7)
+        offices = [
+            MFCOffice(pk=pk, latitude=rng.uniform(43, 70), longitude=rng.uniform(20, 180))
+            for pk in range(1, 2001)
+        ]
+        offices.append(MFCOffice(pk=5000, latitude=None, longitude=None))
+        index = geo.GridIndex(1, offices, 0.1)
+        selected = [office for office in offices if office.pk % 97 == 0]
+        ids = {office.pk for office in selected}
+        cases = [
+            {},
+            {'max_km': 300},
+            # Избирательный фильтр: обход колец сменяется перебором кандидатов
+            {'predicate': lambda office: office.pk in ids},
+            {'predicate': lambda office: office.pk in ids, 'candidates': selected},
+            {'predicate': lambda office: False},
+        ]
+        for _ in range(20):
+            lat, lng = rng.uniform(43, 70), rng.uniform(20, 180)
+            for kwargs in cases:
+                with self.subTest(lat=lat, lng=lng, kwargs=sorted(kwargs)):
+                    found = index.nearest(lat, lng, 5, **kwargs)
+                    expected = self.brute_force(
+                        kwargs.get('candidates', offices), lat, lng, 5, kwargs.get('predicate'), kwargs.get('max_km'),
+                    )
+                    self.assertEqual([office.pk for distance, office in found], expected)
+                    self.assertEqual([distance for distance, office in found], sorted(d for d, o in found))
+
+    def test_empty_index(self):
+        self.assertEqual(geo.GridIndex(1, [MFCOffice(pk=1)], 0.1).nearest(55.75, 37.62, 5), [])
+
+
+class NearestOfficeTests(IsolatedCacheMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.service = make_service('Паспорт')
+        # По удалённости от точки запроса: closed, weekdays, always, far
+        self.closed = make_office(
+            'МФЦ по записи', work_schedule='по предварительной записи', latitude=55.751, longitude=37.62,
+        )
+        self.weekdays = make_office('МФЦ будни', work_schedule='пн-пт 9:00-18:00', latitude=55.76, longitude=37.62)
+        self.always = make_office(
+            'МФЦ круглосуточный', work_schedule='пн-вс 0:00-24:00', latitude=55.80, longitude=37.62,
+        )
+        self.far = make_office('МФЦ Тверь', latitude=56.86, longitude=35.90)
+        make_office('МФЦ без координат')
+        for office in [self.closed, self.always, self.far]:
+            OfficeService.objects.create(office=office, service=self.service)
+        self.url = reverse('services:nearest_offices')
+
+    def names(self, **params):
+        response = self.client.get(self.url, {'lat': 55.75, 'lng': 37.62, **params})
+        self.assertEqual(response.status_code, 200)
+        return [office['name'] for office in response.json()['offices']]
+
+    def test_orders_by_distance_and_filters(self):
+        closed, weekdays, always, far = 'МФЦ по записи', 'МФЦ будни', 'МФЦ круглосуточный', 'МФЦ Тверь'
+        self.assertEqual(self.names(), [closed, weekdays, always, far])
+        self.assertEqual(self.names(limit=2), [closed, weekdays])
+        self.assertEqual(self.names(max_km=20), [closed, weekdays, always])
+        self.assertEqual(self.names(service=self.service.pk), [closed, always, far])
+        self.assertEqual(self.names(service=self.service.pk, open='now'), [always])
+        self.assertNotIn(closed, self.names(open='today'))
+
+    def test_index_follows_office_changes(self):
+        self.far.latitude, self.far.longitude = 55.7501, 37.6201
+        self.far.save()
+        self.assertEqual(self.names(limit=1), ['МФЦ Тверь'])
+
+    def test_invalid_parameters(self):
+        invalid = [{}, {'lat': 'x', 'lng': 37}, {'lat': 91, 'lng': 37}, {'lat': 55, 'lng': 37, 'open': 'soon'}]
+        for params in invalid:
+            with self.subTest(params=params):
+                self.assertEqual(self.client.get(self.url, params).status_code, 400)
+
+
+@override_settings(MFC_SETTINGS={
+    **settings.MFC_SETTINGS,
+    'SQL_INSTRUMENTATION': {
+        'ENABLED': True,
+        'SAMPLE_RATE': 1.0,
+        'N_PLUS_ONE_THRESHOLD': 3,
+        'SLOW_REQUEST_MS': 10 ** 6,
+        'SERVER_TIMING': True,
+    },
+})
+class QueryInstrumentationTests(IsolatedCacheMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.offices = [make_office(f'МФЦ {number}') for number in range(4)]
+
+    def run_view(self, view):
+        with self.assertLogs('services', 'DEBUG') as logs:
+            response = QueryInstrumentationMiddleware(view)(RequestFactory().get('/offices/'))
+        return response, '\n'.join(logs.output)
+
+    def test_n_plus_one_is_reported(self):
+        def view(request):
+            for office in MFCOffice.objects.all():
+                Employee.objects.filter(office=office).count()
+            return HttpResponse()
+
+        response, log = self.run_view(view)
+        self.assertRegex(response['Server-Timing'], r'^db;dur=[\d.]+;desc="5 queries", app;dur=[\d.]+$')
+        self.assertIn('Possible N+1 in /offices/: query executed 4 times with 4 different parameter sets', log)
+        self.assertNotIn('Duplicate query', log)
+
+    def test_duplicates_are_reported(self):
+        def view(request):
+            for _ in range(2):
+                list(MFCOffice.objects.filter(pk=self.offices[0].pk))
+            return HttpResponse()
+
+        response, log = self.run_view(view)
+        self.assertIn('desc="2 queries"', response['Server-Timing'])
+        self.assertIn('Duplicate query in /offices/ repeated 1 extra times', log)
+        self.assertNotIn('Possible N+1', log)
+
+    def test_async_requests_are_counted(self):
+        async def view(request):
+            await sync_to_async(lambda: list(MFCOffice.objects.all()))()
+            return HttpResponse()
+
+        with self.assertLogs('services', 'DEBUG') as logs:
+            response = async_to_sync(QueryInstrumentationMiddleware(view))(RequestFactory().get('/offices/'))
+        self.assertIn('desc="1 queries"', response['Server-Timing'])
+        self.assertIn('GET /offices/: 1 queries', logs.output[0])
+
+    def test_unsampled_requests_are_not_instrumented(self):
+        config = {**settings.MFC_SETTINGS['SQL_INSTRUMENTATION'], 'SAMPLE_RATE': 0}
+        with override_settings(MFC_SETTINGS={**settings.MFC_SETTINGS, 'SQL_INSTRUMENTATION': config}):
+            response = QueryInstrumentationMiddleware(lambda request: HttpResponse())(RequestFactory().get('/'))
+        self.assertFalse(response.has_header('Server-Timing'))
+
+    def test_executemany_batches_are_fingerprinted_by_rows(self):
+        recorder = QueryRecorder()
+
+        def execute(sql, params, many, context):
+            return None
+
+        sql = 'INSERT INTO t (a, b) VALUES (%s, %s)'
+        recorder(execute, sql, [[1, 'a'], [2, {'b': 1}]], True, None)
+        recorder(execute, sql, [[1, 'a'], [2, {'b': 1}]], True, None)
+        self.assertEqual(recorder.duplicates(), [(sql, 1)])
+        recorder(execute, sql, [[3, 'c']], True, None)
+        self.assertEqual(recorder.repeated_shapes(3), [(sql, 3, 2)])
+
+
+class ExportTests(IsolatedCacheMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user('applicant', first_name='Анна', email='anna@example.com')
+        self.status = ApplicationStatus.objects.create(code=ApplicationStatus.SUBMITTED, name='Подано')
+        self.service = make_service('Паспорт, срочно')
+        now = timezone.now()
+        self.applications = [
+            Application.objects.create(
+                user=self.user, service=self.service, status=self.status, created_at=now - timedelta(days=days),
+            )
+            for days in range(5)
+        ]
+
+    def read_csv(self, text):
+        self.assertTrue(text.startswith('\ufeff'))
+        return list(csv.reader(StringIO(text[1:])))
+
+    def test_streaming_csv_response(self):
+        response = exports.streaming_response('applications', Application.objects.all(), 'csv')
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertRegex(response['Content-Disposition'], r'^attachment; filename="applications-\d{8}-\d{4}\.csv"$')
+        rows = self.read_csv(b''.join(response.streaming_content).decode())
+        self.assertEqual(rows[0], [header for header, field in exports.EXPORTS['applications']['columns']])
+        self.assertEqual([int(row[0]) for row in rows[1:]], [application.pk for application in self.applications])
+        first = dict(zip(rows[0], rows[1]))
+        self.assertEqual(
+            (first['service'], first['status_code'], first['first_name'], first['last_name']),
+            ('Паспорт, срочно', ApplicationStatus.SUBMITTED, 'Анна', ''),
+        )
+        self.assertEqual(first['created_at'], timezone.localtime(self.applications[0].created_at).isoformat())
+
+    def test_rows_are_grouped_into_chunks(self):
+        with mock.patch.object(exports, 'ROWS_PER_CHUNK', 2):
+            chunks = list(exports.iter_csv('applications', Application.objects.all(), chunk_size=2))
+            lines = list(exports.iter_ndjson('applications', Application.objects.all(), chunk_size=2))
+        # Заголовок и пять строк по две в фрагменте
+        self.assertEqual([chunk.count('\r\n') for chunk in chunks], [2, 2, 2])
+        self.assertEqual(len(self.read_csv(''.join(chunks))), 6)
+        self.assertEqual(len(lines), 3)
+        records = [json.loads(line) for line in ''.join(lines).splitlines()]
+        self.assertEqual([record['id'] for record in records], [application.pk for application in self.applications])
+
+    def test_filters(self):
+        day = timezone.localdate() - timedelta(days=1)
+        queryset = exports.filter_queryset('applications', date_from=day, date_to=day)
+        self.assertEqual(list(queryset), [self.applications[1]])
+        self.assertEqual(exports.filter_queryset('applications', status='rejected').count(), 0)
+        with self.assertRaises(exports.ExportError):
+            exports.filter_queryset('applications', office=1)
+
+    def test_command_writes_file(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, 'applications.ndjson')
+        stderr = StringIO()
+        call_command('export_data', 'applications', '--format', 'ndjson', '--output', path, stderr=stderr)
+        self.assertIn(f'Export written to {path}', stderr.getvalue())
+        with open(path, encoding='utf-8') as f:
+            records = [json.loads(line) for line in f]
+        self.assertEqual(len(records), 5)
+        self.assertEqual(records[0]['email'], 'anna@example.com')
+
+        with self.assertRaises(CommandError):
+            call_command('export_data', 'applications', '--date-from', '01.02.2024')
+        with self.assertRaises(CommandError):
+            call_command('export_data', 'applications', '--office', '1')
+
+
+class StaticAssetTests(SimpleTestCase):
+    name = 'app.0123456789ab.css'
+
+    def setUp(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root)
+        for suffix, content in (('', b'body{}'), ('.gz', b'gzip'), ('.br', b'brotli')):
+            with open(os.path.join(root, self.name + suffix), 'wb') as f:
+                f.write(content)
+        self.root = root
+        override = override_settings(STATIC_ROOT=root)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def serve(self, accept_encoding=None, **extra):
+        if accept_encoding is not None:
+            extra['HTTP_ACCEPT_ENCODING'] = accept_encoding
+        request = RequestFactory().get(f'/static/{self.name}', **extra)
+        return assets.serve(request, self.name)
+
+    def assertServed(self, response, encoding, content):
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get('Content-Encoding'), encoding)
+        self.assertEqual(b''.join(response.streaming_content), content)
+        self.assertEqual(response['Content-Type'], 'text/css')
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+        self.assertNotIn('Content-Disposition', response)
+        response.close()
+
+    def test_encoding_selection(self):
+        self.assertServed(self.serve('gzip, deflate, br'), 'br', b'brotli')
+        self.assertServed(self.serve('GZIP'), 'gzip', b'gzip')
+        self.assertServed(self.serve('br;q=0, gzip'), 'gzip', b'gzip')
+        self.assertServed(self.serve('br;q=0.5, gzip'), 'gzip', b'gzip')
+        self.assertServed(self.serve('br;q=0, *'), 'gzip', b'gzip')
+        self.assertServed(self.serve('*'), 'br', b'brotli')
+
+    def test_identity(self):
+        self.assertServed(self.serve(), None, b'body{}')
+        self.assertServed(self.serve('deflate'), None, b'body{}')
+        self.assertServed(self.serve('gzip;q=0, br;q=0'), None, b'body{}')
+        self.assertServed(self.serve('*;q=0, identity'), None, b'body{}')
+        self.assertServed(self.serve('gzip;q=0.5, identity'), None, b'body{}')
+        # «brotli» — не br: подстроки не считаются
+        self.assertServed(self.serve('brotli, xgzip'), None, b'body{}')
+
+    def test_missing_variant(self):
+        os.remove(os.path.join(self.root, self.name + '.br'))
+        self.assertServed(self.serve('br, gzip'), 'gzip', b'gzip')
+
+    def test_cache_headers(self):
+        response = self.serve('gzip')
+        self.assertEqual(response['Cache-Control'], 'public, max-age=%d, immutable' % (
+            settings.MFC_SETTINGS['STATIC_CACHE']['HASHED_MAX_AGE']))
+        not_modified = self.serve('gzip', HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        response.close()
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(not_modified['Vary'], 'Accept-Encoding')
+
+
+class AdminChangelistTests(IsolatedCacheMixin, TestCase):
+    changelists = [
+        'servicecategory', 'service', 'mfcoffice', 'employee', 'applicationstatus', 'application', 'appointment',
+    ]
+
+    def setUp(self):
+        super().setUp()
+        self.admin = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.client.force_login(self.admin)
+        self.status = ApplicationStatus.objects.create(code=ApplicationStatus.SUBMITTED, name='Подано')
+        self.rows = 0
+
+    def add_rows(self, count):
+        for number in range(self.rows, self.rows + count):
+            category = ServiceCategory.objects.create(name=f'Категория {number}')
+            service = make_service(f'Услуга {number}', category=category)
+            office = make_office(f'МФЦ {number}')
+            OfficeService.objects.create(office=office, service=service)
+            author = Employee.objects.create(office=office, full_name=f'Сотрудник {number}', position='specialist')
+            News.objects.create(title=f'Новость {number}', content='', author=author)
+            user = User.objects.create_user(f'user{number}', first_name='Иван')
+            UserProfile.objects.create(user=user, phone='+7', snils=f'000-000-000 {number:02d}')
+            Application.objects.create(user=user, service=service, status=self.status)
+            Appointment.objects.create(user=user, office=office, service=service, appointment_datetime=timezone.now())
+        self.rows += count
+
+    def count_queries(self, url):
+        # Повторный запрос: справочники и ContentType уже в кэше
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(context), response
+
+    def test_query_count_does_not_grow_with_rows(self):
+        urls = [reverse(f'admin:services_{model}_changelist') for model in self.changelists]
+        urls.append(reverse('admin:auth_user_changelist'))
+        self.add_rows(2)
+        before = {url: self.count_queries(url)[0] for url in urls}
+        self.add_rows(8)
+        for url in urls:
+            queries, response = self.count_queries(url)
+            self.assertEqual(queries, before[url], url)
+            changelist = response.context['cl']
+            self.assertEqual(len(changelist.result_list), changelist.model.objects.count(), url)
+
+    def test_count_columns_are_annotated_and_sortable(self):
+        self.add_rows(2)
+        Employee.objects.create(office=MFCOffice.objects.get(name='МФЦ 1'), full_name='Второй', position='operator')
+        url = reverse('admin:services_mfcoffice_changelist')
+        # Колонка employee_count — шестая в list_display
+        _, response = self.count_queries(url + '?o=-6')
+        offices = list(response.context['cl'].result_list)
+        self.assertEqual([(office.name, office.employee_count) for office in offices], [('МФЦ 1', 2), ('МФЦ 0', 1)])
+
+        _, response = self.count_queries(reverse('admin:services_servicecategory_changelist'))
+        self.assertEqual({category.service_count for category in response.context['cl'].result_list}, {1})
+
+
+def last_message(response):
+    """Последнее сообщение админки (без перехода по редиректу они накапливаются)"""
+    return str(list(response.wsgi_request._messages)[-1])
+
+
+class ApplicationAdminTests(IsolatedCacheMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'password'))
+        self.statuses = {
+            code: ApplicationStatus.objects.create(code=code, name=name)
+            for code, name in [
+                (ApplicationStatus.SUBMITTED, 'Подано'),
+                (ApplicationStatus.COMPLETED, 'Выполнено'),
+                (ApplicationStatus.REJECTED, 'Отклонено'),
+            ]
+        }
+        self.documents = ServiceCategory.objects.create(name='Документы')
+        self.passport = make_service('Замена паспорта', category=self.documents)
+        self.benefits = make_service('Пособие', category=ServiceCategory.objects.create(name='Пособия'))
+        self.anna = User.objects.create_user('Anna', email='anna@example.com')
+        self.boris = User.objects.create_user('boris')
+        self.applications = [
+            self.create(self.anna, self.passport, datetime(2024, 3, 15, 12)),
+            self.create(self.anna, self.benefits, datetime(2024, 3, 16, 12)),
+            self.create(self.boris, self.passport, datetime(2024, 4, 1, 12)),
+            self.create(self.boris, self.benefits, datetime(2023, 12, 31, 12)),
+        ]
+        self.url = reverse('admin:services_application_changelist')
+
+    def create(self, user, service, created_at, status=ApplicationStatus.SUBMITTED):
+        return Application.objects.create(
+            user=user, service=service, status=self.statuses[status],
+            created_at=timezone.make_aware(created_at),
+        )
+
+    def changelist(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200)
+        return response.context['cl']
+
+    def filter_choices(self, changelist, parameter_name):
+        # Фильтр без вариантов в changelist не попадает
+        for spec in changelist.filter_specs:
+            if getattr(spec, 'parameter_name', None) == parameter_name:
+                return list(spec.lookup_choices)
+        return []
+
+    def count_queries(self, **params):
+        with CaptureQueriesContext(connection) as context:
+            self.changelist(**params)
+        return [query['sql'] for query in context if 'COUNT(' in query['sql']]
+
+    def test_counts_from_counter_and_cache(self):
+        changelist = self.changelist()
+        self.assertEqual(changelist.result_count, 4)
+        self.assertEqual(self.count_queries(), [])
+
+        status = self.statuses[ApplicationStatus.SUBMITTED].pk
+        self.assertEqual(len(self.count_queries(status__id__exact=status)), 1)
+        # При листании и смене сортировки COUNT(*) берётся из кэша
+        self.assertEqual(self.count_queries(status__id__exact=status, o='-1'), [])
+        self.assertEqual(self.changelist(status__id__exact=status).result_count, 4)
+
+    def test_created_date_drilldown(self):
+        changelist = self.changelist()
+        self.assertEqual(self.filter_choices(changelist, 'created'), [('2024', '2024 год (3)'), ('2023', '2023 год (1)')])
+
+        changelist = self.changelist(created='2024')
+        self.assertEqual(self.filter_choices(changelist, 'created'), [
+            ('2024', '2024 год'), ('2024-03', 'Март (2)'), ('2024-04', 'Апрель (1)'),
+        ])
+        self.assertEqual(changelist.result_count, 3)
+
+        changelist = self.changelist(created='2024-03')
+        self.assertEqual(self.filter_choices(changelist, 'created')[2:], [('2024-03-15', '15 (1)'), ('2024-03-16', '16 (1)')])
+        self.assertEqual(set(changelist.result_list), set(self.applications[:2]))
+        self.assertEqual(list(self.changelist(created='2024-03-16').result_list), [self.applications[1]])
+
+        response = self.client.get(self.url, {'created': '2024-13'})
+        self.assertRedirects(response, self.url + '?e=1', fetch_redirect_response=False)
+
+    def test_search(self):
+        self.assertEqual(set(self.changelist(q='an').result_list), set(self.applications[:2]))
+        self.assertEqual(set(self.changelist(q='BOR').result_list), set(self.applications[2:]))
+        self.assertEqual(set(self.changelist(q='паспорт').result_list), {self.applications[0], self.applications[2]})
+        pk = self.applications[3].pk
+        self.assertEqual(list(self.changelist(q=str(pk)).result_list), [self.applications[3]])
+        self.assertEqual(list(self.changelist(q='nobody').result_list), [])
+
+    def test_service_filter_requires_category(self):
+        self.assertEqual(self.filter_choices(self.changelist(), 'service'), [])
+        changelist = self.changelist(category=self.documents.pk)
+        self.assertEqual(self.filter_choices(changelist, 'service'), [(self.passport.pk, 'Замена паспорта')])
+        self.assertEqual(set(changelist.result_list), {self.applications[0], self.applications[2]})
+        changelist = self.changelist(category=self.documents.pk, service=self.passport.pk)
+        self.assertEqual(set(changelist.result_list), {self.applications[0], self.applications[2]})
+
+    def run_action(self, action, objects):
+        return self.client.post(self.url, {'action': action, '_selected_action': [obj.pk for obj in objects]})
+
+    def test_status_actions_enqueue_notifications(self):
+        self.applications[1].status = self.statuses[ApplicationStatus.COMPLETED]
+        self.applications[1].save()
+        BackgroundTask.objects.all().delete()
+
+        response = self.run_action('mark_as_completed', self.applications[:3])
+        self.assertRedirects(response, self.url, fetch_redirect_response=False)
+        self.assertEqual(last_message(response), '2 заявлений помечено как выполненные.')
+        statuses = dict(Application.objects.values_list('id', 'status__code'))
+        self.assertEqual([statuses[application.pk] for application in self.applications], [
+            ApplicationStatus.COMPLETED, ApplicationStatus.COMPLETED,
+            ApplicationStatus.COMPLETED, ApplicationStatus.SUBMITTED,
+        ])
+        # Уведомление только тем, у кого статус изменился и есть email
+        self.assertEqual(
+            [(task.payload['to'], task.payload['body']) for task in BackgroundTask.objects.all()],
+            [('anna@example.com', 'Заявление: Замена паспорта\nНовый статус: Выполнено\n')],
+        )
+
+        response = self.run_action('mark_as_rejected', self.applications[1:])
+        self.assertEqual(last_message(response), '3 заявлений помечено как отклоненные.')
+        self.assertEqual(Application.objects.filter(status__code=ApplicationStatus.REJECTED).count(), 3)
+        self.assertEqual(BackgroundTask.objects.count(), 2)
+
+    def test_export_actions(self):
+        response = self.run_action('export_csv', self.applications[:2])
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertTrue(response['Content-Disposition'].startswith('attachment; filename="applications-'))
+        text = b''.join(response.streaming_content).decode('utf-8')
+        self.assertTrue(text.startswith('\ufeff'))
+        rows = list(csv.DictReader(StringIO(text[1:])))
+        self.assertEqual([int(row['id']) for row in rows], [application.pk for application in self.applications[:2]])
+        self.assertEqual({row['username'] for row in rows}, {'Anna'})
+
+        response = self.run_action('export_ndjson', self.applications[2:])
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson; charset=utf-8')
+        records = [json.loads(line) for line in b''.join(response.streaming_content).decode('utf-8').splitlines()]
+        self.assertEqual({record['id'] for record in records}, {application.pk for application in self.applications[2:]})
+
+
+class AppointmentAdminTests(IsolatedCacheMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'password'))
+        user = User.objects.create_user('anna', first_name='Анна')
+        office = make_office('МФЦ Центральный')
+        service = make_service('Замена паспорта')
+        self.appointments = [
+            Appointment.objects.create(
+                user=user, office=office, service=service,
+                appointment_datetime=timezone.now() + timedelta(days=day),
+            )
+            for day in range(3)
+        ]
+        self.url = reverse('admin:services_appointment_changelist')
+
+    def run_action(self, action, objects):
+        return self.client.post(self.url, {'action': action, '_selected_action': [obj.pk for obj in objects]})
+
+    def statuses(self):
+        return list(Appointment.objects.order_by('appointment_datetime').values_list('status', flat=True))
+
+    def test_status_actions(self):
+        response = self.run_action('mark_as_completed', self.appointments[:1])
+        self.assertRedirects(response, self.url, fetch_redirect_response=False)
+        self.assertEqual(last_message(response), '1 записей помечено как выполненные.')
+        response = self.run_action('cancel_appointments', self.appointments[1:])
+        self.assertEqual(last_message(response), '2 записей отменено.')
+        self.assertEqual(self.statuses(), ['completed', 'cancelled', 'cancelled'])
+
+    def test_export_actions(self):
+        response = self.run_action('export_csv', self.appointments)
+        self.assertTrue(response['Content-Disposition'].startswith('attachment; filename="appointments-'))
+        text = b''.join(response.streaming_content).decode('utf-8')
+        rows = list(csv.DictReader(StringIO(text[1:])))
+        self.assertEqual([int(row['id']) for row in rows], [appointment.pk for appointment in self.appointments])
+        self.assertEqual({row['office'] for row in rows}, {'МФЦ Центральный'})
+
+        response = self.run_action('export_ndjson', self.appointments[:1])
+        records = [json.loads(line) for line in b''.join(response.streaming_content).decode('utf-8').splitlines()]
+        self.assertEqual([(record['id'], record['first_name']) for record in records], [(self.appointments[0].pk, 'Анна')])
+
+
+@override_settings(ROOT_URLCONF='MFC.asgi_urls')
+class AsyncViewTests(IsolatedCacheMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        # AsyncClient отправляет request_started в другом потоке, а значит
+        # через другое соединение, которому не видны данные теста
+        request_started.disconnect(reference.warm_up, dispatch_uid='reference_warm_up')
+        self.office = make_office('МФЦ Центральный')
+        self.service = make_service('Замена паспорта', description='Паспорт гражданина РФ', cost=Decimal('300'))
+        OfficeService.objects.create(office=self.office, service=self.service)
+        author = Employee.objects.create(office=self.office, full_name='Иванов И. И.', position='manager')
+        self.news = News.objects.create(title='График работы в праздники', content='Офисы работают', author=author)
+
+    def test_routes_use_async_views(self):
+        for name, view in async_urls.ASYNC_VIEWS.items():
+            pattern = next(pattern for pattern in async_urls.urlpatterns if pattern.name == name)
+            self.assertIs(pattern.callback, view)
+        # Остальные маршруты остаются синхронными
+        pattern = next(pattern for pattern in async_urls.urlpatterns if pattern.name == 'office_list')
+        self.assertIs(pattern.callback, views.office_list)
+
+    async def test_pages(self):
+        response = await self.async_client.get(reverse('services:home'))
+        self.assertContains(response, 'График работы в праздники')
+        self.assertContains(response, 'Всего услуг в системе: 1')
+
+        response = await self.async_client.get(reverse('services:service_detail', args=[self.service.pk]))
+        self.assertContains(response, 'Замена паспорта')
+        self.assertEqual(response.context['offices_with_service'], [self.office])
+
+        response = await self.async_client.get(reverse('services:news_detail', args=[self.news.pk]))
+        self.assertContains(response, 'Офисы работают')
+        response = await self.async_client.get(reverse('services:news_list'))
+        self.assertEqual(list(response.context['news_list']), [self.news])
+        response = await self.async_client.get(reverse('services:service_list'), {'q': 'Замена'})
+        self.assertEqual(list(response.context['services']), [self.service])
+
+        response = await self.async_client.get(reverse('services:search'), {'q': 'Паспорт'})
+        self.assertEqual(response.context['results']['ranked'], [('service', self.service)])
+
+    async def test_json_payloads(self):
+        response = await self.async_client.get(reverse('services:service_catalog'))
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['total'], 1)
+        self.assertEqual(data['services'], [{
+            'id': self.service.pk,
+            'name': 'Замена паспорта',
+            'category': 'Документы',
+            'cost': '300.00',
+            'execution_term': '5 дней',
+            'url': reverse('services:service_detail', args=[self.service.pk]),
+        }])
+
+        response = await self.async_client.get(reverse('services:search_suggestions'), {'q': 'зам'})
+        self.assertEqual(response.json(), {'suggestions': ['Замена паспорта']})
+
+    async def test_conditional_get(self):
+        url = reverse('services:service_catalog')
+        response = await self.async_client.get(url)
+        etag = response['ETag']
+        response = await self.async_client.get(url, headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+
+        await sync_to_async(make_service)('Выдача справки')
+        response = await self.async_client.get(url, headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['total'], 2)
+
+    async def test_error_paths(self):
+        response = await self.async_client.get(reverse('services:service_catalog'), {'cost': 'дорого'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('error', response.json())
+
+        with mock.patch.object(suggestions, 'suggest', side_effect=RuntimeError('сбой')), \
+                self.assertLogs('services', 'ERROR'):
+            response = await self.async_client.get(reverse('services:search_suggestions'), {'q': 'зам'})
+        self.assertEqual(response.json(), {'suggestions': []})
+
+        with mock.patch.object(widgets, 'alatest_news', side_effect=RuntimeError('сбой')):
+            response = await self.async_client.get(reverse('services:home'))
+        self.assertContains(response, 'Ошибка при загрузке главной страницы: сбой')
+
+        # Отсутствующий объект — Http404 для обработчика handler404
+        request = AsyncRequestFactory().get('/')
+        request.user = AnonymousUser()
+        with self.assertRaises(Http404):
+            await async_views.service_detail(request, service_id=self.service.pk + 1)
+        with self.assertRaises(Http404):
+            await async_views.news_detail(request, news_id=self.news.pk + 1)
@@ -6,17 +6,25 @@ app_name = 'services'
 urlpatterns = [
     path('', views.home, name='home'),
     path('services/', views.service_list, name='service_list'),
+    path('services/catalog/', views.service_catalog, name='service_catalog'),
     path('services/<int:service_id>/', views.service_detail, name='service_detail'),
+    path('services/<int:service_id>/offices/', views.service_offices, name='service_offices'),
     path('offices/', views.office_list, name='office_list'),
+    path('offices/<int:office_id>/services/', views.office_services, name='office_services'),
+    path('offices/nearest/', views.nearest_offices, name='nearest_offices'),
+    path('offices/<int:office_id>/slots/', views.office_slots, name='office_slots'),
     path('news/', views.news_list, name='news_list'),
     path('news/<int:news_id>/', views.news_detail, name='news_detail'),
     path('applications/', views.application_list, name='application_list'),
     path('applications/create/', views.application_create, name='application_create'),
+    path('applications/data-fields/', views.application_data_fields, name='application_data_fields'),
     path('applications/<int:application_id>/', views.application_detail, name='application_detail'),
     path('applications/<int:application_id>/update/', views.application_update, name='application_update'),
     path('applications/<int:application_id>/delete/', views.application_delete, name='application_delete'),
     path('search/', views.search, name='search'),
     path('search/suggestions/', views.search_suggestions, name='search_suggestions'),
+    path('choices/services/', views.service_choices, name='service_choices'),
+    path('choices/offices/', views.office_choices, name='office_choices'),
     path('appointments/', views.appointment_list, name='appointment_list'),
     path('appointments/create/', views.appointment_create, name='appointment_create'),
     path('appointments/<int:appointment_id>/update/', views.appointment_update, name='appointment_update'),
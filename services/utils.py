@@ -1,25 +1,32 @@
-from django.core.mail import send_mail
-from django.conf import settings
+from django.template.defaultfilters import date as format_date
+from django.utils import timezone
+
+from . import tasks
+
 
 def send_appointment_notification(appointment):
-    """Логирование уведомления о записи на прием (без реальной отправки)"""
-    print("=" * 50)
-    print("📧 EMAIL УВЕДОМЛЕНИЕ (в реальном проекте было бы отправлено)")
-    print(f"Кому: {appointment.user.email}")
-    print(f"Тема: Запись на прием в МФЦ подтверждена")
-    print(f"Услуга: {appointment.service.name}")
-    print(f"Офис: {appointment.office.name}") 
-    print(f"Время: {appointment.appointment_datetime}")
-    print("=" * 50)
-    return True  # Всегда возвращаем успех для разработки
+    """Постановка в очередь уведомления о записи на прием"""
+    if not appointment.user.email:
+        return None
+    body = (
+        f"Услуга: {appointment.service.name}\n"
+        f"Офис: {appointment.office.name}\n"
+        f"Адрес: {appointment.office.address}\n"
+        f"Время: {format_date(timezone.localtime(appointment.appointment_datetime), 'd.m.Y H:i')}\n"
+    )
+    return tasks.enqueue_email(
+        appointment.user.email, "Запись на прием в МФЦ подтверждена", body
+    )
+
 
 def send_application_status_notification(application):
-    """Логирование изменения статуса заявления"""
-    print("=" * 50)
-    print("📧 EMAIL УВЕДОМЛЕНИЕ (в реальном проекте было бы отправлено)")
-    print(f"Кому: {application.user.email}")
-    print(f"Тема: Статус заявления изменен")
-    print(f"Заявление: {application.service.name}")
-    print(f"Новый статус: {application.status.name}")
-    print("=" * 50)
-    return True
\ No newline at end of file
+    """Постановка в очередь уведомления об изменении статуса заявления"""
+    if not application.user.email:
+        return None
+    body = (
+        f"Заявление: {application.service.name}\n"
+        f"Новый статус: {application.status.name}\n"
+    )
+    return tasks.enqueue_email(
+        application.user.email, "Статус заявления изменен", body
+    )
@@ -1,14 +1,31 @@
 from django.shortcuts import render, get_object_or_404, redirect
-from django.db.models import Q, Count, Avg
+from django.db.models import Q
 from django.utils import timezone
 from django.contrib.auth.decorators import login_required
 from django.http import HttpResponse, Http404, JsonResponse
-from django.core.paginator import Paginator
 from .models import *
 from .forms import ApplicationForm, AppointmentForm
 from django.contrib import messages
-from django.views.decorators.cache import cache_page
 from .utils import send_appointment_notification
+from .pagination import paginate
+from .conditional import conditional_page
+from . import availability, catalog, choices, db, geo, slots
+from datetime import date, timedelta
+from . import search as search_index
+from . import suggestions
+from . import reference
+from . import widgets
+from django.conf import settings
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Тип документа поискового индекса -> ключ в словаре результатов
+SEARCH_RESULT_GROUPS = {
+    'service': 'services',
+    'office': 'offices',
+    'news': 'news',
+}
 
 def custom_404(request, exception):
     return render(request, 'services/404.html', status=404)
@@ -16,36 +33,15 @@ def custom_404(request, exception):
 def custom_500(request):
     return render(request, 'services/500.html', status=500)
 
-# @cache_page(60 * 15)
 def home(request):
     """Главная страница с виджетами"""
     try:
-        # Виджет 1: Последние новости
-        latest_news = News.objects.select_related('author').order_by('-published_at')[:5]
-        
-        # Виджет 2: Популярные услуги (по количеству заявлений)
-        popular_services = Service.objects.annotate(
-            application_count=Count('application')
-        ).order_by('-application_count')[:5]
-        
-        # Виджет 3: Офисы МФЦ
-        offices = MFCOffice.objects.annotate(
-            service_count=Count('officeservice')
-        ).order_by('?')[:5]
-        
-        # Виджет 4: Статистика (агрегатные функции)
-        stats = {
-            'total_services': Service.objects.count(),
-            'total_offices': MFCOffice.objects.count(),
-            'total_applications': Application.objects.count(),
-            'avg_service_cost': Service.objects.aggregate(avg_cost=Avg('cost'))['avg_cost'] or 0,
-        }
-        
+        # Каждый виджет кэшируется отдельно и сбрасывается при изменении своих данных
         context = {
-            'latest_news': latest_news,
-            'popular_services': popular_services,
-            'offices': offices,
-            'stats': stats,
+            'latest_news': widgets.latest_news(),
+            'popular_services': widgets.popular_services(),
+            'offices': widgets.random_offices(),
+            'stats': widgets.site_stats(),
         }
         return render(request, 'services/home.html', context)
     except Exception as e:
@@ -56,12 +52,15 @@ def home(request):
 def appointment_list(request):
     """Список записей на прием пользователя"""
     try:
-        appointments = Appointment.objects.filter(
-            user=request.user
-        ).select_related('office', 'service').order_by('appointment_datetime')
+        appointments = paginate(
+            request,
+            Appointment.objects.filter(user=request.user).select_related('office', 'service'),
+            ordering=('appointment_datetime', 'id'),
+        )
         
         context = {
             'appointments': appointments,
+            'page': appointments,
         }
         return render(request, 'services/appointment_list.html', context)
     except Exception as e:
@@ -76,16 +75,18 @@ def appointment_create(request):
             if form.is_valid():
                 appointment = form.save(commit=False)
                 appointment.user = request.user
-                appointment.save()
-                
-                # Логируем "отправку" email
-                send_appointment_notification(appointment)
-                messages.success(request, 'Запись на прием успешно создана! В реальной системе вам было бы отправлено email-уведомление.')
+                try:
+                    slots.book_appointment(appointment)
+                except slots.SlotUnavailable as e:
+                    form.add_error('appointment_datetime', str(e))
+                else:
+                    # Письмо отправит обработчик очереди задач
+                    send_appointment_notification(appointment)
+                    messages.success(request, 'Запись на прием успешно создана! Подтверждение будет отправлено на ваш email.')
                     
-                return redirect('services:appointment_list')
-            else:
-                context = {'form': form}
-                return render(request, 'services/appointment_form.html', context)
+                    return redirect('services:appointment_list')
+            context = {'form': form}
+            return render(request, 'services/appointment_form.html', context)
         else:
             form = AppointmentForm()
             context = {'form': form}
@@ -106,15 +107,21 @@ def appointment_update(request, appointment_id):
         if request.method == 'POST':
             form = AppointmentForm(request.POST, instance=appointment)
             if form.is_valid():
-                form.save()
-                messages.success(request, 'Запись на прием успешно обновлена!')
-                return redirect('services:appointment_list')
-            else:
-                context = {
-                    'form': form,
-                    'appointment': appointment,
-                }
-                return render(request, 'services/appointment_form.html', context)
+                try:
+                    if form.slot_changed:
+                        slots.book_appointment(form.save(commit=False))
+                    else:
+                        db.save_atomic(form.save(commit=False))
+                except slots.SlotUnavailable as e:
+                    form.add_error('appointment_datetime', str(e))
+                else:
+                    messages.success(request, 'Запись на прием успешно обновлена!')
+                    return redirect('services:appointment_list')
+            context = {
+                'form': form,
+                'appointment': appointment,
+            }
+            return render(request, 'services/appointment_form.html', context)
         else:
             form = AppointmentForm(instance=appointment)
             context = {
@@ -125,6 +132,107 @@ def appointment_update(request, appointment_id):
     except Exception as e:
         return HttpResponse(f"Ошибка при обновлении записи: {e}")
 
+def office_slots(request, office_id):
+    """API свободных слотов записи в офис: ?service=&date_from=ГГГГ-ММ-ДД&days=7"""
+    office = get_object_or_404(MFCOffice, id=office_id)
+    try:
+        date_from = date.fromisoformat(request.GET['date_from']) if request.GET.get('date_from') else timezone.localdate()
+        days = min(max(int(request.GET.get('days', 7)), 1), slots.MAX_RANGE_DAYS)
+        service_id = int(request.GET['service']) if request.GET.get('service') else None
+    except ValueError:
+        return JsonResponse({'error': 'Некорректные параметры запроса'}, status=400)
+
+    service = get_object_or_404(Service, id=service_id) if service_id else None
+    free_slots = slots.available_slots(
+        office, date_from, date_from + timedelta(days=days - 1), service=service
+    )
+    return JsonResponse({
+        'office': office.id,
+        'slot_minutes': office.slot_minutes,
+        'slots': [
+            {'start': timezone.localtime(slot['start']).isoformat(), 'free': slot['free']}
+            for slot in free_slots
+        ],
+    })
+
+@conditional_page('services', 'offices')
+def service_offices(request, service_id):
+    """API офисов, где оказывается услуга"""
+    try:
+        service = reference.get('services', service_id)
+    except KeyError:
+        raise Http404(f'Услуга {service_id} не найдена')
+    return JsonResponse({
+        'service': service.id,
+        'offices': [
+            {'id': office.id, 'name': office.name, 'address': office.address}
+            for office in availability.offices_for(service)
+        ],
+    })
+
+@conditional_page('services', 'offices')
+def office_services(request, office_id):
+    """API услуг, оказываемых в офисе"""
+    try:
+        office = reference.get('offices', office_id)
+    except KeyError:
+        raise Http404(f'Офис {office_id} не найден')
+    return JsonResponse({
+        'office': office.id,
+        'services': [
+            {'id': service.id, 'name': service.name, 'category': service.category.name}
+            for service in availability.services_at(office)
+        ],
+    })
+
+def service_choices(request):
+    """API вариантов услуги для форм: ?office=&q=&offset="""
+    try:
+        return JsonResponse(choices.service_page(request.GET))
+    except choices.InvalidParameter:
+        return JsonResponse({'error': 'Некорректные параметры запроса'}, status=400)
+
+def office_choices(request):
+    """API вариантов офиса для форм: ?service=&q=&offset="""
+    try:
+        return JsonResponse(choices.office_page(request.GET))
+    except choices.InvalidParameter:
+        return JsonResponse({'error': 'Некорректные параметры запроса'}, status=400)
+
+def nearest_offices(request):
+    """API ближайших офисов: ?lat=&lng=&service=&open=today|now&limit=&max_km="""
+    geo_settings = settings.MFC_SETTINGS['GEO']
+    try:
+        lat = float(request.GET['lat'])
+        lng = float(request.GET['lng'])
+        if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+            raise ValueError
+        limit = min(max(int(request.GET.get('limit', geo_settings['NEAREST_LIMIT'])), 1), geo_settings['NEAREST_MAX_LIMIT'])
+        max_km = float(request.GET['max_km']) if request.GET.get('max_km') else None
+        service_id = int(request.GET['service']) if request.GET.get('service') else None
+        open_filter = request.GET.get('open') or None
+        if open_filter not in (None, 'today', 'now'):
+            raise ValueError
+    except (KeyError, ValueError):
+        return JsonResponse({'error': 'Некорректные параметры запроса'}, status=400)
+
+    now = timezone.localtime()
+    found = geo.nearest_offices(lat, lng, limit, service=service_id, open_filter=open_filter, max_km=max_km)
+    offices = []
+    for distance, office in found:
+        hours = geo.hours_today(office, now)
+        offices.append({
+            'id': office.id,
+            'name': office.name,
+            'address': office.address,
+            'latitude': office.latitude,
+            'longitude': office.longitude,
+            'distance_km': round(distance, 2),
+            'hours_today': f'{hours[0]:%H:%M}-{hours[1]:%H:%M}' if hours else None,
+            'open_now': geo.is_open(office, now),
+        })
+    return JsonResponse({'offices': offices})
+
 @login_required
 def appointment_delete(request, appointment_id):
     """Удаление записи на прием"""
@@ -151,17 +259,24 @@ def application_create(request):
             application = form.save(commit=False)
             application.user = request.user
             # Устанавливаем начальный статус "Подано"
-            initial_status = ApplicationStatus.objects.get(name='Подано')
-            application.status = initial_status
-            application.save()
+            application.status = reference.status(ApplicationStatus.SUBMITTED)
+            # Заявление и счётчики статистики сохраняются в одной транзакции
+            db.save_atomic(application)
             messages.success(request, 'Заявление успешно подано!')
             return redirect('services:application_list')
     else:
-        form = ApplicationForm()
+        # ?service= выбирает услугу, поля данных которой показать
+        form = ApplicationForm(initial={'service': request.GET.get('service')})
     
     context = {'form': form}
     return render(request, 'services/application_form.html', context)
 
+@login_required
+def application_data_fields(request):
+    """Поля данных заявления для услуги ?service= (фрагмент формы)"""
+    form = ApplicationForm(initial={'service': request.GET.get('service')})
+    return render(request, 'services/includes/application_data_fields.html', {'form': form})
+
 @login_required
 def application_update(request, application_id):
     """Редактирование заявления"""
@@ -174,11 +289,12 @@ def application_update(request, application_id):
     if request.method == 'POST':
         form = ApplicationForm(request.POST, instance=application)
         if form.is_valid():
-            form.save()
+            db.save_atomic(form.save(commit=False))
             messages.success(request, 'Заявление успешно обновлено!')
             return redirect('services:application_list')
     else:
-        form = ApplicationForm(instance=application)
+        initial = {'service': request.GET['service']} if 'service' in request.GET else None
+        form = ApplicationForm(instance=application, initial=initial)
     
     context = {
         'form': form,
@@ -222,47 +338,39 @@ def application_detail(request, application_id):
 
 
 
+@conditional_page('services')
 def service_list(request):
-    """Список всех услуг"""
+    """Список услуг с фильтрами по категории и стоимости"""
     try:
-        print("=== SERVICE LIST DEBUG ===")
-        print("GET parameters:", dict(request.GET))
-        
-        # Получаем все услуги
-        services = Service.objects.select_related('category').all()
-        
-        # Поиск
-        query = request.GET.get('q', '')
-        print("Search query:", query)
-        
-        if query:
-            services = services.filter(
-                Q(name__icontains=query) | 
-                Q(description__icontains=query)
-            )
-            print("Filtered services count:", services.count())
-        
-        # Фильтрация по категории
-        category_id = request.GET.get('category')
-        print("Category ID:", category_id)
-        if category_id:
-            services = services.filter(category_id=category_id)
-        
-        categories = ServiceCategory.objects.all()
-        
+        try:
+            query, category_id, cost = catalog.parse_filters(request.GET)
+        except catalog.InvalidFilter:
+            query, category_id, cost = request.GET.get('q', '').strip(), None, None
+        services, facets = catalog.catalog_page(request, query, category_id, cost)
+
         context = {
             'services': services,
-            'categories': categories,
+            'page': services,
+            'facets': facets,
             'query': query,
             'selected_category': category_id,
+            'selected_cost': cost,
         }
-        
         return render(request, 'services/service_list.html', context)
-        
     except Exception as e:
-        print(f"Error in service_list: {e}")
+        logger.exception("Error in service_list: %s", e)
         return HttpResponse(f"Ошибка при загрузке услуг: {e}")
 
+@conditional_page('services')
+def service_catalog(request):
+    """API каталога услуг: ?q=&category=&cost=&after= — страница, общее число и счётчики фасетов"""
+    try:
+        query, category_id, cost = catalog.parse_filters(request.GET)
+    except catalog.InvalidFilter:
+        return JsonResponse({'error': 'Некорректные параметры запроса'}, status=400)
+    return JsonResponse(catalog.as_json(*catalog.catalog_page(request, query, category_id, cost)))
+
+@conditional_page('services', 'offices')
 def service_detail(request, service_id):
     """Детальная страница услуги"""
     try:
@@ -272,9 +380,7 @@ def service_detail(request, service_id):
         )
         
         # Офисы, где предоставляется эта услуга
-        offices_with_service = MFCOffice.objects.filter(
-            officeservice__service=service
-        ).distinct()
+        offices_with_service = availability.offices_for(service)
         
         context = {
             'service': service,
@@ -284,45 +390,50 @@ def service_detail(request, service_id):
     except Exception as e:
         return HttpResponse(f"Ошибка при загрузке услуги: {e}")
 
+@conditional_page('offices')
 def office_list(request):
     """Список офисов МФЦ"""
     try:
-        print("=== OFFICE LIST DEBUG ===")
-        print("GET parameters:", dict(request.GET))
-        
         offices = MFCOffice.objects.all()
         
         # Поиск
         query = request.GET.get('q', '')
-        print("Search query:", query)
-        
         if query:
             offices = offices.filter(
                 Q(name__icontains=query) | 
                 Q(address__icontains=query)
             )
-            print("Filtered offices count:", offices.count())
+        
+        offices = paginate(request, offices, ordering=('name', 'id'))
         
         context = {
             'offices': offices,
+            'page': offices,
             'query': query,
         }
         return render(request, 'services/office_list.html', context)
     except Exception as e:
         return HttpResponse(f"Ошибка при загрузке офисов: {e}")
 
+@conditional_page('news', 'offices')
 def news_list(request):
     """Список новостей"""
     try:
-        news_list = News.objects.select_related('author').all()
+        news_list = paginate(
+            request,
+            News.objects.select_related('author', 'author__office'),
+            ordering=('-published_at', 'id'),
+        )
         
         context = {
             'news_list': news_list,
+            'page': news_list,
         }
         return render(request, 'services/news_list.html', context)
     except Exception as e:
         return HttpResponse(f"Ошибка при загрузке новостей: {e}")
 
+@conditional_page('news', 'offices')
 def news_detail(request, news_id):
     """Детальная страница новости"""
     try:
@@ -346,12 +457,15 @@ def news_detail(request, news_id):
 def application_list(request):
     """Список заявлений пользователя"""
     try:
-        applications = Application.objects.filter(
-            user=request.user
-        ).select_related('service', 'status')
+        applications = paginate(
+            request,
+            Application.objects.filter(user=request.user).select_related('service', 'status'),
+            ordering=('-created_at', '-id'),
+        )
         
         context = {
             'applications': applications,
+            'page': applications,
         }
         return render(request, 'services/application_list.html', context)
     except Exception as e:
@@ -381,29 +495,30 @@ def search(request):
         results = {}
         
         if query:
-            # Поиск по услугам
-            services = Service.objects.filter(
-                Q(name__icontains=query) |
-                Q(description__icontains=query)
-            ).select_related('category')[:10]
-            
-            # Поиск по офисам
-            offices = MFCOffice.objects.filter(
-                Q(name__icontains=query) |
-                Q(address__icontains=query)
-            )[:10]
-            
-            # Поиск по новостям
-            news = News.objects.filter(
-                Q(title__icontains=query) |
-                Q(content__icontains=query)
-            ).select_related('author')[:10]
-            
-            results = {
-                'services': services,
-                'offices': offices,
-                'news': news,
-            }
+            if search_index.is_available():
+                # Один запрос к полнотекстовому индексу, результаты упорядочены по релевантности
+                hits = search_index.search(
+                    query, limit=settings.MFC_SETTINGS['SEARCH_RESULTS_LIMIT']
+                )
+                results = {'services': [], 'offices': [], 'news': []}
+                for doc_type, obj in hits:
+                    results[SEARCH_RESULT_GROUPS[doc_type]].append(obj)
+                results['ranked'] = hits
+            else:
+                results = {
+                    'services': Service.objects.filter(
+                        Q(name__icontains=query) |
+                        Q(description__icontains=query)
+                    ).select_related('category')[:10],
+                    'offices': MFCOffice.objects.filter(
+                        Q(name__icontains=query) |
+                        Q(address__icontains=query)
+                    )[:10],
+                    'news': News.objects.filter(
+                        Q(title__icontains=query) |
+                        Q(content__icontains=query)
+                    ).select_related('author')[:10],
+                }
         
         context = {
             'query': query,
@@ -417,62 +532,9 @@ def search_suggestions(request):
     """API для подсказок поиска"""
     try:
         query = request.GET.get('q', '')
-        suggestions = []
-        
-        print(f"Search suggestions request: {query}")
-        
-        if len(query) >= 2:
-            # Поиск услуг для подсказок
-            services = Service.objects.filter(
-                Q(name__icontains=query)
-            )[:5]
-            
-            for service in services:
-                suggestions.append({
-                    'text': service.name,
-                    'type': 'service'
-                })
-            
-            # Поиск офисов для подсказок
-            offices = MFCOffice.objects.filter(
-                Q(name__icontains=query) |
-                Q(address__icontains=query)
-            )[:3]
-            
-            for office in offices:
-                suggestions.append({
-                    'text': office.name,
-                    'type': 'office'
-                })
-            
-            # Добавляем популярные запросы, если мало результатов
-            if len(suggestions) < 3:
-                popular_suggestions = [
-                    {'text': 'паспорт', 'type': 'popular'},
-                    {'text': 'загранпаспорт', 'type': 'popular'},
-                    {'text': 'регистрация', 'type': 'popular'},
-                    {'text': 'налоговый вычет', 'type': 'popular'},
-                    {'text': 'пособие', 'type': 'popular'},
-                ]
-                
-                for pop in popular_suggestions:
-                    if query.lower() in pop['text'].lower() and len(suggestions) < 8:
-                        suggestions.append(pop)
-                        
-        # Убираем дубликаты по тексту
-        seen = set()
-        unique_suggestions = []
-        for s in suggestions:
-            if s['text'] not in seen:
-                seen.add(s['text'])
-                unique_suggestions.append(s)
-        
-        unique_suggestions = unique_suggestions[:8]
-        print(f"Returning suggestions: {unique_suggestions}")
-        
-        return JsonResponse({'suggestions': [s['text'] for s in unique_suggestions]})
+        return JsonResponse({'suggestions': suggestions.suggest(query)})
     except Exception as e:
-        print(f"Error in search_suggestions: {e}")
+        logger.exception("Error in search_suggestions: %s", e)
         return JsonResponse({'suggestions': []})
 
 # Обработка 404 ошибки
@@ -0,0 +1,85 @@
+"""Виджеты главной страницы.
+
+Каждый виджет кэшируется отдельно и зависит только от версий тех
+данных, которые он показывает (см. services/caching.py). Асинхронные
+варианты (с префиксом ``a``) используют те же ключи кэша, что и
+синхронные, и нужны асинхронной главной странице (services/async_views.py).
+"""
+import random
+
+from asgiref.sync import sync_to_async
+from django.db.models import Count
+
+from . import stats
+from .caching import aget_or_compute, get_or_compute
+from .models import News, Service, MFCOffice
+
+LATEST_NEWS_LIMIT = 5
+POPULAR_SERVICES_LIMIT = 5
+RANDOM_OFFICES_LIMIT = 5
+
+
+async def alist(queryset):
+    return [obj async for obj in queryset]
+
+
+def _latest_news_queryset():
+    return News.objects.select_related('author').order_by('-published_at')[:LATEST_NEWS_LIMIT]
+
+
+def _popular_services_queryset():
+    return Service.objects.select_related('category').annotate(
+        application_count=Count('application')
+    ).order_by('-application_count')[:POPULAR_SERVICES_LIMIT]
+
+
+def _offices_queryset():
+    return MFCOffice.objects.annotate(service_count=Count('officeservice')).order_by('id')
+
+
+def _sample_offices(offices):
+    return random.sample(offices, min(RANDOM_OFFICES_LIMIT, len(offices)))
+
+
+def latest_news():
+    """Последние новости"""
+    return get_or_compute('widget:latest_news', ['news'], lambda: list(_latest_news_queryset()))
+
+
+def popular_services():
+    """Популярные услуги (по количеству заявлений)"""
+    return get_or_compute(
+        'widget:popular_services', ['services', 'applications'],
+        lambda: list(_popular_services_queryset())
+    )
+
+
+def random_offices():
+    """Случайные офисы МФЦ: выборка из закэшированного списка вместо ORDER BY RANDOM()"""
+    return _sample_offices(get_or_compute('widget:offices', ['offices'], lambda: list(_offices_queryset())))
+
+
+def site_stats():
+    """Статистика системы (из инкрементальных счётчиков, см. services/stats.py)"""
+    return get_or_compute('widget:stats', ['services', 'offices', 'applications'], stats.site_stats)
+
+
+async def alatest_news():
+    return await aget_or_compute('widget:latest_news', ['news'], lambda: alist(_latest_news_queryset()))
+
+
+async def apopular_services():
+    return await aget_or_compute(
+        'widget:popular_services', ['services', 'applications'],
+        lambda: alist(_popular_services_queryset())
+    )
+
+
+async def arandom_offices():
+    return _sample_offices(await aget_or_compute('widget:offices', ['offices'], lambda: alist(_offices_queryset())))
+
+
+async def asite_stats():
+    return await aget_or_compute(
+        'widget:stats', ['services', 'offices', 'applications'], sync_to_async(stats.site_stats)
+    )
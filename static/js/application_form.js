@@ -0,0 +1,39 @@
+// Поля данных заявления зависят от услуги: при выборе услуги заменяются
+// только они, введённые значения остальных полей не теряются
+var dataFields = document.getElementById('application-data-fields');
+// Введённые значения по имени поля: поле с тем же именем в схеме другой
+// услуги получает прежнее значение, в том числе при возврате к услуге
+var typedValues = {};
+
+function rememberValues() {
+    dataFields.querySelectorAll('input, select, textarea').forEach(function (input) {
+        typedValues[input.name] = input.type === 'checkbox' ? input.checked : input.value;
+    });
+}
+
+function restoreValues() {
+    dataFields.querySelectorAll('input, select, textarea').forEach(function (input) {
+        if (!(input.name in typedValues)) {
+            return;
+        }
+        if (input.type === 'checkbox') {
+            input.checked = typedValues[input.name];
+        } else {
+            input.value = typedValues[input.name];
+        }
+    });
+}
+
+document.querySelector('form [name="service"]').addEventListener('change', function () {
+    rememberValues();
+    var params = new URLSearchParams({service: this.value});
+    fetch(dataFields.dataset.url + '?' + params.toString())
+        .then(function (response) { return response.text(); })
+        .then(function (html) {
+            dataFields.innerHTML = html;
+            restoreValues();
+        })
+        .catch(function (error) {
+            console.error('Error:', error);
+        });
+});
@@ -0,0 +1,75 @@
+// Списки выбора с подгрузкой (services.forms.LazySelect): страница выводит
+// только выбранный вариант, остальные запрашиваются при открытии и поиске
+document.querySelectorAll('select[data-choices-url]').forEach(function (select) {
+    var form = select.closest('form');
+    var dependsOn = select.dataset.dependsOn ? form.querySelector('[name="' + select.dataset.dependsOn + '"]') : null;
+    var loaded = false;
+    var timeoutId;
+
+    var search = document.createElement('input');
+    search.type = 'search';
+    search.className = 'lazy-select-search';
+    search.placeholder = 'Поиск...';
+    select.parentNode.insertBefore(search, select);
+
+    var more = document.createElement('button');
+    more.type = 'button';
+    more.className = 'lazy-select-more';
+    more.textContent = 'Показать ещё';
+    more.hidden = true;
+    select.parentNode.insertBefore(more, select.nextSibling);
+
+    function load(offset) {
+        var params = new URLSearchParams({q: search.value.trim(), offset: offset});
+        if (dependsOn && dependsOn.value) {
+            params.set(dependsOn.name, dependsOn.value);
+        }
+        return fetch(select.dataset.choicesUrl + '?' + params.toString())
+            .then(function (response) { return response.json(); })
+            .then(function (data) {
+                if (offset === 0) {
+                    // Оставляем пустой и выбранный варианты
+                    Array.from(select.options).forEach(function (option) {
+                        if (option.value && !option.selected) {
+                            option.remove();
+                        }
+                    });
+                }
+                data.results.forEach(function (item) {
+                    var value = String(item.id);
+                    if (!Array.from(select.options).some(function (option) { return option.value === value; })) {
+                        select.add(new Option(item.text, value));
+                    }
+                });
+                more.hidden = data.next === null;
+                more.dataset.offset = data.next;
+                loaded = true;
+            })
+            .catch(function (error) {
+                console.error('Error:', error);
+            });
+    }
+
+    select.addEventListener('focus', function () {
+        if (!loaded) {
+            load(0);
+        }
+    });
+
+    search.addEventListener('input', function () {
+        clearTimeout(timeoutId);
+        timeoutId = setTimeout(function () { load(0); }, 300);
+    });
+
+    more.addEventListener('click', function () {
+        load(Number(more.dataset.offset));
+    });
+
+    if (dependsOn) {
+        dependsOn.addEventListener('change', function () {
+            // Выбранный вариант может не подходить к новому значению
+            select.value = '';
+            load(0);
+        });
+    }
+});
@@ -0,0 +1,66 @@
+// Mobile menu toggle
+document.querySelector('.burger-menu').addEventListener('click', function() {
+    document.querySelector('.nav-links').classList.toggle('active');
+});
+
+// Search suggestions
+document.addEventListener('DOMContentLoaded', function() {
+    const searchInputs = document.querySelectorAll('input[name="q"]');
+
+    searchInputs.forEach(input => {
+        let timeoutId;
+        const container = document.createElement('div');
+        container.className = 'search-suggestions';
+        container.style.display = 'none';
+        input.parentNode.appendChild(container);
+
+        input.addEventListener('input', function() {
+            clearTimeout(timeoutId);
+            const query = this.value.trim();
+            container.style.display = 'none';
+
+            if (query.length < 2) return;
+
+            timeoutId = setTimeout(() => {
+                fetch(`/search/suggestions/?q=${encodeURIComponent(query)}`)
+                    .then(response => response.json())
+                    .then(data => {
+                        showSuggestions(data.suggestions, container, input);
+                    })
+                    .catch(error => {
+                        console.error('Error:', error);
+                    });
+            }, 300);
+        });
+
+        document.addEventListener('click', function(e) {
+            if (!input.contains(e.target) && !container.contains(e.target)) {
+                container.style.display = 'none';
+            }
+        });
+    });
+
+    function showSuggestions(suggestions, container, input) {
+        container.innerHTML = '';
+
+        if (suggestions.length === 0) {
+            container.style.display = 'none';
+            return;
+        }
+
+        suggestions.forEach(suggestion => {
+            const item = document.createElement('div');
+            item.className = 'suggestion-item';
+            item.textContent = suggestion;
+            item.addEventListener('click', function() {
+                input.value = suggestion;
+                container.style.display = 'none';
+                input.closest('form').submit();
+            });
+            container.appendChild(item);
+        });
+
+        container.style.width = input.offsetWidth + 'px';
+        container.style.display = 'block';
+    }
+});
@@ -0,0 +1,22 @@
+// Заголовок новости берётся со страницы
+function articleTitle() {
+    return document.querySelector('.article-header h1').textContent.trim();
+}
+
+function shareOnVK() {
+    const url = encodeURIComponent(window.location.href);
+    const title = encodeURIComponent(articleTitle());
+    window.open(`https://vk.com/share.php?url=${url}&title=${title}`, '_blank');
+}
+
+function shareOnTelegram() {
+    const url = encodeURIComponent(window.location.href);
+    const text = encodeURIComponent(articleTitle());
+    window.open(`https://t.me/share/url?url=${url}&text=${text}`, '_blank');
+}
+
+function copyLink() {
+    navigator.clipboard.writeText(window.location.href).then(() => {
+        alert('Ссылка скопирована в буфер обмена!');
+    });
+}